@@ -19,12 +19,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import itertools
 import uuid
 
 
 class CBT():
-    tag_counter = int(uuid.uuid4().hex[:15], base=16)
+    __slots__ = ("tag", "parent", "child_count", "completed", "op_type", "request", "response",
+                 "time_create", "time_submit", "time_dequeue", "time_complete", "time_free",
+                 "_resp_cache")
+    # next() on an itertools.count is atomic under the GIL, so tags are unique across threads
+    # without taking a lock
+    _tag_counter = itertools.count(int(uuid.uuid4().hex[:15], base=16))
     class Request():
+        __slots__ = ("initiator", "recipient", "action", "params")
+
         def __init__(self, initiator="", recipient="", action="", params=None):
             self.initiator = initiator
             self.recipient = recipient
@@ -43,6 +51,8 @@ class CBT():
             yield("params", self.params)
 
     class Response():
+        __slots__ = ("status", "initiator", "recipient", "data")
+
         def __init__(self,):
             self.status = False
             self.initiator = None
@@ -61,8 +71,7 @@ class CBT():
             yield("data", self.data)
 
     def __init__(self, initiator="", recipient="", action="", params=""):
-        self.tag = CBT.tag_counter
-        CBT.tag_counter = CBT.tag_counter + 1
+        self.tag = next(CBT._tag_counter)
         self.parent = None
         self.child_count = 0
         self.completed = False
@@ -71,6 +80,25 @@ class CBT():
         self.response = None
         self.time_create = None
         self.time_submit = None
+        self.time_dequeue = None
+        self.time_complete = None
+        self.time_free = None
+        self._resp_cache = None  # Response object retained for reuse
+
+    def reinitialize(self, initiator="", recipient="", action="", params=""):
+        """ Reset a previously freed CBT for reuse, its Request and Response objects are kept """
+        self.tag = next(CBT._tag_counter)
+        self.parent = None
+        self.child_count = 0
+        self.completed = False
+        self.op_type = "Request"
+        self.set_request(initiator, recipient, action, params)
+        self.response = None
+        if self._resp_cache is not None:
+            self._resp_cache.data = None
+        self.time_create = None
+        self.time_submit = None
+        self.time_dequeue = None
         self.time_complete = None
         self.time_free = None
 
@@ -90,6 +118,7 @@ class CBT():
         yield("response", self.response)
         yield("time_create", self.time_create)
         yield("time_submit", self.time_submit)
+        yield("time_dequeue", self.time_dequeue)
         yield("time_complete", self.time_complete)
         yield("time_free", self.time_free)
 
@@ -101,7 +130,9 @@ class CBT():
 
     def set_response(self, data="", status=False):
         self.op_type = "Response"
-        self.response = self.Response()
+        if self._resp_cache is None:
+            self._resp_cache = self.Response()
+        self.response = self._resp_cache
         self.response.initiator = self.request.recipient
         self.response.recipient = self.request.initiator
         self.response.status = status
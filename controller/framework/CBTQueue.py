@@ -0,0 +1,268 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import asyncio
+import threading
+from collections import deque
+import queue as Queue
+
+# Priority classes, lower values are served first
+PRI_RESPONSE = 0
+PRI_LINK_EVENT = 1
+PRI_DEFAULT = 2
+PRI_BULK = 3
+NUM_PRIORITIES = 4
+
+# Maps CBT request actions to a priority class, unlisted actions use PRI_DEFAULT
+ACTION_PRIORITY = {
+    "TCI_TINCAN_MSG_NOTIFY": PRI_LINK_EVENT,
+    "LNK_TUNNEL_EVENTS": PRI_LINK_EVENT,
+    "SIG_REMOTE_ACTION": PRI_LINK_EVENT,
+    "LOG_DEBUG": PRI_BULK,
+    "LOG_INFO": PRI_BULK,
+    "LOG_WARNING": PRI_BULK,
+    "LOG_ERROR": PRI_BULK,
+    "VIS_DATA_REQ": PRI_BULK,
+}
+
+
+def cbt_priority(cbt):
+    # the terminate sentinel is queued behind all pending work
+    if cbt is None:
+        return PRI_BULK
+    if cbt.op_type == "Response":
+        return PRI_RESPONSE
+    if cbt.op_type == "Timer":
+        return PRI_DEFAULT
+    return ACTION_PRIORITY.get(cbt.request.action, PRI_DEFAULT)
+
+
+class CBTDeque():
+    """
+    Container for the CBT queue. In priority mode a separate FIFO is kept for each priority
+    class and the highest priority non empty FIFO is always served first. Otherwise it
+    behaves as a single FIFO.
+    """
+    def __init__(self, priority=False):
+        self._priority = priority
+        if priority:
+            self._levels = tuple(deque() for _ in range(NUM_PRIORITIES))
+        else:
+            self._levels = (deque(),)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        state = "CBTDeque<priority=%s, levels=%s>" % \
+                (self._priority, [len(lvl) for lvl in self._levels])
+        return state
+
+    def append(self, cbt):
+        if self._priority:
+            self._levels[cbt_priority(cbt)].append(cbt)
+        else:
+            self._levels[0].append(cbt)
+        self._count += 1
+
+    def popleft(self):
+        for lvl in self._levels:
+            if lvl:
+                self._count -= 1
+                return lvl.popleft()
+        raise IndexError("pop from an empty CBTDeque")
+
+    def evict_for(self, cbt):
+        """
+        Select the CBT to shed when a full queue receives cbt. This is the oldest request of
+        the lowest priority class queued, or cbt itself if its priority is lower still. A queued
+        CBT that is selected is removed. Responses, timer events and the terminate sentinel are
+        never shed.
+        """
+        new_pri = cbt_priority(cbt)
+        if self._priority:
+            for pri in range(NUM_PRIORITIES - 1, PRI_RESPONSE, -1):
+                if pri < new_pri:
+                    break
+                lvl = self._levels[pri]
+                for idx, item in enumerate(lvl):
+                    if item is not None and item.op_type == "Request":
+                        del lvl[idx]
+                        self._count -= 1
+                        return item
+            return cbt
+        lvl = self._levels[0]
+        shed_idx = -1
+        shed_pri = -1
+        for idx, item in enumerate(lvl):
+            if item is not None and item.op_type == "Request":
+                pri = cbt_priority(item)
+                if pri > shed_pri:
+                    shed_idx, shed_pri = idx, pri
+                    if pri == NUM_PRIORITIES - 1:
+                        break
+        if shed_idx < 0 or shed_pri < new_pri:
+            return cbt
+        item = lvl[shed_idx]
+        del lvl[shed_idx]
+        self._count -= 1
+        return item
+
+
+class CBTQueueBounds():
+    """
+    Bound and overload policy shared by the CBT queues. Only requests count against the
+    bound, responses are always accepted so that initiators waiting on them are not stranded.
+    Policies when the bound is reached:
+      Block - the submitter waits up to block_timeout seconds for space, then the request fails
+      DropOldest - the oldest lowest priority request is shed to make room
+      Fail - the submitted request fails immediately
+    A shed request is passed to on_shed, which CFx sets to complete it with an error response.
+    """
+    POLICIES = ("Block", "DropOldest", "Fail")
+
+    def _init_bounds(self, bound, policy, block_timeout):
+        if policy not in CBTQueueBounds.POLICIES:
+            raise ValueError("Invalid queue overload policy {0}".format(policy))
+        self.bound = bound  # 0 for an unbounded queue
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.high_water = 0
+        self.shed_count = 0
+        self.on_shed = None
+
+    def queue_stats(self):
+        return {"Size": self.qsize(), "HighWater": self.high_water, "Bound": self.bound,
+                "Policy": self.policy, "Shed": self.shed_count}
+
+
+class CBTQueue(Queue.Queue, CBTQueueBounds):
+    """ Thread safe CBT queue, optionally serving CBTs in order of their priority class """
+    def __init__(self, bound=0, priority=False, policy="Block", block_timeout=5):
+        self._priority = priority
+        self._init_bounds(bound, policy, block_timeout)
+        self.consumer_ident = None  # thread id of the module worker, it never blocks on itself
+        # the bound is enforced by put() and not Queue's maxsize so responses are not refused
+        super(CBTQueue, self).__init__(0)
+
+    def _init(self, maxsize):
+        self.queue = CBTDeque(self._priority)
+
+    def put(self, item, block=True, timeout=None):
+        shed = None
+        with self.not_full:
+            if 0 < self.bound <= len(self.queue) and item is not None \
+                    and item.op_type == "Request":
+                shed = self._overload(item, block, timeout)
+            if shed is None or shed is not item:
+                self.queue.append(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+                if len(self.queue) > self.high_water:
+                    self.high_water = len(self.queue)
+            if shed is not None:
+                self.shed_count += 1
+        if shed is not None and self.on_shed is not None:
+            self.on_shed(shed)
+
+    def put_many(self, items):
+        # enqueue a batch of CBTs with one lock acquisition and one wakeup
+        if self.bound > 0:
+            # each request is subject to the overload policy
+            for item in items:
+                self.put(item)
+            return
+        with self.not_full:
+            for item in items:
+                self.queue.append(item)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify(len(items))
+            if len(self.queue) > self.high_water:
+                self.high_water = len(self.queue)
+
+    def _overload(self, cbt, block, timeout):
+        # called with the queue lock held, returns the CBT to shed or None to enqueue cbt
+        if self.policy == "Block" and block:
+            if threading.get_ident() == self.consumer_ident:
+                # the worker cannot wait for itself to make room, let it exceed the bound
+                return None
+            if timeout is None:
+                timeout = self.block_timeout
+            if self.not_full.wait_for(lambda: len(self.queue) < self.bound, timeout):
+                return None
+            return cbt
+        if self.policy == "DropOldest":
+            shed = self.queue.evict_for(cbt)
+            if shed is not cbt:
+                self.unfinished_tasks -= 1
+            return shed
+        return cbt
+
+
+class AsyncCBTQueue(asyncio.Queue, CBTQueueBounds):
+    """
+    CBT queue used by the asyncio engine. It is consumed by a task on the shared event loop and
+    put() can be called from any thread, only puts made off the loop thread are handed over
+    with call_soon_threadsafe. The loop cannot block so the Block policy behaves as Fail.
+    """
+    def __init__(self, event_loop, bound=0, priority=False, policy="Block"):
+        self._priority = priority
+        self._event_loop = event_loop
+        self.loop_thread_id = None  # set by CFx once the loop thread is running
+        self._init_bounds(bound, policy, 0)
+        super(AsyncCBTQueue, self).__init__(0)
+
+    def _init(self, maxsize):
+        self._queue = CBTDeque(self._priority)
+
+    def put(self, cbt):  # pylint: disable=invalid-overridden-method
+        if threading.get_ident() == self.loop_thread_id:
+            self._enqueue(cbt)
+        else:
+            self._event_loop.call_soon_threadsafe(self._enqueue, cbt)
+
+    def put_many(self, items):
+        if threading.get_ident() == self.loop_thread_id:
+            self._enqueue_many(items)
+        else:
+            self._event_loop.call_soon_threadsafe(self._enqueue_many, items)
+
+    def _enqueue_many(self, items):
+        for item in items:
+            self._enqueue(item)
+
+    def _enqueue(self, cbt):
+        if 0 < self.bound <= len(self._queue) and cbt is not None and cbt.op_type == "Request":
+            shed = cbt
+            if self.policy == "DropOldest":
+                shed = self._queue.evict_for(cbt)
+            self.shed_count += 1
+            if shed is not cbt:
+                self.task_done()
+                self.put_nowait(cbt)
+            if self.on_shed is not None:
+                self.on_shed(shed)
+        else:
+            self.put_nowait(cbt)
+        if len(self._queue) > self.high_water:
+            self.high_water = len(self._queue)
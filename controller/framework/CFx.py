@@ -20,6 +20,8 @@
 # THE SOFTWARE.
 
 import os
+import asyncio
+import copy
 import json
 import signal
 import argparse
@@ -27,9 +29,18 @@ import threading
 import time
 import importlib
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, InvalidStateError
 import controller.framework.fxlib as fxlib
+from controller.framework.CBTQueue import CBTQueue, AsyncCBTQueue
 from controller.framework.CFxHandle import CFxHandle
 from controller.framework.CFxSubscription import CFxSubscription
+from controller.framework.CFxTimer import TimerWheel, NS_PER_SEC
+from controller.framework.CFxMetrics import CBTMetrics, summarize_metrics
+from controller.framework.CFxTracer import CBTTracer
+from controller.framework.CFxRecorder import CBTRecorder
+from controller.framework.CFxWatchdog import HandlerWatchdog
+from controller.framework.CFxProfiler import CFxProfiler
 
 # pylint: disable=protected-access
 class CFX():
@@ -45,15 +56,170 @@ class CFX():
         self.model = self._config["CFx"]["Model"]
         self._event = None
         self._subscriptions = {}
+        self._subscription_lock = threading.Lock()
+        # module name -> sec taken by its initialize()
+        self._init_times = {}
         self._node_id = self._set_node_id()
         self._load_order = []
+        # a single timer wheel services the timers of all modules
+        self._timer_wheel = TimerWheel(self._config["CFx"].get("TimerResolution", 0.1))
+        # the asyncio engine runs every module as a task on one event loop thread
+        self._event_loop = None
+        self._loop_thread = None
+        if self._config["CFx"].get("Engine", "Threaded") == "Asyncio":
+            self._event_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._event_loop)
+        self._collect_metrics = self._config["CFx"].get("Metrics", True)
+        self._tracer = None
+        if self._config["CFx"].get("TraceBufferSize", 0) > 0:
+            self._tracer = CBTTracer(self._node_id, self._config["CFx"]["TraceBufferSize"])
+        self._watchdog = None
+        self._profiler = CFxProfiler(self._cfx_handle_dict,
+                                     self._config.get("Logger", {}).get("Directory", "./"))
+        self._recorder = None
+        if self._config["CFx"].get("RecordFile"):
+            self._recorder = CBTRecorder(self._config["CFx"]["RecordFile"], self._node_id,
+                                         self._config)
+        # tag -> (initiator's CFxHandle, Future) of requests submitted with a future
+        self._cbt_futures = {}
+        # CBTs addressed to "CFx" are serviced by the framework itself
+        self._cfx_handlers = {
+            "CFX_QUERY_METRICS": self.req_handler_query_metrics,
+            "CFX_QUERY_TRACE": self.req_handler_query_trace,
+            "CFX_PROFILE": self.req_handler_profile,
+            "CFX_RELOAD_CONFIG": self.req_handler_reload_config,
+        }
 
     def submit_cbt(self, cbt):
+        if self._recorder is not None:
+            self._recorder.record(cbt)
         recipient = cbt.request.recipient
         if cbt.op_type == "Response":
+            if self._cbt_futures and self.resolve_future(cbt):
+                return
             recipient = cbt.response.recipient
+        elif recipient == "CFx":
+            self.process_cbt(cbt)
+            return
         self._cfx_handle_dict[recipient]._cm_queue.put(cbt)
 
+    def submit_cbts(self, cbts):
+        # group the CBTs by recipient so that each module queue is locked once
+        batches = {}
+        for cbt in cbts:
+            if self._recorder is not None:
+                self._recorder.record(cbt)
+            recipient = cbt.request.recipient
+            if cbt.op_type == "Response":
+                if self._cbt_futures and self.resolve_future(cbt):
+                    continue
+                recipient = cbt.response.recipient
+            elif recipient == "CFx":
+                self.process_cbt(cbt)
+                continue
+            batch = batches.get(recipient)
+            if batch is None:
+                batches[recipient] = [cbt]
+            else:
+                batch.append(cbt)
+        for recipient, batch in batches.items():
+            self._cfx_handle_dict[recipient]._cm_queue.put_many(batch)
+
+    def resolve_future(self, cbt):
+        """
+        Resolve the future of a completed request with its Response instead of queuing it to
+        the initiator. Returns False if the request was not submitted with a future.
+        """
+        waiter = self._cbt_futures.pop(cbt.tag, None)
+        if waiter is None:
+            return False
+        handle, future = waiter
+        if handle._metrics is not None and cbt.time_submit is not None:
+            handle._metrics.record_response((cbt.request.recipient, cbt.request.action),
+                                            cbt.time_submit, cbt.time_dequeue,
+                                            cbt.time_complete, time.monotonic_ns())
+        response = cbt.response
+        # the Response now belongs to the future, so it must not be reused with the pooled CBT
+        cbt._resp_cache = None
+        handle.free_cbt(cbt)
+        try:
+            future.set_result(response)
+        except InvalidStateError:
+            # the caller's timeout expired or it cancelled the future
+            pass
+        return True
+
+    def process_cbt(self, cbt):
+        # framework requests are handled inline on the submitter's thread and the response is
+        # routed back to the initiator's queue
+        handler = self._cfx_handlers.get(cbt.request.action)
+        if handler is None:
+            cbt.set_response("Unsupported CBT action {0}".format(cbt.request.action), False)
+        else:
+            try:
+                handler(cbt)
+            except Exception as err:  # pylint: disable=broad-except
+                cbt.set_response("CFx exception:{0}".format(err), False)
+        cbt.time_complete = time.monotonic_ns()
+        cbt.completed = True
+        self.submit_cbt(cbt)
+
+    def req_handler_query_metrics(self, cbt):
+        params = cbt.request.params or {}
+        cbt.set_response(self.query_metrics(params.get("Actions")), True)
+
+    def req_handler_query_trace(self, cbt):
+        if self._tracer is None:
+            cbt.set_response("CBT tracing is not enabled", False)
+        else:
+            cbt.set_response(self._tracer.export(), True)
+
+    def req_handler_profile(self, cbt):
+        """
+        Profile a module's worker, eg., {"Module": "Topology", "Duration": 30}, or every worker
+        when Module is omitted, or manage tracemalloc with {"Memory": <Start>/<Snapshot>/<Stop>}.
+        """
+        cbt.set_response(self._profiler.request(cbt.request.params), True)
+
+    def req_handler_reload_config(self, cbt):
+        cbt.set_response(self.reload_config(), True)
+
+    def query_metrics(self, actions=None):
+        """
+        Return the queue wait, service and end-to-end latency summaries for each
+        (recipient, action), optionally limited to the listed actions, and the depth, high-water
+        mark and shed count of each module queue, the calls and time of each module's CBT
+        handlers, and the sec each module took to initialize. The handler stalls flagged by
+        the watchdog are included when it is enabled.
+        """
+        handles = list(self._cfx_handle_dict.values())
+        latency = summarize_metrics([h._metrics for h in handles if h._metrics is not None],
+                                    actions)
+        queues = {name: handle._cm_queue.queue_stats()
+                  for name, handle in list(self._cfx_handle_dict.items())}
+        handlers = {name: handle._cm_instance.query_handler_stats()
+                    for name, handle in list(self._cfx_handle_dict.items())
+                    if handle._cm_instance is not None}
+        metrics = {"Latency": latency, "Queues": queues, "Handlers": handlers,
+                   "InitTimes": dict(self._init_times)}
+        if self._watchdog is not None:
+            metrics["Stalls"] = self._watchdog.stats()
+        return metrics
+
+    def dump_metrics(self):
+        # write the current metrics, and the CBT trace when enabled, to the log directory
+        log_dir = self._config.get("Logger", {}).get("Directory", "./")
+        os.makedirs(log_dir, exist_ok=True)
+        filename = os.path.join(log_dir, "cfx-metrics.json")
+        with open(filename, "w") as f:
+            json.dump(self.query_metrics(), f, indent=2)
+        print("CFx metrics written to {0}".format(filename))
+        if self._tracer is not None:
+            filename = os.path.join(log_dir, "cfx-trace.json")
+            with open(filename, "w") as f:
+                json.dump(self._tracer.export(), f)
+            print("CFx CBT trace written to {0}".format(filename))
+
     def initialize(self,):
         # check for circular dependencies in the configuration file
         dependency_graph = {}
@@ -73,20 +239,92 @@ class CFX():
             self.load_module(module_name)
 
         # intialize all the CFxHandles which in turn initialize the CMs
-        for module_name in self._load_order:
-            self._cfx_handle_dict[module_name].initialize()
+        self.initialize_modules(self._config["CFx"].get("InitThreads", 4))
+
+        budget = self._config["CFx"].get("HandlerBudget", 0)
+        if budget > 0:
+            # the watchdog runs on the timer wheel thread, so it is not delayed by the workers
+            self._watchdog = HandlerWatchdog(self._cfx_handle_dict, budget)
+            for handle in self._cfx_handle_dict.values():
+                handle._watched = True
+            self._timer_wheel.schedule(budget / 2, self._watchdog.check, interval=budget / 2)
 
-        # start all the worker and timer threads
+        # start all the workers and the timer wheel
         for module_name in self._cfx_handle_dict:
-            self._cfx_handle_dict[module_name]._cm_thread.start()
-            if self._cfx_handle_dict[module_name]._timer_thread:
-                self._cfx_handle_dict[module_name]._timer_thread.start()
+            self._cfx_handle_dict[module_name].start()
+        if self._event_loop is not None:
+            self._loop_thread = threading.Thread(target=self.__run_event_loop,
+                                                 name="CFx::EventLoop", daemon=False)
+            self._loop_thread.start()
+        self._timer_wheel.start()
+
+    def initialize_modules(self, max_workers):
+        """
+        Initialize the modules over their dependency graph, a module is initialized once all
+        its dependencies are, and independent modules are initialized concurrently. A module
+        is also initialized after the loaded modules in its InitAfter, the optional providers
+        of its subscriptions. With max_workers <= 1 the modules are initialized in load order
+        on the calling thread.
+        """
+        started = time.monotonic()
+        if max_workers <= 1:
+            for name in self._load_order:
+                self._initialize_module(name)
+            print("Modules initialized in {0:.3f}s".format(time.monotonic() - started))
+            return
+        # slixmpp binds a client to the current event loop when it is created, the init
+        # threads share the main thread's loop so the client binds to the same loop as on main
+        try:
+            loop = asyncio.get_event_loop_policy().get_event_loop()
+        except RuntimeError:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+        deps = {name: set(self._config[name].get("Dependencies", ()))
+                      .union(self._config[name].get("InitAfter", ())) & set(self._load_order)
+                for name in self._load_order}
+        dependents = {name: [] for name in self._load_order}
+        for name in self._load_order:
+            for dep in deps[name]:
+                dependents[dep].append(name)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="CFx::Init",
+                                initializer=asyncio.set_event_loop, initargs=(loop,)) as pool:
+            running = {pool.submit(self._initialize_module, name): name
+                       for name in self._load_order if not deps[name]}
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    # a failed module aborts the start up once the running inits finish
+                    fut.result()
+                    for dependent in dependents[name]:
+                        deps[dependent].discard(name)
+                        if not deps[dependent]:
+                            running[pool.submit(self._initialize_module, dependent)] = \
+                                dependent
+        pending = [name for name in self._load_order if deps[name]]
+        if pending:
+            raise RuntimeError("Modules {0} were not initialized, check their Dependencies and"
+                               " InitAfter for a cycle".format(pending))
+        print("Modules initialized in {0:.3f}s".format(time.monotonic() - started))
+
+    def _initialize_module(self, module_name):
+        started = time.monotonic()
+        self._cfx_handle_dict[module_name].initialize()
+        self._init_times[module_name] = time.monotonic() - started
+        print("{0} initialized in {1:.3f}s".format(module_name, self._init_times[module_name]))
+
+    def __run_event_loop(self):
+        asyncio.set_event_loop(self._event_loop)
+        tid = threading.get_ident()
+        for module_name in self._cfx_handle_dict:
+            self._cfx_handle_dict[module_name]._cm_queue.loop_thread_id = tid
+        self._event_loop.run_forever()
+        self._event_loop.close()
 
-    def load_module(self, module_name):
+    def _module_class(self, module_name):
         """
-        Dynamically load the modules specified in the config file. Allow model
-        specific module implementations to override the default by attempting
-        to load them first.
+        Import the class implementing a module. Allow model specific module implementations
+        to override the default by attempting to load them first.
         """
         if self.model:
             if os.path.isfile("controller/modules/{0}/{1}.py"
@@ -98,10 +336,34 @@ class CFX():
                                                  .format(module_name))
 
         # get the class with name key from module
-        module_class = getattr(module, module_name)
+        return getattr(module, module_name)
+
+    def load_module(self, module_name):
+        """
+        Dynamically load the modules specified in the config file.
+        """
+        module_class = self._module_class(module_name)
 
         # create a CFxHandle object for each module
         handle = CFxHandle(self)
+        handle._timer_wheel = self._timer_wheel
+        # the queue options can be set for all modules in CFx and overridden per module
+        priority = self._module_option(module_name, "QueueMode", "Fifo") == "Priority"
+        bound = self._module_option(module_name, "QueueSize", 0)
+        policy = self._module_option(module_name, "QueueOverloadPolicy", "Block")
+        if self._event_loop is not None:
+            handle._event_loop = self._event_loop
+            handle._cm_queue = AsyncCBTQueue(self._event_loop, bound, priority, policy)
+        else:
+            handle._cm_queue = CBTQueue(bound, priority, policy,
+                                        self._module_option(module_name, "QueueBlockTimeout", 5))
+        handle._cm_queue.on_shed = self.shed_cbt
+        handle._cbt_pool = deque(maxlen=self._config["CFx"].get(
+            "CbtPoolSize", CFxHandle.DEFAULT_CBT_POOL_SIZE))
+        if self._collect_metrics:
+            handle._metrics = CBTMetrics()
+        handle._tracer = self._tracer
+        handle._request_timeout = int(self._config["CFx"].get("RequestTimeout", 0) * NS_PER_SEC)
         self._config[module_name]["NodeId"] = self._node_id
         instance = module_class(handle, self._config[module_name], module_name)
 
@@ -111,6 +373,18 @@ class CFX():
         # dict with module name as the key
         self._cfx_handle_dict[module_name] = handle
 
+    def _module_option(self, module_name, key, default):
+        # a module's own setting takes precedence over the one in the CFx section
+        return self._config[module_name].get(key, self._config["CFx"].get(key, default))
+
+    def shed_cbt(self, cbt):
+        # fail a request that an overloaded module queue could not accept
+        cbt.set_response("The {0} queue is overloaded, the request was shed"
+                         .format(cbt.request.recipient), False)
+        cbt.time_complete = time.monotonic_ns()
+        cbt.completed = True
+        self.submit_cbt(cbt)
+
     def add_dependencies(self, module_name):
         dependencies = self._config[module_name].get("Dependencies", {})
         for dep in dependencies:
@@ -144,12 +418,34 @@ class CFX():
 
         return any(visit(v) for v in graph)
 
-    @staticmethod
-    def __handler(signum=None, frame=None):
+    def __handler(self, signum=None, frame=None):
         # pylint: disable=unused-argument
         print("Signal handler called with signal ", signum)
+        self._event.set()
+
+    def __dump_handler(self, signum=None, frame=None):
+        # pylint: disable=unused-argument
+        try:
+            self.dump_metrics()
+        except OSError as err:
+            print("Failed to dump CFx metrics: {0}".format(err))
+        # Logger writes its flight recorder when enabled
+        logger = self._cfx_handle_dict.get("Logger")
+        if logger is not None and logger._log_recording:
+            logger.submit_cbt(logger.create_cbt(initiator="Logger", recipient="Logger",
+                                                action="LOG_DUMP_RECORDER",
+                                                params={"Reason": "SIGUSR1"}))
+
+    def __reload_handler(self, signum=None, frame=None):
+        # pylint: disable=unused-argument
+        try:
+            self.reload_config()
+        except (OSError, ValueError) as err:
+            print("Failed to reload the configuration: {0}".format(err))
 
     def parse_config(self):
+        # keep the defaults and the config sources so the configuration can be reloaded
+        self._default_config = copy.deepcopy(fxlib.CONFIG)
         self._config = fxlib.CONFIG
         self._set_nid_file_name()
         parser = argparse.ArgumentParser(description="Starts the IPOP Controller")
@@ -161,25 +457,70 @@ class CFX():
         # parser.add_argument("-p", help="load remote ip configuration file",
         #                     dest="ip_config", metavar="ip_config")
         args = parser.parse_args()
+        self._config_file = args.config_file
+        self._config_string = args.config_string
         if args.config_file:
             while not os.path.isfile(args.config_file):
                 print("Waiting on config file {}".format(args.config_file))
                 time.sleep(10)
+        CFX._merge_config(self._config, self._config_file, self._config_string)
+
+    @staticmethod
+    def _merge_config(config, config_file, config_string):
+        if config_file:
             # load the configuration file
-            with open(args.config_file) as f:
+            with open(config_file) as f:
                 cfg = json.load(f)
                 for key in cfg:
-                    if self._config.get(key, False):
-                        self._config[key].update(cfg[key])
+                    if config.get(key, False):
+                        config[key].update(cfg[key])
                     else:
-                        self._config[key] = cfg[key]
-        if args.config_string:
-            cfg = json.loads(args.config_string)
+                        config[key] = cfg[key]
+        if config_string:
+            cfg = json.loads(config_string)
             for key in cfg:
-                if self._config.get(key, None):
-                    self._config[key].update(cfg[key])
+                if config.get(key, None):
+                    config[key].update(cfg[key])
                 else:
-                    self._config[key] = cfg[key]
+                    config[key] = cfg[key]
+
+    def reload_config(self):
+        """
+        Re-read the configuration sources and notify each loaded module of its changed
+        settings. The reloadable changes are applied on the module's worker, see
+        CFxHandle.apply_config_changes, the others take effect after a restart. Returns the
+        names of the changed settings by module, split into Applied and RestartRequired,
+        and the names of the enabled modules that are not loaded.
+        """
+        config = copy.deepcopy(self._default_config)
+        CFX._merge_config(config, self._config_file, self._config_string)
+        applied = {}
+        restart = {}
+        for module_name, handle in list(self._cfx_handle_dict.items()):
+            current = self._config[module_name]
+            changes = {key: val for key, val in config.get(module_name, {}).items()
+                       if key != "NodeId" and current.get(key) != val}
+            live = {key: val for key, val in changes.items()
+                    if handle._cm_instance.is_reloadable(key, val)}
+            if live:
+                applied[module_name] = sorted(live)
+                handle.schedule_timer(0, handle.apply_config_changes, live)
+            if len(live) < len(changes):
+                restart[module_name] = sorted(changes.keys() - live.keys())
+        cfx_changes = [key for key, val in config["CFx"].items()
+                       if key != "NodeId" and self._config["CFx"].get(key) != val]
+        if cfx_changes:
+            # framework settings are only read at start up
+            restart["CFx"] = sorted(cfx_changes)
+        not_loaded = sorted(name for name, mod_cfg in config.items()
+                            if name != "CFx" and mod_cfg.get("Enabled", True)
+                            and name not in self._cfx_handle_dict)
+        changed = {"Applied": applied, "RestartRequired": restart, "NotLoaded": not_loaded}
+        print("Configuration reloaded, applied settings: {0}".format(applied))
+        if restart or not_loaded:
+            print("Take effect after a restart, settings: {0}, enabled modules: {1}"
+                  .format(restart, not_loaded))
+        return changed
 
     def _set_node_id(self,):
         config = self._config["CFx"]
@@ -225,25 +566,41 @@ class CFX():
                     break
         else:
             for sig in [signal.SIGINT, signal.SIGTERM]:
-                signal.signal(sig, CFX.__handler)
-            # sleeps until signal is received
+                signal.signal(sig, self.__handler)
             # pylint: disable=no-member
-            signal.pause()
+            signal.signal(signal.SIGUSR1, self.__dump_handler)
+            signal.signal(signal.SIGHUP, self.__reload_handler)
+            # sleeps until a shutdown signal is received
+            while not self._event.is_set():
+                signal.pause()
 
     def terminate(self):
+        # stop timer deliveries before the workers are asked to exit
+        self._timer_wheel.terminate()
         for module_name in self._cfx_handle_dict:
-            if self._cfx_handle_dict[module_name]._timer_thread:
-                self._cfx_handle_dict[module_name]._exit_event.set()
             self._cfx_handle_dict[module_name]._cm_queue.put(None)
 
         # wait for the threads to process their current CBTs and exit
         print("waiting for threads to exit ...")
+        if self._event_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.__wait_for_tasks(), self._event_loop).result()
+            self._event_loop.call_soon_threadsafe(self._event_loop.stop)
+            self._loop_thread.join()
+            print("{0} exited".format(self._loop_thread.name))
+            self._close_recorder()
+            return
         for module_name in self._cfx_handle_dict:
             self._cfx_handle_dict[module_name]._cm_thread.join()
             print("{0} exited".format(self._cfx_handle_dict[module_name]._cm_thread.name))
-            if self._cfx_handle_dict[module_name]._timer_thread:
-                self._cfx_handle_dict[module_name]._timer_thread.join()
-                print("{0} exited".format(self._cfx_handle_dict[module_name]._timer_thread.name))
+        self._close_recorder()
+
+    def _close_recorder(self):
+        if self._recorder is not None:
+            self._recorder.close()
+
+    async def __wait_for_tasks(self):
+        tasks = [handle._cm_task for handle in self._cfx_handle_dict.values()]
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     def query_param(self, param_name=""):
         val = None
@@ -265,47 +622,53 @@ class CFX():
                   .format(param_name, str(err)))
         return val
 
+    def set_log_level(self, level, recording=False):
+        for handle in self._cfx_handle_dict.values():
+            handle._log_level = level
+            handle._log_recording = recording
+
+    def set_log_rate_limit(self, rate, burst, report_interval):
+        for handle in self._cfx_handle_dict.values():
+            handle.limit_logging(rate, burst, report_interval)
+
     # Caller is the subscription source
     def publish_subscription(self, owner_name, subscription_name, owner):
         sub = CFxSubscription(owner_name, subscription_name)
         sub._owner = owner
-        if sub._owner_name not in self._subscriptions:
-            self._subscriptions[sub._owner_name] = []
-        self._subscriptions[sub._owner_name].append(sub)
+        with self._subscription_lock:
+            self._subscriptions[(owner_name, subscription_name)] = sub
         return sub
 
     def remove_subscription(self, sub):
         sub.post_update("SUBSCRIPTION_SOURCE_TERMINATED")
-        if sub._owner_name not in self._subscriptions:
+        with self._subscription_lock:
+            removed = self._subscriptions.pop((sub._owner_name, sub._subscription_name), None)
+        if removed is None:
             raise NameError("Failed to remove subscription source \"{}\"."
                             " No such provider name exists."
                             .format(sub._owner_name))
-        self._subscriptions[sub._owner_name].remove(sub)
 
     def find_subscription(self, owner_name, subscription_name):
-        sub = None
-        if owner_name not in self._subscriptions:
+        sub = self._subscriptions.get((owner_name, subscription_name))
+        if sub is None and owner_name not in self._cfx_handle_dict:
             raise NameError("The specified subscription provider {} was not found."
                             .format(owner_name))
-        for sub in self._subscriptions[owner_name]:
-            if sub._subscription_name == subscription_name:
-                return sub
-        return None
+        return sub
 
     # Caller is the subscription sink
-    def start_subscription(self, owner_name, subscription_name, Sink):
+    def start_subscription(self, owner_name, subscription_name, Sink, filters=None,
+                           coalesce=None):
+        # a provider publishes in its initialize(), which completes before its dependents'
         sub = self.find_subscription(owner_name, subscription_name)
-        if sub is not None:
-            sub.add_subscriber(Sink)
-        else:
+        if sub is None:
             raise NameError("The specified subscription name was not found")
+        sub.add_subscriber(Sink, filters, coalesce)
 
     def end_subscription(self, owner_name, subscription_name, sink):
         sub = self.find_subscription(owner_name, subscription_name)
         if sub is not None:
             sub.remove_subscriber(sink)
 
-
 if __name__ == "__main__":
     cf = CFX()
     cf.initialize()
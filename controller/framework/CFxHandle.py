@@ -19,142 +19,435 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import asyncio
+import logging
 import threading
 import traceback
-import queue as Queue
 import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
 from controller.framework.CBT import CBT
+from controller.framework.CBTQueue import CBTQueue
+from controller.framework.CFxTimer import TimerEvent, NS_PER_SEC
+from controller.framework.CFxLogLimiter import LogRateLimiter
+
+# the Logger actions that are filtered by level
+LOG_LEVELS = {"LOG_DEBUG": logging.DEBUG, "LOG_INFO": logging.INFO,
+              "LOG_WARNING": logging.WARNING, "LOG_ERROR": logging.ERROR}
 
 class CFxHandle():
+    DEFAULT_CBT_POOL_SIZE = 64
+    # CBTs an asyncio worker task services before yielding to the other tasks on the loop
+    ASYNC_WORKER_BUDGET = 32
+    # width of a pending CBT expiry bucket and the period at which buckets are checked
+    EXPIRY_BUCKET_NS = NS_PER_SEC
+
     def __init__(self, CFxObject):
-        self._cm_queue = Queue.Queue()  # CBT queue
+        self._cm_queue = CBTQueue()  # CBT queue
         self._cm_instance = None
         self._cm_thread = None  # CM worker thread
+        self._cm_task = None  # CM worker task when running on the asyncio engine
+        self._event_loop = None  # shared event loop of the asyncio engine, set by CFx
         self._cm_config = None
         self.__cfx_object = CFxObject  # CFx object reference
-        self._exit_event = threading.Event()
-        self._timer_thread = None
+        self._timer_wheel = None  # shared framework timer wheel, set by CFx
+        self._timer_event = None  # the module's periodic timer_method event
         self._timer_interval = 0
         self._timer_loop_cnt = 1
         self._pending_cbts = {}
+        # deadline index of the pending CBTs, maps an expiry bucket to the CBTs that time out
+        # in it. Completed CBTs are removed from their bucket so expiry is O(expired).
+        self._request_timeout = 0  # in ns, 0 disables expiry, set by CFx
+        self._expiry_buckets = {}
+        self._expiry_keys = {}  # tag -> the expiry bucket of a pending CBT
+        self._expiry_cursor = time.monotonic_ns() // CFxHandle.EXPIRY_BUCKET_NS
+        self._expiry_event = None
         self._owned_cbts = {}
+        self._metrics = None  # CBTMetrics latency histograms, set by CFx when enabled
+        self._tracer = None  # CBTTracer, set by CFx when tracing is enabled
+        # the item being serviced and its start time, tracked for the watchdog when enabled
+        self._watched = False
+        self._in_service = None
+        # free list of released CBTs, set to deque(maxlen=0) to disable pooling
+        self._cbt_pool = deque(maxlen=CFxHandle.DEFAULT_CBT_POOL_SIZE)
+        # Logger's effective level, set by CFx. Nothing is filtered until Logger has set it.
+        self._log_level = logging.NOTSET
+        # set by CFx when Logger's flight recorder is enabled, it is dumped on an exception
+        self._log_recording = False
+        # per format string rate limit of the module's log records, set by CFx when enabled
+        self._log_limiter = None
+        self._log_report_event = None
 
     def submit_cbt(self, cbt):
         # submit CBT to the CFx
-        cbt.time_submit = time.time()
+        cbt.time_submit = time.monotonic_ns()
         self.__cfx_object.submit_cbt(cbt)
 
+    def submit_cbts(self, cbts):
+        # submit several CBTs to the CFx, those with the same recipient are enqueued together
+        cbts = list(cbts)
+        now = time.monotonic_ns()
+        for cbt in cbts:
+            cbt.time_submit = now
+        self.__cfx_object.submit_cbts(cbts)
+
     def create_cbt(self, initiator=None, recipient=None, action=None, params=None):
-        # create and return a CBT with optional parameters
-        cbt = CBT(initiator, recipient, action, params)
+        # create and return a CBT with optional parameters, reusing a pooled one if available
+        try:
+            cbt = self._cbt_pool.pop()
+            cbt.reinitialize(initiator, recipient, action, params)
+        except IndexError:
+            cbt = CBT(initiator, recipient, action, params)
         self._owned_cbts[cbt.tag] = cbt
-        cbt.time_create = time.time()
+        cbt.time_create = time.monotonic_ns()
         return cbt
 
     def create_linked_cbt(self, parent):
         cbt = self.create_cbt()
         cbt.parent = parent
         parent.child_count = parent.child_count + 1
-        cbt.time_create = time.time()
+        cbt.time_create = time.monotonic_ns()
         return cbt
 
     def free_cbt(self, cbt):
-        cbt.time_free = time.time()
+        cbt.time_free = time.monotonic_ns()
         if not cbt.child_count == 0:
             raise RuntimeError("Invalid attempt to free a linked CBT")
+        if self._tracer is not None:
+            self._tracer.record(cbt)
         if not cbt.parent is None:
             cbt.parent.child_count = cbt.parent.child_count - 1
             cbt.parent = None
-        # explicitly deallocate CBT
-        self._owned_cbts.pop(cbt.tag, None)
-        del cbt
+        # return the CBT to the free list, only CBTs created by this handle are pooled and the
+        # ownership check also guards against double frees
+        if self._owned_cbts.pop(cbt.tag, None) is cbt:
+            self._cbt_pool.append(cbt)
 
     def complete_cbt(self, cbt):
-        cbt.time_complete = time.time()
+        cbt.time_complete = time.monotonic_ns()
         cbt.completed = True
-        self._pending_cbts.pop(cbt.tag, None)
+        if self._pending_cbts.pop(cbt.tag, None) is not None:
+            self._unindex_pending_cbt(cbt.tag)
         if not cbt.child_count == 0:
             raise RuntimeError("Invalid attempt to complete a CBT with outstanding dependencies")
         self.__cfx_object.submit_cbt(cbt)
 
+    def submit_with_future(self, cbt, timeout=None):
+        """
+        Submit a request and return a future for its Response, an awaitable asyncio future on
+        the asyncio engine. The response resolves the future directly instead of being queued
+        back to this module, and the future raises TimeoutError if it does not complete within
+        timeout sec.
+        """
+        future = Future()
+        self.__cfx_object._cbt_futures[cbt.tag] = (self, future)
+        if timeout:
+            event = self._timer_wheel.schedule(timeout, self.__expire_future, future, cbt.tag)
+            future.add_done_callback(lambda _: event.cancel())
+        self.submit_cbt(cbt)
+        if self._event_loop is not None:
+            return asyncio.wrap_future(future, loop=self._event_loop)
+        return future
+
+    def __expire_future(self, future, tag):
+        # runs on the timer wheel thread. The entry is dropped so a response that never arrives
+        # does not leak it, a late response is routed to this module and freed there instead.
+        self.__cfx_object._cbt_futures.pop(tag, None)
+        try:
+            future.set_exception(TimeoutError("CBT {0} timed out".format(tag)))
+        except InvalidStateError:
+            pass
+
+    @property
+    def event_loop(self):
+        # the asyncio engine's event loop, None when running on the threaded engine
+        return self._event_loop
+
     def initialize(self):
         # intialize the Controller Module and start it's threads
         self._cm_instance.initialize()
 
         # create the worker thread, which is started by CFx
-        thread_name = self._cm_instance.__class__.__name__ + "::__worker"
-        self._cm_thread = threading.Thread(target=self.__worker, name=thread_name,
-                                           daemon=False)
+        if self._event_loop is None:
+            thread_name = self._cm_instance.__class__.__name__ + "::__worker"
+            self._cm_thread = threading.Thread(target=self.__worker, name=thread_name,
+                                               daemon=False)
 
         # enable the timer event if the timer_interval is specified
-        self._timer_interval = int(self._cm_config.get("TimerInterval", 0))
-        if self._timer_interval > 0:
-            # create the timer worker thread, which is started by CFx
-            thread_name = self._cm_instance.__class__.__name__ + "::__timer"
-            self._timer_thread = threading.Thread(target=self.__timer_worker,
-                                                  name=thread_name, daemon=False)
+        self.update_timer_interval(float(self._cm_config.get("TimerInterval", 0)))
+        if self._request_timeout > 0 and self._timer_wheel is not None:
+            period = CFxHandle.EXPIRY_BUCKET_NS / NS_PER_SEC
+            self._expiry_event = self.schedule_timer(period, self._expire_pending_cbts,
+                                                     interval=period)
+
+    def apply_config_changes(self, changes):
+        # runs on the worker, a reloaded configuration is applied in order with the CBTs
+        self._cm_config.update(changes)
+        if "TimerInterval" in changes:
+            self.update_timer_interval(float(changes["TimerInterval"]))
+        self._cm_instance.config_changed(changes)
 
     def update_timer_interval(self, interval):
+        # (re)schedule the periodic timer_method event, an interval of 0 disables it
         self._timer_interval = interval
+        if self._timer_event is not None:
+            self._timer_event.cancel()
+            self._timer_event = None
+        if interval > 0 and self._timer_wheel is not None:
+            self._timer_event = self.schedule_timer(interval, self.__timer_method,
+                                                    interval=interval)
+
+    def schedule_timer(self, delay, callback, *args, interval=0):
+        """
+        Run callback(*args) on this module's worker thread after delay seconds, and then every
+        interval seconds if interval is non zero. Returns a TimerEvent that can be cancelled.
+        """
+        return self._timer_wheel.schedule(delay, callback, *args, interval=interval,
+                                          deliver=self._cm_queue.put)
+
+    def cancel_timer(self, event):
+        event.cancel()
+
+    def run_blocking(self, func, *args):
+        """
+        Run a call that blocks on I/O. The asyncio engine runs it on the loop's default
+        executor so the shared loop is not stalled, the threaded engine calls it directly.
+        """
+        if self._event_loop is None:
+            return func(*args)
+        return self._event_loop.run_in_executor(None, func, *args)
+
+    def start(self):
+        # start servicing the module queue, asyncio worker tasks must be created on the loop
+        # thread or before the loop is started
+        if self._event_loop is None:
+            self._cm_thread.start()
+        else:
+            self._cm_task = self._event_loop.create_task(self.__async_worker())
 
     def __worker(self):
         # get CBT from the local queue and call process_cbt() of the
         # CBT recipient and passing the CBT as an argument
+        self._cm_queue.consumer_ident = threading.get_ident()
+        while self.__process_item(self._cm_queue.get()):
+            pass
+
+    async def __async_worker(self):
+        # the asyncio engine's equivalent of __worker. A get() on a non empty asyncio queue does
+        # not suspend, so the task yields after a budget of CBTs to keep the loop fair.
+        queue = self._cm_queue
         while True:
-            cbt = self._cm_queue.get()
-            # Terminate when CBT is None
-            if cbt is None:
-                self._cm_instance.terminate()
-                break
+            item = await queue.get()
+            budget = CFxHandle.ASYNC_WORKER_BUDGET
+            while self.__process_item(item):
+                budget -= 1
+                if queue.empty():
+                    break
+                if budget == 0:
+                    await asyncio.sleep(0)
+                    budget = CFxHandle.ASYNC_WORKER_BUDGET
+                item = queue.get_nowait()
             else:
-                try:
-                    if not cbt.completed:
-                        self._pending_cbts[cbt.tag] = cbt
-                    self._cm_instance.process_cbt(cbt)
-                except Exception as err:
-                    log_cbt = self.create_cbt(
-                        initiator=self._cm_instance.__class__.__name__,
-                        recipient="Logger", action="LOG_WARNING",
-                        params="Process CBT exception:{0}\n{1}\n{2}"
-                        .format(err, cbt, traceback.format_exc()))
-                    self.submit_cbt(log_cbt)
-                    if cbt.request.initiator == self._cm_instance.__class__.__name__:
-                        self.free_cbt(cbt)
-                    else:
-                        cbt.set_response(None, False)
-                        self.complete_cbt(cbt)
-                finally:
-                    self._cm_queue.task_done()
-
-    def __timer_worker(self):
-        # call the timer_method of each CM every timer_interval seconds
-        while not self._exit_event.wait(self._timer_interval):
-            try:
-                self._check_container_bounds()
-                self._cm_instance.timer_method()
-            except Exception as err:
-                log_cbt = self.create_cbt(
-                    initiator=self._cm_instance.__class__.__name__,
-                    recipient="Logger", action="LOG_WARNING",
-                    params="Timer Method exception:{0}\n{1}"
-                    .format(err, traceback.format_exc()))
-                self.submit_cbt(log_cbt)
+                return
+
+    def run_pending(self):
+        # service the queued CBTs and timer events on the calling thread until the queue is
+        # empty, used to drive a module without a worker eg., by the CBT replay tool
+        while not self._cm_queue.empty():
+            self.__process_item(self._cm_queue.get())
+
+    def __process_item(self, cbt):
+        # Terminate when CBT is None, returns False to stop the worker
+        if cbt is None:
+            self._cm_instance.terminate()
+            return False
+        if self._watched:
+            self._in_service = (cbt, time.monotonic_ns())
+        if isinstance(cbt, TimerEvent):
+            self.__process_timer(cbt)
+            self._in_service = None
+            return True
+        if self._metrics is not None:
+            self._metrics.record_dequeue(cbt)
+        elif self._tracer is not None and cbt.op_type == "Request":
+            # the start of the trace's service span, record_dequeue sets it with metrics on
+            cbt.time_dequeue = time.monotonic_ns()
+        try:
+            if not cbt.completed:
+                self._add_pending_cbt(cbt)
+            self._cm_instance.process_cbt(cbt)
+        except Exception as err:
+            log_cbt = self.create_cbt(
+                initiator=self._cm_instance.__class__.__name__,
+                recipient="Logger", action="LOG_WARNING",
+                params="Process CBT exception:{0}\n{1}\n{2}"
+                .format(err, cbt, traceback.format_exc()))
+            self.submit_cbt(log_cbt)
+            self.__dump_log_recorder("Process CBT exception")
+            if cbt.request.initiator == self._cm_instance.__class__.__name__:
+                self.free_cbt(cbt)
+            else:
+                cbt.set_response(None, False)
+                self.complete_cbt(cbt)
+        finally:
+            self._cm_queue.task_done()
+        self._in_service = None
+        return True
+
+    def __timer_method(self):
+        self._check_container_bounds()
+        self._cm_instance.timer_method()
+
+    def __process_timer(self, event):
+        # timer events are serviced on the worker thread in order with the module's CBTs
+        try:
+            event.run()
+        except Exception as err:
+            log_cbt = self.create_cbt(
+                initiator=self._cm_instance.__class__.__name__,
+                recipient="Logger", action="LOG_WARNING",
+                params="Timer Method exception:{0}\n{1}"
+                .format(err, traceback.format_exc()))
+            self.submit_cbt(log_cbt)
+            self.__dump_log_recorder("Timer Method exception")
+        finally:
+            self._cm_queue.task_done()
+
+    def _add_pending_cbt(self, cbt):
+        # track a CBT awaiting completion by this module and index it by its deadline
+        self._pending_cbts[cbt.tag] = cbt
+        if self._request_timeout > 0:
+            start = cbt.time_submit
+            if start is None:
+                start = time.monotonic_ns()
+            key = max(-(-(start + self._request_timeout) // CFxHandle.EXPIRY_BUCKET_NS),
+                      self._expiry_cursor)
+            bucket = self._expiry_buckets.get(key)
+            if bucket is None:
+                bucket = self._expiry_buckets[key] = {}
+            bucket[cbt.tag] = cbt
+            self._expiry_keys[cbt.tag] = key
+
+    def _unindex_pending_cbt(self, tag):
+        key = self._expiry_keys.pop(tag, None)
+        if key is not None:
+            bucket = self._expiry_buckets.get(key)
+            if bucket is not None:
+                bucket.pop(tag, None)
+
+    def take_pending_cbt(self, tag):
+        """
+        Remove and return the pending CBT with tag, None if it has already been completed or
+        has expired. Only the caller that takes a CBT completes it, so a response that races
+        the expiry of its request on another thread is completed once.
+        """
+        cbt = self._pending_cbts.pop(tag, None)
+        if cbt is not None:
+            self._unindex_pending_cbt(tag)
+        return cbt
+
+    def _expire_pending_cbts(self):
+        # complete the pending CBTs whose deadline has passed with a timeout response, only the
+        # buckets that have come due are visited
+        now = time.monotonic_ns() // CFxHandle.EXPIRY_BUCKET_NS
+        while self._expiry_cursor <= now:
+            bucket = self._expiry_buckets.pop(self._expiry_cursor, None)
+            self._expiry_cursor += 1
+            if not bucket:
+                continue
+            for tag, cbt in list(bucket.items()):
+                if cbt.child_count > 0:
+                    if self._pending_cbts.get(tag) is cbt:
+                        # still waiting on linked CBTs, these expire in their recipient modules
+                        key = now + 1 + self._request_timeout // CFxHandle.EXPIRY_BUCKET_NS
+                        self._expiry_buckets.setdefault(key, {})[tag] = cbt
+                        self._expiry_keys[tag] = key
+                    continue
+                # a response completing the CBT on another thread may have taken it already
+                if self.take_pending_cbt(tag) is not cbt:
+                    continue
+                cbt.set_response("The request has expired", False)
+                self.complete_cbt(cbt)
 
     def query_param(self, param_name=""):
         pv = self.__cfx_object.query_param(param_name)
         return pv
 
+    def log_allowed(self, action, params):
+        """
+        The level filter followed by the rate limit of the record's format string, params is
+        the message or a (format, args) tuple. A suppressed record is counted and reported
+        periodically instead. Errors are never rate limited.
+        """
+        level = LOG_LEVELS.get(action)
+        if level is None:
+            return True
+        if level < self._log_level:
+            return False
+        limiter = self._log_limiter
+        if limiter is None or level >= logging.ERROR:
+            return True
+        fmt = params[0] if isinstance(params, tuple) else params
+        return not isinstance(fmt, str) or limiter.allow(action, fmt)
+
+    def set_log_level(self, level, recording=False):
+        # called by Logger so the modules drop filtered records before creating a CBT
+        self.__cfx_object.set_log_level(level, recording)
+
+    def __dump_log_recorder(self, reason):
+        # an unhandled exception has Logger dump its flight recorder, after the exception's record
+        if self._log_recording:
+            module_name = self._cm_instance.__class__.__name__
+            cbt = self.create_cbt(initiator=module_name, recipient="Logger",
+                                  action="LOG_DUMP_RECORDER",
+                                  params={"Reason": "{0} in {1}".format(reason, module_name),
+                                          "Automatic": True})
+            self.submit_cbt(cbt)
+
+    def set_log_rate_limit(self, rate, burst, report_interval):
+        # called by Logger, a rate of 0 disables the rate limit
+        self.__cfx_object.set_log_rate_limit(rate, burst, report_interval)
+
+    def limit_logging(self, rate, burst, report_interval):
+        if self._log_report_event is not None:
+            self._log_report_event.cancel()
+            self._log_report_event = None
+        if rate <= 0:
+            self._log_limiter = None
+            return
+        self._log_limiter = LogRateLimiter(rate, burst)
+        if self._timer_wheel is not None:
+            self._log_report_event = self.schedule_timer(report_interval,
+                                                         self.__report_suppressed,
+                                                         interval=report_interval)
+
+    def __report_suppressed(self):
+        limiter = self._log_limiter
+        if limiter is None:
+            return
+        for action, fmt, count in limiter.take_suppressed():
+            cbt = self.create_cbt(initiator=self._cm_instance.__class__.__name__,
+                                  recipient="Logger", action=action,
+                                  params=("%d similar messages suppressed: %s", (count, fmt)))
+            self.submit_cbt(cbt)
+
     # Caller is the subscription source
     def publish_subscription(self, subscription_name):
         return self.__cfx_object.publish_subscription(self._cm_instance.__class__.__name__,
                                                       subscription_name, self._cm_instance)
 
     def remove_subscription(self, sub):
-        self.__cfx_object.RemoveSubscriptionPublisher(sub)
+        self.__cfx_object.remove_subscription(sub)
 
     # Caller is the subscription sink
-    def start_subscription(self, owner_name, subscription_name):
-        self.__cfx_object.start_subscription(owner_name, subscription_name, self._cm_instance)
+    def start_subscription(self, owner_name, subscription_name, filters=None, coalesce=None):
+        """
+        filters optionally restricts the updates delivered to this module, eg.,
+        {"OverlayId": overlay_ids, "UpdateType": "LnkEvConnected"}. coalesce requests the
+        updates as batched lists, see CFxSubscription.add_subscriber.
+        """
+        self.__cfx_object.start_subscription(owner_name, subscription_name, self._cm_instance,
+                                             filters, coalesce)
 
     def end_subscription(self, owner_name, subscription_name):
         self.__cfx_object.end_subscription(owner_name, subscription_name, self._cm_instance)
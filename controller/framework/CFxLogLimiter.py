@@ -0,0 +1,73 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import threading
+import time
+
+
+class LogRateLimiter():
+    """
+    Token bucket rate limit for a module's log records, one bucket per format string. A
+    bucket holds up to burst tokens and refills at rate tokens per sec, a record that finds
+    its bucket empty is suppressed and counted. take_suppressed() returns and clears the
+    counts so the module can report them as a single record.
+    """
+
+    def __init__(self, rate, burst):
+        self._rate = float(rate)
+        self._burst = max(1.0, float(burst))
+        self._lock = threading.Lock()
+        # format string -> [tokens, time of last refill, suppressed count, level]
+        self._buckets = {}
+
+    def allow(self, level, fmt):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(fmt)
+            if bucket is None:
+                self._buckets[fmt] = [self._burst - 1, now, 0, level]
+                return True
+            tokens = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return True
+            bucket[0] = tokens
+            bucket[2] += 1
+            bucket[3] = level
+            return False
+
+    def take_suppressed(self):
+        """
+        Returns a list of (level, format string, count) for the records suppressed since the
+        last call. Buckets that have refilled are discarded, so the format strings of
+        messages that are no longer logged do not accumulate.
+        """
+        now = time.monotonic()
+        suppressed = []
+        with self._lock:
+            for fmt, bucket in list(self._buckets.items()):
+                if bucket[2] > 0:
+                    suppressed.append((bucket[3], fmt, bucket[2]))
+                    bucket[2] = 0
+                elif bucket[0] + (now - bucket[1]) * self._rate >= self._burst:
+                    del self._buckets[fmt]
+        return suppressed
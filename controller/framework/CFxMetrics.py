@@ -0,0 +1,159 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import threading
+import time
+
+
+class LatencyHistogram():
+    """
+    Fixed bucket latency histogram in ns. Each power of two is split into 4 sub-buckets so a
+    reported percentile is within 25% of the true value, and recording a sample is a
+    bit_length, a shift and a list increment.
+    """
+    __slots__ = ("counts", "count", "total", "max")
+    NUM_BUCKETS = 252   # covers any 64 bit ns value
+
+    def __init__(self):
+        self.counts = [0] * LatencyHistogram.NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        shift = value.bit_length() - 3
+        if shift <= 0:
+            self.counts[value] += 1
+        else:
+            self.counts[(shift << 2) + (value >> shift)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, cnt in enumerate(other.counts):
+            if cnt:
+                self.counts[i] += cnt
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @staticmethod
+    def bucket_upper_bound(index):
+        if index < 8:
+            return index
+        shift = (index >> 2) - 1
+        return (((index & 3) + 5) << shift) - 1
+
+    def percentile(self, pct):
+        if self.count == 0:
+            return 0
+        target = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for i, cnt in enumerate(self.counts):
+            seen += cnt
+            if seen >= target:
+                return min(LatencyHistogram.bucket_upper_bound(i), self.max)
+        return self.max
+
+    def summary(self):
+        return {"Count": self.count,
+                "MeanUs": round(self.total / self.count / 1000, 1) if self.count else 0,
+                "P50Us": round(self.percentile(50) / 1000, 1),
+                "P90Us": round(self.percentile(90) / 1000, 1),
+                "P99Us": round(self.percentile(99) / 1000, 1),
+                "MaxUs": round(self.max / 1000, 1)}
+
+
+class CBTMetrics():
+    """
+    Latency histograms for one module keyed by (recipient module, action). Queue wait is
+    recorded by the recipient when it dequeues a request, service and end-to-end time are
+    recorded by the initiator when it dequeues the response. Each CFxHandle owns an instance
+    that its worker updates, except for the responses to requests submitted with a future which
+    are recorded by the thread that resolves the future. CFx merges them when queried.
+    """
+    QUEUE_WAIT = 0
+    SERVICE = 1
+    END_TO_END = 2
+
+    def __init__(self):
+        self._entries = {}
+        # serializes record_response, which also runs on the threads that resolve futures
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries.setdefault(key, (LatencyHistogram(), LatencyHistogram(),
+                                                   LatencyHistogram()))
+        return entry
+
+    def record_dequeue(self, cbt):
+        now = time.monotonic_ns()
+        if cbt.time_submit is None:
+            return
+        key = (cbt.request.recipient, cbt.request.action)
+        if cbt.op_type == "Request":
+            cbt.time_dequeue = now
+            self._entry(key)[CBTMetrics.QUEUE_WAIT].record(now - cbt.time_submit)
+        else:
+            self.record_response(key, cbt.time_submit, cbt.time_dequeue, cbt.time_complete, now)
+
+    def record_response(self, key, time_submit, time_dequeue, time_complete, now):
+        entry = self._entry(key)
+        with self._lock:
+            entry[CBTMetrics.END_TO_END].record(now - time_submit)
+            if time_dequeue is not None and time_complete is not None:
+                entry[CBTMetrics.SERVICE].record(time_complete - time_dequeue)
+
+    def merge_into(self, merged):
+        for key, entry in list(self._entries.items()):
+            target = merged.get(key)
+            if target is None:
+                target = merged[key] = (LatencyHistogram(), LatencyHistogram(),
+                                        LatencyHistogram())
+            for hist, src in zip(target, entry):
+                hist.merge(src)
+        return merged
+
+
+def summarize_metrics(metrics_list, actions=None):
+    """
+    Merge the per module metrics and return a JSON serializable summary keyed by
+    "recipient:action", optionally limited to the listed actions.
+    """
+    merged = {}
+    for metrics in metrics_list:
+        metrics.merge_into(merged)
+    summary = {}
+    for (recipient, action), entry in sorted(merged.items()):
+        if actions and action not in actions:
+            continue
+        summary["{0}:{1}".format(recipient, action)] = {
+            "QueueWait": entry[CBTMetrics.QUEUE_WAIT].summary(),
+            "Service": entry[CBTMetrics.SERVICE].summary(),
+            "EndToEnd": entry[CBTMetrics.END_TO_END].summary()}
+    return summary
@@ -0,0 +1,149 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+class CFxProfiler():
+    """
+    On-demand diagnostics driven by the CFX_PROFILE action. A cProfile session profiles the
+    worker of one module, or of every module, for a number of sec and writes the stats to
+    the log directory. Each profiler is enabled and disabled by a timer event serviced on the
+    worker it profiles, as cProfile only observes the thread that enabled it. On the asyncio
+    engine all modules share the loop thread, so a single profiler covers the whole loop.
+    A session that has not finished PROFILE_GRACE sec after its duration, eg., because a
+    profiled worker is stalled, is abandoned so that it does not block later requests.
+    Memory requests start and stop tracemalloc and write a snapshot, diffed against the
+    previous snapshot when there is one.
+    """
+
+    PROFILE_GRACE = 30
+
+    def __init__(self, handles, log_dir):
+        self._handles = handles
+        self._log_dir = log_dir
+        self._lock = threading.Lock()
+        # [target, profilers still running, collected stats, file, deadline]
+        self._session = None
+        self._snapshot = None
+
+    def _filename(self, kind, target, ext):
+        os.makedirs(self._log_dir, exist_ok=True)
+        return os.path.join(self._log_dir, "cfx-{0}-{1}-{2}.{3}".format(
+            kind, target, time.strftime("%Y%m%d-%H%M%S"), ext))
+
+    def request(self, params):
+        params = params or {}
+        if "Memory" in params:
+            return self.memory(params["Memory"], int(params.get("Top", 25)))
+        return self.profile(params.get("Module", "All"), float(params.get("Duration", 10)))
+
+    def profile(self, target, duration):
+        if target == "All":
+            handles = list(self._handles.values())
+        elif target in self._handles:
+            handles = [self._handles[target]]
+        else:
+            raise ValueError("No module named {0} is loaded".format(target))
+        if duration <= 0:
+            raise ValueError("The profile duration must be positive")
+        if handles[0]._event_loop is not None:  # pylint: disable=protected-access
+            # one profiler per thread, cProfile replaces the profiler enabled before it
+            handles = handles[:1]
+        now = time.monotonic()
+        with self._lock:
+            if self._session is not None and now < self._session[4]:
+                raise RuntimeError("A profile of {0} is in progress".format(self._session[0]))
+            filename = self._filename("profile", target, "prof")
+            session = self._session = [target, len(handles), [], filename,
+                                       now + duration + CFxProfiler.PROFILE_GRACE]
+        for handle in handles:
+            handle.schedule_timer(0, self._start_worker, handle, duration, session)
+        return {"Module": target, "Duration": duration, "File": filename}
+
+    def _start_worker(self, handle, duration, session):
+        # runs on the profiled worker
+        if self._session is not session:
+            return
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # another profiler is active on this thread
+            with self._lock:
+                if self._session is session:
+                    self._session = None
+            raise
+        handle.schedule_timer(duration, self._stop_worker, prof, session)
+
+    def _stop_worker(self, prof, session):
+        # runs on the profiled worker, the last one to stop writes the combined stats
+        prof.disable()
+        with self._lock:
+            if self._session is not session:
+                # the session was abandoned
+                return
+            session[1] -= 1
+            session[2].append(prof)
+            if session[1] > 0:
+                return
+            self._session = None
+        # a binary .prof for pstats/snakeviz and a text summary of the top functions
+        report = io.StringIO()
+        stats = pstats.Stats(*session[2], stream=report)
+        stats.dump_stats(session[3])
+        stats.sort_stats("cumulative").print_stats(50)
+        with open(os.path.splitext(session[3])[0] + ".txt", "w") as f:
+            f.write(report.getvalue())
+
+    def memory(self, command, top):
+        if command == "Start":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            self._snapshot = None
+            return {"Tracing": True}
+        if command == "Stop":
+            tracemalloc.stop()
+            self._snapshot = None
+            return {"Tracing": False}
+        if command != "Snapshot":
+            raise ValueError("Unknown memory command {0}".format(command))
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not started")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+        if self._snapshot is None:
+            lines = [str(stat) for stat in snapshot.statistics("lineno")[:top]]
+            kind = "memory"
+        else:
+            lines = [str(stat) for stat in snapshot.compare_to(self._snapshot, "lineno")[:top]]
+            kind = "memory-diff"
+        self._snapshot = snapshot
+        filename = self._filename(kind, "process", "txt")
+        with open(filename, "w") as f:
+            f.write("\n".join(lines))
+        return {"File": filename, "Top": lines}
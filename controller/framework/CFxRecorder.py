@@ -0,0 +1,114 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import gzip
+import pickle
+import threading
+import time
+
+RECORD_FORMAT_VERSION = 1
+
+
+def _is_credential(key):
+    # eg., the Username and Password of a Signal overlay or an x509 Keyfile
+    key = key.casefold()
+    return key == "username" or key.endswith(("password", "secret", "key", "keyfile"))
+
+
+def _redact_config(config):
+    """ A copy of config without the credential settings, which a CBT log must not expose """
+    if isinstance(config, dict):
+        return {key: _redact_config(val) for key, val in config.items()
+                if not (isinstance(key, str) and _is_credential(key))}
+    if isinstance(config, list):
+        return [_redact_config(val) for val in config]
+    return config
+
+
+def _open(filename, mode):
+    # logs named *.gz are compressed
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode)
+    return open(filename, mode)
+
+
+class CBTRecorder():
+    """
+    Appends every CBT submitted through CFx to a log of pickled tuples for replay by
+    controller.tools.CBTReplay. The log starts with a header holding the node id and the
+    configuration without its credentials, followed by one record per submission:
+    (ns since start, tag, parent tag, op_type, initiator, recipient, action, params,
+    response status, response data).
+    The record is pickled when the CBT is submitted, so later changes to a pooled CBT do not
+    alter it.
+    """
+
+    def __init__(self, filename, node_id, config):
+        self._file = _open(filename, "wb")
+        self._lock = threading.Lock()
+        self._start = time.monotonic_ns()
+        pickle.dump(("Header", RECORD_FORMAT_VERSION, node_id, _redact_config(config)),
+                    self._file, pickle.HIGHEST_PROTOCOL)
+
+    def record(self, cbt):
+        req = cbt.request
+        status = data = None
+        if cbt.op_type == "Response":
+            status = cbt.response.status
+            data = cbt.response.data
+        rec = (time.monotonic_ns() - self._start, cbt.tag,
+               None if cbt.parent is None else cbt.parent.tag, cbt.op_type, req.initiator,
+               req.recipient, req.action, req.params, status, data)
+        try:
+            buf = pickle.dumps(rec, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # keep a readable form of payloads that cannot be pickled, eg., sockets
+            buf = pickle.dumps(rec[:7] + (repr(req.params), status, repr(data)),
+                               pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(buf)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_records(filename):
+    """ Returns the header and a generator of the records of a CBT log """
+    log = _open(filename, "rb")
+    header = pickle.load(log)
+    if header[0] != "Header" or header[1] != RECORD_FORMAT_VERSION:
+        log.close()
+        raise ValueError("{0} is not a version {1} CBT log"
+                         .format(filename, RECORD_FORMAT_VERSION))
+
+    def records():
+        with log:
+            while True:
+                try:
+                    yield pickle.load(log)
+                except (EOFError, pickle.UnpicklingError):
+                    # the end of the log, or a record cut short when the controller stopped
+                    return
+    return header, records()
@@ -19,24 +19,112 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import itertools
+import threading
+
 
 class CFxSubscription():
     def __init__(self, owner_name, subscription_name):
         self._owner_name = owner_name
         self._owner = None
         self._subscription_name = subscription_name
-        self._subscribers = []
+        # sink -> filters, a dict of message key to the set of accepted values
+        self._subscribers = {}
+        # sink -> (interval, key fields) for subscribers that take coalesced batches
+        self._coalesced = {}
+        # sink -> [pending updates, flush timer]
+        self._batches = {}
+        self._batch_lock = threading.Lock()
+        self._seq = itertools.count()
 
     """
     sink must be an instance of a controller module
     """
 
-    def add_subscriber(self, sink):
-        self._subscribers.append(sink)
+    def add_subscriber(self, sink, filters=None, coalesce=None):
+        """
+        coalesce optionally requests batched delivery, eg., {"Interval": 0.05} delivers a list
+        of the updates posted in the last 50ms as the params of one CBT. Adding
+        "Key": ("OverlayId", "PeerId") lets a newer update supersede a still pending update
+        with the same key values.
+        """
+        if filters:
+            filters = {key: frozenset(vals) if isinstance(vals, (list, set, tuple, frozenset))
+                            else frozenset((vals,)) for key, vals in filters.items()}
+        self._subscribers[sink] = filters or None
+        if coalesce:
+            self._coalesced[sink] = (coalesce.get("Interval", 0.05),
+                                     tuple(coalesce.get("Key", ())))
+
+    def subscribers(self):
+        # the sink modules, eg., to fan out requests to them
+        return list(self._subscribers)
 
     def remove_subscriber(self, sink):
-        self._subscribers.remove(sink)
+        del self._subscribers[sink]
+        self._coalesced.pop(sink, None)
+        with self._batch_lock:
+            batch = self._batches.pop(sink, None)
+        if batch is not None and batch[1] is not None:
+            self._owner.cancel_timer(batch[1])
+
+    @staticmethod
+    def _accepts(filters, msg):
+        # updates that do not carry a filtered key, eg., source notices, are always delivered
+        if filters is None or not isinstance(msg, dict):
+            return True
+        for key, vals in filters.items():
+            if key in msg and msg[key] not in vals:
+                return False
+        return True
+
+    def _coalesce(self, sink, msg):
+        interval, key_fields = self._coalesced[sink]
+        if key_fields:
+            key = tuple(msg.get(field) for field in key_fields)
+        else:
+            key = next(self._seq)
+        with self._batch_lock:
+            batch = self._batches.get(sink)
+            if batch is None:
+                batch = self._batches[sink] = [{}, None]
+            pending = batch[0]
+            # a superseded update is dropped and the new one takes its place at the tail
+            pending.pop(key, None)
+            pending[key] = msg
+            if batch[1] is None:
+                batch[1] = self._owner.schedule_timer(interval, self._flush, sink, batch)
+
+    def _flush(self, sink, timed_batch=None):
+        # timed_batch is the batch whose flush timer fired, any other call cancels the timer
+        with self._batch_lock:
+            batch = self._batches.get(sink)
+            if batch is None or (timed_batch is not None and batch is not timed_batch):
+                return
+            del self._batches[sink]
+        if timed_batch is None and batch[1] is not None:
+            self._owner.cancel_timer(batch[1])
+        if not batch[0]:
+            return
+        owner = self._owner
+        owner.submit_cbts([owner.create_cbt(owner.module_name, sink.__class__.__name__,
+                                            self._subscription_name, list(batch[0].values()))])
 
     def post_update(self, msg):
-        for sink in self._subscribers:
-            self._owner.register_cbt(sink.__class__.__name__, self._subscription_name, msg)
+        # filters are applied before any CBT is allocated, the rest go out as a single batch
+        owner = self._owner
+        cbts = []
+        # a snapshot, subscribers are added and removed from the other modules' threads
+        for sink, filters in list(self._subscribers.items()):
+            if not self._accepts(filters, msg):
+                continue
+            if sink in self._coalesced:
+                if isinstance(msg, dict):
+                    self._coalesce(sink, msg)
+                    continue
+                # source notices are not batched, but must not overtake pending updates
+                self._flush(sink)
+            cbts.append(owner.create_cbt(owner.module_name, sink.__class__.__name__,
+                                         self._subscription_name, msg))
+        if cbts:
+            owner.submit_cbts(cbts)
@@ -0,0 +1,161 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import threading
+import time
+import traceback
+
+NS_PER_SEC = 1000000000
+
+
+class TimerEvent():
+    """
+    A scheduled callback. When it expires the timer wheel passes the event to its deliver
+    function, for module timers this posts the event into the module's CBT queue so the
+    callback runs on the module's worker thread.
+    """
+    __slots__ = ("callback", "args", "interval", "deadline", "tick", "cancelled", "queued",
+                 "deliver")
+    op_type = "Timer"
+
+    def __init__(self, callback, args=(), interval=0, deliver=None):
+        self.callback = callback
+        self.args = args
+        self.interval = interval    # reschedule period in ns, 0 for a one-shot timer
+        self.deadline = 0           # expiry time in monotonic ns
+        self.tick = 0               # wheel tick on which the event expires
+        self.cancelled = False
+        self.queued = False         # delivered but not yet serviced by its consumer
+        self.deliver = deliver
+
+    def __repr__(self):
+        state = "TimerEvent<callback=%s, interval=%d, deadline=%d, cancelled=%r, queued=%r>" % \
+                (getattr(self.callback, "__qualname__", self.callback), self.interval,
+                 self.deadline, self.cancelled, self.queued)
+        return state
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        self.queued = False
+        if not self.cancelled:
+            self.callback(*self.args)
+
+
+class TimerWheel():
+    """
+    Hashed timer wheel shared by all modules. Events are hashed into a slot by their expiry
+    tick and a single thread visits one slot per tick, so scheduling and cancelling are O(1)
+    and each tick only touches the events hashed to the current slot.
+    """
+    NUM_SLOTS = 512
+
+    def __init__(self, resolution=0.1):
+        self._tick_ns = max(int(resolution * NS_PER_SEC), 1000000)
+        self._slots = tuple([] for _ in range(TimerWheel.NUM_SLOTS))
+        self._lock = threading.Lock()
+        self._exit_event = threading.Event()
+        self._cur_tick = time.monotonic_ns() // self._tick_ns
+        self._thread = None
+
+    @property
+    def resolution(self):
+        return self._tick_ns / NS_PER_SEC
+
+    def schedule(self, delay, callback, *args, interval=0, deliver=None):
+        """
+        Schedule callback(*args) to run after delay seconds, and then every interval seconds
+        if interval is non zero. The returned event can be cancelled. If deliver is None the
+        callback runs on the wheel thread and must not block.
+        """
+        event = TimerEvent(callback, args, int(interval * NS_PER_SEC), deliver)
+        event.deadline = time.monotonic_ns() + int(delay * NS_PER_SEC)
+        with self._lock:
+            self._insert(event)
+        return event
+
+    def _insert(self, event):
+        # round up so an event never expires before its deadline, expired deadlines go into
+        # the next slot to be serviced
+        tick = max(-(-event.deadline // self._tick_ns), self._cur_tick + 1)
+        event.tick = tick
+        self._slots[tick % TimerWheel.NUM_SLOTS].append(event)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.__worker, name="CFx::TimerWheel",
+                                        daemon=False)
+        self._thread.start()
+
+    def terminate(self):
+        self._exit_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __worker(self):
+        while not self._exit_event.wait(self._next_wait()):
+            now_tick = time.monotonic_ns() // self._tick_ns
+            # after a long stall each slot only needs to be visited once
+            if now_tick - self._cur_tick > TimerWheel.NUM_SLOTS:
+                self._cur_tick = now_tick - TimerWheel.NUM_SLOTS
+            while self._cur_tick < now_tick:
+                self._advance()
+
+    def _next_wait(self):
+        return ((self._cur_tick + 1) * self._tick_ns - time.monotonic_ns()) / NS_PER_SEC
+
+    def _advance(self):
+        expired = []
+        with self._lock:
+            self._cur_tick += 1
+            tick = self._cur_tick
+            slot = self._slots[tick % TimerWheel.NUM_SLOTS]
+            remaining = []
+            for event in slot:
+                if event.cancelled:
+                    continue
+                if event.tick > tick:
+                    remaining.append(event)
+                else:
+                    expired.append(event)
+            slot[:] = remaining
+            for event in expired:
+                if event.interval > 0:
+                    event.deadline += event.interval
+                    now = time.monotonic_ns()
+                    if event.deadline <= now:
+                        # skip over periods missed while stalled instead of firing a burst
+                        event.deadline = now + event.interval
+                    self._insert(event)
+        for event in expired:
+            self._fire(event)
+
+    def _fire(self, event):
+        if event.deliver is None:
+            try:
+                event.callback(*event.args)
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+        elif not event.queued:
+            # a periodic event still waiting in its consumer's queue is not posted again
+            event.queued = True
+            event.deliver(event)
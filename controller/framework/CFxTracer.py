@@ -0,0 +1,102 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import time
+from collections import deque
+
+
+class CBTTracer():
+    """
+    Opt-in recorder of CBT lifecycles. A record is taken when the initiator frees a CBT and
+    is kept in a fixed size ring buffer, export() converts the buffer to the Chrome
+    trace_event format for viewing in chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, node_id, size):
+        self.node_id = node_id
+        self._records = deque(maxlen=size)
+        # maps the monotonic CBT timestamps to wall clock so traces of several nodes line up
+        self._wall_offset = time.time_ns() - time.monotonic_ns()
+
+    def record(self, cbt):
+        # a tuple append on a bounded deque, called from the freeing module's thread
+        parent = cbt.parent
+        status = None
+        if cbt.response is not None:
+            status = cbt.response.status
+        self._records.append((cbt.tag, None if parent is None else parent.tag,
+                              cbt.request.initiator, cbt.request.recipient, cbt.request.action,
+                              status, cbt.time_create, cbt.time_submit, cbt.time_dequeue,
+                              cbt.time_complete, cbt.time_free))
+
+    def clear(self):
+        self._records.clear()
+
+    def _us(self, ns):
+        return (ns + self._wall_offset) / 1000
+
+    def export(self):
+        """
+        Return the recorded CBTs as a trace_event dict. Each CBT is a span on its initiator's
+        track from submission to free, with the recipient's service time as a nested span on
+        the recipient's track. Flow arrows link a parent CBT to its linked children. Traces
+        from several nodes can be merged by concatenating their traceEvents.
+        """
+        events = []
+        records = list(self._records)
+        # trace viewers expect numeric ids, modules are named by thread_name metadata
+        try:
+            pid = int(str(self.node_id)[:7], 16)
+        except ValueError:
+            pid = 1
+        tracks = {}
+        for rec in records:
+            tracks.setdefault(rec[2], len(tracks) + 1)
+            tracks.setdefault(rec[3], len(tracks) + 1)
+        for (tag, parent, initiator, recipient, action, status, t_create, t_submit,
+             t_dequeue, t_complete, t_free) in records:
+            init_tid = tracks[initiator]
+            recp_tid = tracks[recipient]
+            start = t_submit if t_submit is not None else t_create
+            if start is None or t_free is None:
+                continue
+            args = {"Tag": tag, "Parent": parent, "Initiator": initiator,
+                    "Recipient": recipient, "Status": status}
+            events.append({"name": action, "cat": "cbt", "ph": "X", "pid": pid,
+                           "tid": init_tid, "ts": self._us(start),
+                           "dur": (t_free - start) / 1000, "args": args})
+            if t_dequeue is not None and t_complete is not None:
+                events.append({"name": action, "cat": "service", "ph": "X", "pid": pid,
+                               "tid": recp_tid, "ts": self._us(t_dequeue),
+                               "dur": (t_complete - t_dequeue) / 1000, "args": args})
+            if parent is not None:
+                # the arrow starts inside the parent's service span on the initiator's track
+                events.append({"name": "linked", "cat": "flow", "ph": "s", "id": tag,
+                               "pid": pid, "tid": init_tid, "ts": self._us(start)})
+                events.append({"name": "linked", "cat": "flow", "ph": "f", "bp": "e",
+                               "id": tag, "pid": pid, "tid": recp_tid,
+                               "ts": self._us(t_dequeue if t_dequeue is not None else start)})
+        for track, tid in tracks.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": track}})
+        events.append({"name": "process_name", "ph": "M", "pid": pid,
+                       "args": {"name": "ipop " + str(self.node_id)}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,94 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import sys
+import time
+import traceback
+from controller.framework.CFxTimer import NS_PER_SEC
+
+
+def describe_item(item):
+    # a short description of a queued CBT or timer event
+    if item.op_type == "Timer":
+        return "Timer {0}".format(getattr(item.callback, "__qualname__", item.callback))
+    return "{0} {1} from {2}".format(item.op_type, item.request.action, item.request.initiator)
+
+
+class HandlerWatchdog():
+    """
+    Flags module workers that have been executing the same CBT or timer callback for longer
+    than the budget. check() runs periodically on the timer wheel thread, it reads each
+    handle's in service item and captures the stack of a stalled worker from
+    sys._current_frames(). Each stall is reported once.
+    """
+
+    def __init__(self, handles, budget):
+        self._handles = handles
+        self._budget = int(budget * NS_PER_SEC)
+        # module name -> [stall count, key of the last reported stall, its details]
+        self._stalls = {}
+
+    @staticmethod
+    def _worker_ident(handle):
+        # pylint: disable=protected-access
+        queue = handle._cm_queue
+        return getattr(queue, "consumer_ident", None) or getattr(queue, "loop_thread_id", None)
+
+    def check(self):
+        now = time.monotonic_ns()
+        frames = None
+        for name, handle in list(self._handles.items()):
+            busy = handle._in_service  # pylint: disable=protected-access
+            if busy is None or now - busy[1] < self._budget:
+                continue
+            item, since = busy
+            entry = self._stalls.get(name)
+            if entry is None:
+                entry = self._stalls[name] = [0, None, None]
+            if entry[1] == (id(item), since):
+                continue
+            if frames is None:
+                frames = sys._current_frames()  # pylint: disable=protected-access
+            frame = frames.get(self._worker_ident(handle))
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            entry[0] += 1
+            entry[1] = (id(item), since)
+            entry[2] = {"Item": describe_item(item), "ElapsedMs": round((now - since) / 1e6),
+                        "Stack": stack}
+            log_cbt = handle.create_cbt(name, "Logger", "LOG_WARNING",
+                                        "Handler stalled for {0:.1f}s in {1}: {2}\n{3}"
+                                        .format((now - since) / NS_PER_SEC, name,
+                                                entry[2]["Item"], stack))
+            handle.submit_cbt(log_cbt)
+
+    def stats(self):
+        """ Returns the stall count, last stall and current long running item per module """
+        now = time.monotonic_ns()
+        stats = {}
+        for name, handle in list(self._handles.items()):
+            entry = self._stalls.get(name, (0, None, None))
+            busy = handle._in_service  # pylint: disable=protected-access
+            current = None
+            if busy is not None and now - busy[1] >= self._budget:
+                current = {"Item": describe_item(busy[0]),
+                           "ElapsedMs": round((now - busy[1]) / 1e6)}
+            stats[name] = {"Stalls": entry[0], "LastStall": entry[2], "Current": current}
+        return stats
@@ -19,6 +19,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import time
 from abc import ABCMeta, abstractmethod
 
 
@@ -29,11 +30,21 @@ class ControllerModule():
 
     __metaclass__ = ABCMeta
 
+    # settings that take effect on a configuration reload, TimerInterval always does
+    RELOADABLE_SETTINGS = ()
+
     def __init__(self, cfx_handle, module_config, module_name):
         #self._pending_cbt = {}
         self._cfx_handle = cfx_handle
         self._cm_config = module_config
         self._module_name = module_name
+        # maps (op_type, action) to [handler, call count, cumulative handler time in ns]
+        self._cbt_handlers = {}
+        # handlers for actions without a registered handler, keyed by op_type
+        self._default_handlers = {"Request": [self.req_handler_default, 0, 0],
+                                  "Response": [self.resp_handler_default, 0, 0]}
+        # parent CBT tag to [status, {child tag: child response data}] for fan_out_cbts()
+        self._fan_in = {}
 
     @abstractmethod
     def initialize(self):
@@ -51,6 +62,21 @@ class ControllerModule():
     def terminate(self):
         pass
 
+    def config_changed(self, changes):
+        """
+        Called on the module's worker after a configuration reload has updated the module's
+        config with changes, a dict of the changed reloadable settings. Settings that are
+        read when used take effect without any action, override this to apply the others.
+        """
+        pass
+
+    def is_reloadable(self, key, value):
+        """
+        Whether the changed setting key, with the reloaded value, takes effect without a
+        restart. By default only the settings listed in RELOADABLE_SETTINGS do.
+        """
+        return key == "TimerInterval" or key in self.RELOADABLE_SETTINGS
+
     @property
     def node_id(self):
         return self._cm_config["NodeId"]
@@ -73,8 +99,90 @@ class ControllerModule():
         cbt.set_response(log, False)
         self.complete_cbt(cbt)
 
-    # create and submit CBT mask method
+    def resp_handler_default(self, cbt):
+        # fan-in, the parent is completed when its last linked CBT has responded
+        parent_cbt = cbt.parent
+        cbt_tag = cbt.tag
+        cbt_data = cbt.response.data
+        cbt_status = cbt.response.status
+        self.free_cbt(cbt)
+        if parent_cbt is None:
+            return
+        fan_in = self._fan_in.get(parent_cbt.tag)
+        if fan_in is not None:
+            fan_in[0] = fan_in[0] and cbt_status
+            fan_in[1][cbt_tag] = cbt_data
+        if parent_cbt.child_count == 0:
+            if fan_in is not None:
+                del self._fan_in[parent_cbt.tag]
+                cbt_status = fan_in[0]
+                cbt_data = list(fan_in[1].values())
+                if len(cbt_data) == 1:
+                    cbt_data = cbt_data[0]
+            parent_cbt.set_response(cbt_data, cbt_status)
+            self.complete_cbt(parent_cbt)
+
+    def fan_out_cbts(self, parent, requests):
+        """
+        Create a CBT linked to parent for each (recipient, action, params) in requests and
+        submit them together. Their responses are gathered by resp_handler_default, which
+        completes parent when the last one arrives. The parent's status is True only if every
+        child succeeded and its data is the list of child data in request order, or the data
+        itself for a single child.
+        """
+        children = []
+        for recipient, action, params in requests:
+            cbt = self.create_linked_cbt(parent)
+            cbt.set_request(self._module_name, recipient, action, params)
+            children.append(cbt)
+        if not children:
+            parent.set_response([], True)
+            self.complete_cbt(parent)
+            return children
+        self._fan_in[parent.tag] = [True, dict.fromkeys(cbt.tag for cbt in children)]
+        self.submit_cbts(children)
+        return children
+
+    def register_cbt_handler(self, op_type, action, handler):
+        """
+        Map a CBT op_type ("Request"/"Response") and request action to a bound handler method.
+        Modules register their handlers once in initialize() and use dispatch_cbt() in
+        process_cbt() to invoke them.
+        """
+        self._cbt_handlers[(op_type, action)] = [handler, 0, 0]
+
+    def register_cbt_handlers(self, op_type, handlers):
+        for action, handler in handlers.items():
+            self.register_cbt_handler(op_type, action, handler)
+
+    def dispatch_cbt(self, cbt):
+        entry = self._cbt_handlers.get((cbt.op_type, cbt.request.action))
+        if entry is None:
+            entry = self._default_handlers[cbt.op_type]
+        start = time.monotonic_ns()
+        try:
+            entry[0](cbt)
+        finally:
+            entry[1] += 1
+            entry[2] += time.monotonic_ns() - start
+
+    def query_handler_stats(self):
+        stats = {}
+        handlers = dict(self._cbt_handlers)
+        for op_type, entry in self._default_handlers.items():
+            handlers[(op_type, "*")] = entry
+        for (op_type, action), entry in handlers.items():
+            if entry[1] > 0:
+                stats["{0}:{1}".format(op_type, action)] = {
+                    "Handler": entry[0].__name__, "Calls": entry[1],
+                    "TotalTimeNs": entry[2], "MeanTimeNs": entry[2] // entry[1]}
+        return stats
+
+    # create and submit CBT mask method, a log record below Logger's level or over its rate
+    # limit is dropped
     def register_cbt(self, _recipient, _action, _params=None):
+        if _recipient == "Logger" and not self._cfx_handle.log_allowed(_action, _params):
+            return None
         cbt = self._cfx_handle.create_cbt(
             initiator=self._module_name,
             recipient=_recipient,
@@ -84,6 +192,22 @@ class ControllerModule():
         self._cfx_handle.submit_cbt(cbt)
         return cbt
 
+    # create and submit CBT, returns a future for its Response
+    def register_cbt_future(self, _recipient, _action, _params=None, timeout=None):
+        cbt = self._cfx_handle.create_cbt(
+            initiator=self._module_name,
+            recipient=_recipient,
+            action=_action,
+            params=_params
+        )
+        return self._cfx_handle.submit_with_future(cbt, timeout)
+
+    def schedule_timer(self, delay, callback, *args, interval=0):
+        return self._cfx_handle.schedule_timer(delay, callback, *args, interval=interval)
+
+    def cancel_timer(self, event):
+        self._cfx_handle.cancel_timer(event)
+
     def create_cbt(self, initiator, recipient, action, params=None):
         return self._cfx_handle.create_cbt(initiator, recipient, action, params)
 
@@ -99,5 +223,22 @@ class ControllerModule():
     def submit_cbt(self, cbt):
         self._cfx_handle.submit_cbt(cbt)
 
+    def submit_cbts(self, cbts):
+        self._cfx_handle.submit_cbts(cbts)
+
+    def submit_with_future(self, cbt, timeout=None):
+        return self._cfx_handle.submit_with_future(cbt, timeout)
+
     def log(self, level, msg, *args):
-        self.register_cbt("Logger", level, _params=(msg, args))
+        """
+        Log msg % args. A record below Logger's level is dropped before its arguments are
+        rendered, so pass objects rather than str(obj). Objects are rendered here as they
+        may change before Logger formats the record. Records are rate limited by msg, so a
+        message that varies belongs in args.
+        """
+        if not self._cfx_handle.log_allowed(level, msg):
+            return
+        args = tuple(arg if isinstance(arg, (str, int, float)) else str(arg) for arg in args)
+        cbt = self._cfx_handle.create_cbt(initiator=self._module_name, recipient="Logger",
+                                          action=level, params=(msg, args))
+        self._cfx_handle.submit_cbt(cbt)
@@ -29,22 +29,42 @@ CONFIG = {
         "NodeId": "",  # Single unique node Id for all overlays
         "IpopVersion": IPOP_VER_REL,
         "Model": "Default",
-        "RequestTimeout": 120,
+        "RequestTimeout": 120,  # Pending CBTs are expired after this many sec, 0 disables
+        "Engine": "Threaded",   # Module execution engine, <Threaded>/<Asyncio>
+        "QueueMode": "Fifo",    # CBT queue service order, <Fifo>/<Priority>
+        "QueueSize": 0,         # Queue depth at which requests are refused, 0 is unbounded
+        "QueueOverloadPolicy": "Block",  # Overload handling <Block>/<DropOldest>/<Fail>
+        "QueueBlockTimeout": 5, # Max sec a submitter blocks before the request fails
+        "CbtPoolSize": 64,      # Freed CBTs kept for reuse by each module, 0 disables pooling
+        "TimerResolution": 0.1, # Tick of the shared module timer wheel in sec
+        "InitThreads": 4,       # Modules initialized concurrently, 1 initializes them in order
+        "Metrics": True,        # Collect per action CBT latency histograms, SIGUSR1 dumps them
+        "TraceBufferSize": 0,   # CBT lifecycles kept for Chrome trace export, 0 disables
+        "HandlerBudget": 0,     # Sec a handler may run before it is reported stalled, 0 disables
+        "RecordFile": "",       # Log every submitted CBT here for CBTReplay, *.gz compresses
     },
     "Logger": {
         "Enabled": True,
         "LogLevel": "ERROR",      # Types of messages to log, <ERROR>/<WARNING>/<INFO>/<DEBUG>
-        "Device": "File",      # Send logging output to <File> or <Console>
+        "Device": "File",      # Send logging output to <File>/<Console>/<All>/<Binary>
         "Directory": "./logs/",
         "CtrlLogFileName": "ctrl.log",
         "TincanLogFileName": "tincan_log",
         "MaxFileSize": 1000000,   # 1MB sized log files
         "MaxArchives": 5,   # Keep up to 5 files of history
-        "ConsoleLevel": None
+        "ConsoleLevel": None,
+        "BufferSize": 8192,       # Records buffered for the log writer thread, 0 writes inline
+        "FlushRecords": 512,      # Buffered records that start a batched write
+        "FlushInterval": 0.5,     # Max sec a record stays buffered before it is written
+        "RateLimit": 0,           # Records per sec of a module's message, 0 disables the limit
+        "RateBurst": 50,          # Records of a message logged before the rate limit applies
+        "SuppressionReport": 30,  # Interval in sec of the suppressed messages record
+        "FlightRecorder": 0,      # Records of all levels kept in memory for a dump, 0 disables
+        "DumpInterval": 60,       # Min sec between flight recorder dumps made on an error
     },
     "OverlayVisualizer": {
         "Enabled": False,
-        "TimerInterval": 30,                # Timer thread interval
+        "TimerInterval": 30,                # Timer interval in sec
         "WebServiceAddress": ":5000",       # Visualizer webservice URL
         "NodeName": "",                     # Node Name as seen from the UI
         "Dependencies": ["Logger"]
@@ -71,7 +91,8 @@ CONFIG = {
     "LinkManager": {
         "Enabled": True,
         "Dependencies": ["Logger", "TincanInterface", "Signal"],
-        "TimerInterval": 30,        # Timer thread interval in sec
+        "InitAfter": ["OverlayVisualizer"],  # Optional providers initialized first if loaded
+        "TimerInterval": 30,        # Timer interval in sec
         "LinkSetupTimeout": 120
     },
     "Topology": {
@@ -82,8 +103,10 @@ CONFIG = {
         "MaxSuccessors": 2,
         "MaxOnDemandEdges": 1,
         "MaxConcurrentEdgeSetup": 2,
+        "LinkEventBatchInterval": 0.05,  # Link events are delivered in batches every <N> sec
         "Role": "Switch",
-        "Dependencies": ["Logger", "TincanInterface", "LinkManager"]
+        "Dependencies": ["Logger", "TincanInterface", "LinkManager"],
+        "InitAfter": ["OverlayVisualizer"]
     },
     "UsageReport": {
         "Enabled": False,
@@ -94,7 +117,8 @@ CONFIG = {
     },
     "BridgeController": {
         "Enabled": True,
-        "Dependencies": ["Logger", "LinkManager"]
+        "Dependencies": ["Logger", "LinkManager"],
+        "InitAfter": ["OverlayVisualizer"]
     }
 }
 
@@ -293,7 +293,16 @@ class BridgeController(ControllerModule):
                                   "OverlayVisualizer module not loaded."
                                   " Visualization data will not be sent.")
 
-        self._cfx_handle.start_subscription("LinkManager", "LNK_TUNNEL_EVENTS")
+        # only connect and remove events of the overlays bridged here are acted upon
+        self._cfx_handle.start_subscription(
+            "LinkManager", "LNK_TUNNEL_EVENTS",
+            filters={"OverlayId": list(self._ovl_net),
+                     "UpdateType": ["LnkEvConnected", "LnkEvRemoved"]})
+        self.register_cbt_handlers("Request", {
+            "BRG_ADD_PORT": self.req_handler_add_port,
+            "BRG_DEL_PORT": self.req_handler_del_port,
+            "LNK_TUNNEL_EVENTS": self.req_handler_manage_bridge,
+            "VIS_DATA_REQ": self.req_handler_vis_data})
         self.register_cbt("Logger", "LOG_INFO", "Module Loaded")
 
     def req_handler_add_port(self, cbt):
@@ -335,25 +344,7 @@ class BridgeController(ControllerModule):
         pass
 
     def process_cbt(self, cbt):
-        if cbt.op_type == "Request":
-            if cbt.request.action == "BRG_ADD_PORT":
-                self.req_handler_add_port(cbt)
-            elif cbt.request.action == "BRG_DEL_PORT":
-                self.req_handler_del_port(cbt)
-            elif cbt.request.action == "LNK_TUNNEL_EVENTS":
-                self.req_handler_manage_bridge(cbt)
-            elif cbt.request.action == "VIS_DATA_REQ":
-                self.req_handler_vis_data(cbt)
-            else:
-                self.req_handler_default(cbt)
-        elif cbt.op_type == "Response":
-            parent_cbt = cbt.parent
-            cbt_data = cbt.response.data
-            cbt_status = cbt.response.status
-            self.free_cbt(cbt)
-            if (parent_cbt is not None and parent_cbt.child_count == 1):
-                parent_cbt.set_response(cbt_data, cbt_status)
-                self.complete_cbt(parent_cbt)
+        self.dispatch_cbt(cbt)
 
     def terminate(self):
         try:
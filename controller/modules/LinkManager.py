@@ -24,6 +24,7 @@ import threading
 from collections import namedtuple
 import time
 from controller.framework.ControllerModule import ControllerModule
+from controller.framework.CFxTimer import NS_PER_SEC
 
 LinkEvent = ["LnkEvCreating", "LnkEvConnected", "LnkEvDisconnected", "LnkEvRemoved",
              "LnkEvAuthorized", "LnkEvDeauthorized"]
@@ -72,7 +73,7 @@ class Tunnel():
         self.peer_mac = None
         self._tunnel_state = tnl_state
         self.creation_start_time = time.time()
-        self.timeout = time.time() + state_timeout # timeout for current phase
+        self.timeout = time.monotonic_ns() + state_timeout * NS_PER_SEC # timeout for current phase
 
     def __repr__(self):
         state = "Tunnel<tnlid=%s, overlay_id=%s, peer_id=%s, tap_name=%s, mac=%s, link=%s, "\
@@ -99,6 +100,8 @@ class Tunnel():
 
 class LinkManager(ControllerModule):
 
+    RELOADABLE_SETTINGS = ("LinkSetupTimeout", "Stun", "Turn")
+
     def __init__(self, cfx_handle, module_config, module_name):
         super(LinkManager, self).__init__(cfx_handle, module_config, module_name)
         self._tunnels = {}   # maps tunnel id to its descriptor
@@ -135,6 +138,41 @@ class LinkManager(ControllerModule):
                 for ign_inf in ol_cfg["IgnoredNetInterfaces"]:
                     self._ignored_net_interfaces[olid].add(ign_inf)
 
+        self.register_cbt_handlers("Request", {
+            # Create Link: Phase 1 Node A
+            # TOP wants a new link, first SIGnal peer to create endpt
+            "LNK_CREATE_TUNNEL": self.req_handler_create_tunnel,
+            # Create Link: Phase 3 Node B
+            # Rcvd peer req to create endpt, send to TCI
+            "LNK_REQ_LINK_ENDPT": self.req_handler_req_link_endpt,
+            # Create Link: Phase 7 Node B
+            # CAS rcvd from peer, sends to TCI to update link's peer CAS info
+            "LNK_ADD_PEER_CAS": self.req_handler_add_peer_cas,
+            "LNK_REMOVE_TUNNEL": self.req_handler_remove_tnl,
+            "LNK_REMOVE_LINK": self.req_handler_remove_link,
+            "LNK_QUERY_TUNNEL_INFO": self.req_handler_query_tunnels_info,
+            "VIS_DATA_REQ": self.req_handler_query_viz_data,
+            "TCI_TINCAN_MSG_NOTIFY": self.req_handler_tincan_msg,
+            "LNK_ADD_IGN_INF": self.req_handler_add_ign_inf,
+            "LNK_AUTH_TUNNEL": self.req_handler_auth_tunnel})
+        self.register_cbt_handlers("Response", {
+            # Create Link: Phase 5 Node A
+            # Attempt to create our end of link
+            # Create Link: Phase 9 Node A
+            # Link created, notify others
+            "SIG_REMOTE_ACTION": self.resp_handler_remote_action,
+            # Create Link: Phase 4 Node B
+            # Create Link: Phase 6 Node A
+            # SIGnal to peer to update CAS
+            # Create Link: Phase 8 Node B
+            # Complete setup
+            "TCI_CREATE_LINK": self.resp_handler_create_link_endpt,
+            # Create Link: Phase 2 Node A
+            # Retrieved our node data for response
+            "TCI_CREATE_TUNNEL": self.resp_handler_create_tunnel,
+            "TCI_QUERY_LINK_STATS": self.resp_handler_query_link_stats,
+            "TCI_REMOVE_LINK": self.resp_handler_remove_link,
+            "TCI_REMOVE_TUNNEL": self.resp_handler_remove_tunnel})
         self.register_cbt("Logger", "LOG_INFO", "Module Loaded")
 
     def _get_ignored_tap_names(self, overlay_id, new_inf_name=None):
@@ -227,7 +265,7 @@ class LinkManager(ControllerModule):
         self._tunnels[tnlid].mac = tnl_desc["MAC"]
         self._tunnels[tnlid].tap_name = tnl_desc["TapName"]
         self._tunnels[tnlid].fpr = tnl_desc["FPR"]
-        self.register_cbt("Logger", "LOG_DEBUG", "Updated tunnels:{}".format(self._tunnels[tnlid]))
+        self.log("LOG_DEBUG", "Updated tunnels:%s", self._tunnels[tnlid])
 
     def _query_link_stats(self):
         """Query the status of links that have completed creation process"""
@@ -286,8 +324,8 @@ class LinkManager(ControllerModule):
                         tnl.link.stats = data[tnlid][lnkid]["Stats"]
                         tnl.link.status_retry = 0
                     else:
-                        self.register_cbt("Logger", "LOG_WARNING", "Unrecognized tunnel state "
-                                          "{0}:{1}".format(lnkid, data[tnlid][lnkid]["Status"]))
+                        self.log("LOG_WARNING", "Unrecognized tunnel state %s:%s", lnkid,
+                                 data[tnlid][lnkid]["Status"])
         self.free_cbt(cbt)
 
     def _cleanup_tunnel(self, tnl):
@@ -479,8 +517,7 @@ class LinkManager(ControllerModule):
         else:
             self._peers[olid][peer_id] = tnlid
             self._tunnels[tnlid] = Tunnel(tnlid, olid, peer_id)
-            self.register_cbt("Logger", "LOG_DEBUG", "TunnelId:{0} auth for Peer:{1} completed"
-                              .format(tnlid[:7], peer_id[:7]))
+            self.log("LOG_DEBUG", "TunnelId:%s auth for Peer:%s completed", tnlid[:7], peer_id[:7])
             cbt.set_response("Auth completed, TunnelId:{0}".format(tnlid[:7]), True)
             lnkupd_param = {
                 "UpdateType": "LnkEvAuthorized", "OverlayId": olid, "PeerId": peer_id,
@@ -508,17 +545,15 @@ class LinkManager(ControllerModule):
             if not tnl.link:
                 # we need to create the link
                 lnkid = tnlid
-                self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Tunnel exists. "
-                                  "Skipping phase 1/5 Node A - Peer: {}"
-                                  .format(lnkid[:7], peer_id[:7]))
+                self.log("LOG_DEBUG", "Create Link:%s Tunnel exists. "
+                         "Skipping phase 1/5 Node A - Peer: %s", lnkid[:7], peer_id[:7])
                 lnkupd_param = {
                     "UpdateType": "LnkEvCreating", "OverlayId": olid, "PeerId": peer_id,
                     "TunnelId": tnlid, "LinkId": lnkid}
                 self._link_updates_publisher.post_update(lnkupd_param)
 
-                self.register_cbt("Logger", "LOG_DEBUG",
-                                  "Create Link:{} Phase 2/5 Node A - Peer: {}"
-                                  .format(lnkid[:7], peer_id[:7]))
+                self.log("LOG_DEBUG", "Create Link:%s Phase 2/5 Node A - Peer: %s",
+                         lnkid[:7], peer_id[:7])
                 self._assign_link_to_tunnel(tnlid, lnkid, 0xA2)
                 tnl.tunnel_state = Tunnel.STATES.TNL_CREATING
                 #tnl.creation_start_time = time.time()
@@ -560,8 +595,7 @@ class LinkManager(ControllerModule):
                                       self.config["LinkSetupTimeout"])
         self._assign_link_to_tunnel(tnlid, lnkid, 0xA1)
 
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 1/5 Node A - Peer: {}"
-                          .format(lnkid[:7], peer_id[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 1/5 Node A - Peer: %s", lnkid[:7], peer_id[:7])
         lnkupd_param = {"UpdateType": "LnkEvCreating", "OverlayId": olid, "PeerId": peer_id,
                         "TunnelId": tnlid, "LinkId": lnkid}
         self._link_updates_publisher.post_update(lnkupd_param)
@@ -588,8 +622,7 @@ class LinkManager(ControllerModule):
         self._tunnels[tnlid].link.creation_state = 0xA2
         # store the overlay data
         overlay_id = cbt.request.params["OverlayId"]  # config overlay id
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 2/5 Node A"
-                          .format(lnkid[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 2/5 Node A", lnkid[:7])
         self._update_tunnel_descriptor(resp_data, tnlid)
         # create and send remote action to request endpoint from peer
         params = {"OverlayId": overlay_id, "TunnelId": tnlid, "LinkId": lnkid}
@@ -624,7 +657,8 @@ class LinkManager(ControllerModule):
             return
         lnkid = tnlid
         self._tunnels[tnlid].tunnel_state = Tunnel.STATES.TNL_CREATING
-        self._tunnels[tnlid].timeout = time.time() + self.config["LinkSetupTimeout"]
+        self._tunnels[tnlid].timeout = \
+            time.monotonic_ns() + self.config["LinkSetupTimeout"] * NS_PER_SEC
         self._assign_link_to_tunnel(tnlid, lnkid, 0xB1)
         # publish notification of link creation initiated Node B
         lnkupd_param = {
@@ -671,15 +705,14 @@ class LinkManager(ControllerModule):
         if not cbt.response.status:
             self.free_cbt(cbt)
             parent_cbt.set_response(resp_data, False)
-            if parent_cbt.child_count == 1:
+            if parent_cbt.child_count == 0:
                 self.complete_cbt(parent_cbt)
             self.register_cbt("Logger", "LOG_WARNING", "Create link endpoint failed :{}"
                               .format(cbt.response.data))
             self._rollback_link_creation_changes(tnlid)
 
             return
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 2/4 Node B - Peer: {}"
-                          .format(lnkid[:7], peer_id[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 2/4 Node B - Peer: %s", lnkid[:7], peer_id[:7])
         # store the overlay data
         self._update_tunnel_descriptor(resp_data, tnlid)
         # add the peer MAC to the tunnel descr
@@ -709,8 +742,7 @@ class LinkManager(ControllerModule):
         tnlid = self.tunnel_id(lnkid)
         peer_id = rem_act["NodeData"]["UID"]
         self._tunnels[tnlid].link.creation_state = 0xC0
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 4/4 Node B - Peer: {}"
-                          .format(lnkid[:7], peer_id[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 4/4 Node B - Peer: %s", lnkid[:7], peer_id[:7])
         peer_id = rem_act["NodeData"]["UID"]
         olid = rem_act["OverlayId"]
         resp_data = cbt.response.data
@@ -747,8 +779,7 @@ class LinkManager(ControllerModule):
             self.complete_cbt(parent_cbt)
             return
         self._tunnels[tnlid].link.creation_state = 0xA3
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 3/5 Node A - Peer: {}"
-                          .format(lnkid[:7], peer_id[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 3/5 Node A - Peer: %s", lnkid[:7], peer_id[:7])
         node_data = rem_act["Data"]["NodeData"]
         olid = rem_act["OverlayId"]
         # add the peer MAC to the tunnel descr
@@ -769,8 +800,7 @@ class LinkManager(ControllerModule):
         tnlid = self.tunnel_id(lnkid)
         peer_id = cbt.request.params["NodeData"]["UID"]
         self._tunnels[tnlid].link.creation_state = 0xA4
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 4/5 Node A - Peer: {}"
-                          .format(lnkid[:7], peer_id[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 4/5 Node A - Peer: %s", lnkid[:7], peer_id[:7])
         local_cas = cbt.response.data["CAS"]
         parent_cbt = cbt.parent
         olid = cbt.request.params["OverlayId"]
@@ -799,13 +829,11 @@ class LinkManager(ControllerModule):
         if peer_id not in self._peers[olid] or tnlid not in self._tunnels \
             or self._tunnels[tnlid].link is None:
             self._cleanup_removed_tunnel(tnlid)
-            self.register_cbt("Logger", "LOG_DEBUG",
-                              "A response to an aborted add peer CAS operation was discarded: {0}".
-                              format(str(cbt)))
+            self.log("LOG_DEBUG",
+                     "A response to an aborted add peer CAS operation was discarded: %s", cbt)
             return
         self._tunnels[tnlid].link.creation_state = 0xB3
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 3/4 Node B - Peer: {}"
-                          .format(lnkid[:7], peer_id[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 3/4 Node B - Peer: %s", lnkid[:7], peer_id[:7])
         lcbt = self.create_linked_cbt(cbt)
         params["Type"] = self.config["Overlays"][olid]["Type"]
         lcbt.set_request(self.module_name, "TincanInterface", "TCI_CREATE_LINK", params)
@@ -852,15 +880,14 @@ class LinkManager(ControllerModule):
         olid = parent_cbt.request.params["OverlayId"]
         peer_id = parent_cbt.request.params["PeerId"]
         if peer_id not in self._peers[olid]:
-            self.register_cbt("Logger", "LOG_DEBUG",
-                              "A response to an aborted create link operation was discarded: {0}".
-                              format(parent_cbt))
+            self.log("LOG_DEBUG",
+                     "A response to an aborted create link operation was discarded: %s",
+                     parent_cbt)
             return
         tnlid = self._peers[olid][peer_id]
         lnkid = self.link_id(tnlid)
         self._tunnels[tnlid].link.creation_state = 0xC0
-        self.register_cbt("Logger", "LOG_DEBUG", "Create Link:{} Phase 5/5 Node A - Peer: {}"
-                          .format(tnlid[:7], peer_id[:7]))
+        self.log("LOG_DEBUG", "Create Link:%s Phase 5/5 Node A - Peer: %s", tnlid[:7], peer_id[:7])
         parent_cbt.set_response(data={"LinkId": lnkid}, status=True)
         self.complete_cbt(parent_cbt)
         self.register_cbt("Logger", "LOG_INFO", "Tunnel {0} created: {1}:{2}->{3}"
@@ -922,82 +949,7 @@ class LinkManager(ControllerModule):
 
     def process_cbt(self, cbt):
         with self._lock:
-            if cbt.op_type == "Request":
-                if cbt.request.action == "LNK_CREATE_TUNNEL":
-                    # Create Link: Phase 1 Node A
-                    # TOP wants a new link, first SIGnal peer to create endpt
-                    self.req_handler_create_tunnel(cbt)
-
-                elif cbt.request.action == "LNK_REQ_LINK_ENDPT":
-                    # Create Link: Phase 3 Node B
-                    # Rcvd peer req to create endpt, send to TCI
-                    self.req_handler_req_link_endpt(cbt)
-
-                elif cbt.request.action == "LNK_ADD_PEER_CAS":
-                    # Create Link: Phase 7 Node B
-                    # CAS rcvd from peer, sends to TCI to update link's peer CAS info
-                    self.req_handler_add_peer_cas(cbt)
-
-                elif cbt.request.action == "LNK_REMOVE_TUNNEL":
-                    self.req_handler_remove_tnl(cbt)
-
-                elif cbt.request.action == "LNK_REMOVE_LINK":
-                    self.req_handler_remove_link(cbt)
-
-                elif cbt.request.action == "LNK_QUERY_TUNNEL_INFO":
-                    self.req_handler_query_tunnels_info(cbt)
-
-                elif cbt.request.action == "VIS_DATA_REQ":
-                    self.req_handler_query_viz_data(cbt)
-
-                elif cbt.request.action == "TCI_TINCAN_MSG_NOTIFY":
-                    self.req_handler_tincan_msg(cbt)
-
-                elif cbt.request.action == "LNK_ADD_IGN_INF":
-                    self.req_handler_add_ign_inf(cbt)
-
-                elif cbt.request.action == "LNK_AUTH_TUNNEL":
-                    self.req_handler_auth_tunnel(cbt)
-                else:
-                    self.req_handler_default(cbt)
-            elif cbt.op_type == "Response":
-                if cbt.request.action == "SIG_REMOTE_ACTION":
-                    # Create Link: Phase 5 Node A
-                    # Attempt to create our end of link
-                    # Create Link: Phase 9 Node A
-                    # Link created, notify others
-                    self.resp_handler_remote_action(cbt)
-
-                elif cbt.request.action == "TCI_CREATE_LINK":
-                    # Create Link: Phase 4 Node B
-                    # Create Link: Phase 6 Node A
-                    # SIGnal to peer to update CAS
-                    # Create Link: Phase 8 Node B
-                    # Complete setup
-                    self.resp_handler_create_link_endpt(cbt)
-
-                elif cbt.request.action == "TCI_CREATE_TUNNEL":
-                    # Create Link: Phase 2 Node A
-                    # Retrieved our node data for response
-                    self.resp_handler_create_tunnel(cbt)
-
-                elif cbt.request.action == "TCI_QUERY_LINK_STATS":
-                    self.resp_handler_query_link_stats(cbt)
-
-                elif cbt.request.action == "TCI_REMOVE_LINK":
-                    self.resp_handler_remove_link(cbt)
-
-                elif cbt.request.action == "TCI_REMOVE_TUNNEL":
-                    self.resp_handler_remove_tunnel(cbt)
-
-                else:
-                    parent_cbt = cbt.parent
-                    cbt_data = cbt.response.data
-                    cbt_status = cbt.response.status
-                    self.free_cbt(cbt)
-                    if (parent_cbt is not None and parent_cbt.child_count == 1):
-                        parent_cbt.set_response(cbt_data, cbt_status)
-                        self.complete_cbt(parent_cbt)
+            self.dispatch_cbt(cbt)
 
     def _deauth_tnl(self, tnl):
         self.register_cbt("Logger", "LOG_INFO", "Tunnel {0} auth timed out".format(tnl.tnlid))
@@ -1010,11 +962,12 @@ class LinkManager(ControllerModule):
     def _cleanup_expired_incomplete_links(self):
         deauth = []
         rollbk = []
+        now = time.monotonic_ns()
         for tnlid, tnl in self._tunnels.items():
-            if tnl.tunnel_state == Tunnel.STATES.TNL_AUTHORIZED and time.time() > tnl.timeout:
+            if tnl.tunnel_state == Tunnel.STATES.TNL_AUTHORIZED and now > tnl.timeout:
                 deauth.append(tnl)
             elif  tnl.link is not None and tnl.link.creation_state != 0xC0 and \
-                time.time() > tnl.timeout:
+                now > tnl.timeout:
                 rollbk.append(tnlid)
         for tnl in deauth:
             self._deauth_tnl(tnl)
@@ -1025,7 +978,7 @@ class LinkManager(ControllerModule):
         with self._lock:
             self._cleanup_expired_incomplete_links()
             self._query_link_stats()
-            self.log("LOG_DEBUG", "Timer LNK State=%s", str(self))
+            self.log("LOG_DEBUG", "Timer LNK State=%s", self)
 
     def terminate(self):
         pass
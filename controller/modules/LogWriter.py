@@ -0,0 +1,295 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import logging.handlers as lh
+import marshal
+import struct
+import threading
+import time
+from collections import deque
+
+# binary log record kinds, each record is <length:u32><kind:u8><body>
+BLOG_MAGIC = b"IPOPBLG1"
+BLOG_MODULE = 1     # <id:u16><module name>
+BLOG_FORMAT = 2     # <id:u32><format string>
+BLOG_RECORD = 3     # <created:f64><level:u8><module id:u16><format id:u32><marshal args>
+BLOG_DROPPED = 4    # <time:f64><count:u32>
+_LEN = struct.Struct("<I")
+_MODULE = struct.Struct("<BH")
+_FORMAT = struct.Struct("<BI")
+_RECORD = struct.Struct("<BdBHI")
+_DROPPED = struct.Struct("<BdI")
+
+
+class LogWriter(lh.RotatingFileHandler):
+    """
+    Rotating file handler that writes from a dedicated thread. Records are buffered in a ring
+    and formatted and written in batches, once FlushRecords are buffered or a record has been
+    buffered for FlushInterval sec. The files are rotated at MaxFileSize with MaxArchives kept
+    as by RotatingFileHandler. When the ring is full the oldest record is dropped and counted.
+    """
+    DEFAULT_BUFFER_SIZE = 8192
+
+    def __init__(self, filename, max_bytes=0, backup_count=0, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_records=512, flush_interval=0.5):
+        super(LogWriter, self).__init__(filename, maxBytes=max_bytes, backupCount=backup_count)
+        self._records = deque(maxlen=buffer_size)
+        self._flush_records = max(1, min(flush_records, buffer_size))
+        self._flush_interval = flush_interval
+        self._cond = threading.Condition(threading.Lock())
+        self._closing = False
+        self._unreported_drops = 0
+        self.stats = {"Written": 0, "Dropped": 0, "Batches": 0}
+        self._writer = threading.Thread(target=self.__run, name="Logger::Writer", daemon=True)
+        self._writer.start()
+
+    def emit(self, record):
+        self.append(record)
+
+    def append(self, record):
+        with self._cond:
+            if len(self._records) == self._records.maxlen:
+                self.stats["Dropped"] += 1
+                self._unreported_drops += 1
+            self._records.append(record)
+            if len(self._records) == self._flush_records:
+                self._cond.notify()
+
+    def flush(self):
+        # the writer thread flushes the stream after every batch
+        with self._cond:
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._writer.is_alive() and self._writer is not threading.current_thread():
+            self._writer.join()
+        super(LogWriter, self).close()
+
+    def query_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["Buffered"] = len(self._records)
+        return stats
+
+    def encode(self, record):
+        # the data written for a record, called on the writer thread
+        return self.format(record) + self.terminator
+
+    def encode_dropped(self, count):
+        return "{0} log records were dropped, the log buffer was full{1}".format(
+            count, self.terminator)
+
+    def __encode(self, record):
+        try:
+            return self.encode(record)
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+            return None
+
+    def __run(self):
+        while True:
+            with self._cond:
+                if not self._closing and len(self._records) < self._flush_records:
+                    self._cond.wait(self._flush_interval)
+                records = list(self._records)
+                self._records.clear()
+                drops = self._unreported_drops
+                self._unreported_drops = 0
+                closing = self._closing
+            if records or drops:
+                self.__write(records, drops)
+            if closing:
+                return
+
+    def __write(self, records, drops):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            empty = b"" if "b" in self.mode else ""
+            batch = [self.encode_dropped(drops)] if drops else []
+            size = self.stream.tell() + sum(len(data) for data in batch)
+            for record in records:
+                data = self.__encode(record)
+                if data is None:
+                    continue
+                # rotate where RotatingFileHandler would, before the record that exceeds the size
+                if self.maxBytes > 0 and size > 0 and size + len(data) >= self.maxBytes:
+                    self.stream.write(empty.join(batch))
+                    batch = []
+                    self.doRollover()
+                    size = self.stream.tell()
+                    # encoded again as the new file must restate what the record refers to
+                    data = self.__encode(record)
+                batch.append(data)
+                size += len(data)
+            self.stream.write(empty.join(batch))
+            self.stream.flush()
+        except Exception:  # pylint: disable=broad-except
+            # records are only dropped when the ring is full so the batch is never empty
+            self.handleError(records[-1])
+        with self._cond:
+            self.stats["Written"] += len(records)
+            self.stats["Batches"] += 1
+
+
+class BinaryLogWriter(LogWriter):
+    """
+    LogWriter for the compact binary log. A record holds its creation time, level, module id,
+    format string id and its arguments in marshal format, it is not formatted as text. Module
+    names and format strings are interned, each is defined in a file before its first use so
+    every file can be decoded on its own with read_binary_log. Logger appends its records
+    as (created, levelno, module, format string, args) without creating a LogRecord.
+    """
+    def __init__(self, filename, max_bytes=0, backup_count=0,
+                 buffer_size=LogWriter.DEFAULT_BUFFER_SIZE, flush_records=512,
+                 flush_interval=0.5):
+        self._modules = {}
+        self._formats = {}
+        super(BinaryLogWriter, self).__init__(filename, max_bytes, backup_count, buffer_size,
+                                              flush_records, flush_interval)
+        # RotatingFileHandler opens its files in text mode
+        self.mode = "ab"
+        self.encoding = None
+        self.stream.close()
+        self.stream = self._open()
+
+    def _open(self):
+        stream = super(BinaryLogWriter, self)._open()
+        if "b" in self.mode and stream.tell() == 0:
+            stream.write(BLOG_MAGIC)
+        self._modules = {}
+        self._formats = {}
+        return stream
+
+    def encode(self, record):
+        if isinstance(record, tuple):
+            created, levelno, module, fmt, args = record
+        else:
+            created, levelno, module, fmt = record.created, record.levelno, "", str(record.msg)
+            # logging unpacks a single mapping argument, and leaves a message without
+            # arguments unformatted while the decoder always formats
+            args = record.args if isinstance(record.args, tuple) else (record.args,)
+            if not args:
+                fmt, args = "%s", (fmt,)
+        data = []
+        mid = self._modules.get(module)
+        if mid is None:
+            mid = self._modules[module] = len(self._modules)
+            data.append(_encode_entry(_MODULE.pack(BLOG_MODULE, mid) + module.encode()))
+        fid = self._formats.get(fmt)
+        if fid is None:
+            fid = self._formats[fmt] = len(self._formats)
+            data.append(_encode_entry(_FORMAT.pack(BLOG_FORMAT, fid) + fmt.encode()))
+        data.append(_encode_entry(_RECORD.pack(BLOG_RECORD, created, levelno, mid, fid)
+                                  + _marshal_args(args)))
+        return b"".join(data)
+
+    def encode_dropped(self, count):
+        return _encode_entry(_DROPPED.pack(BLOG_DROPPED, time.time(), count))
+
+
+class FlightRecorder():
+    """
+    Keeps the last size log records of all levels in memory. A record is stored as its
+    creation time, level, interned module and format string ids and its arguments, nothing is
+    formatted until the ring is dumped. A dump is a binary log that is decoded with
+    read_binary_log, eg., by tools/LogDecoder. It is used from Logger's worker only.
+    """
+    def __init__(self, size):
+        self._ring = deque(maxlen=size)
+        self._modules = {}
+        self._formats = {}
+
+    def __len__(self):
+        return len(self._ring)
+
+    def append(self, created, levelno, module, fmt, args):
+        mid = self._modules.get(module)
+        if mid is None:
+            mid = self._modules[module] = len(self._modules)
+        fid = self._formats.get(fmt)
+        if fid is None:
+            fid = self._formats[fmt] = len(self._formats)
+        self._ring.append((created, levelno, mid, fid, args))
+
+    def dump(self, filename):
+        # write the ring to a new binary log, returns the number of records written
+        data = [BLOG_MAGIC]
+        data.extend(_encode_entry(_MODULE.pack(BLOG_MODULE, mid) + module.encode())
+                    for module, mid in self._modules.items())
+        data.extend(_encode_entry(_FORMAT.pack(BLOG_FORMAT, fid) + fmt.encode())
+                    for fmt, fid in self._formats.items())
+        records = list(self._ring)
+        for created, levelno, mid, fid, args in records:
+            data.append(_encode_entry(_RECORD.pack(BLOG_RECORD, created, levelno, mid, fid)
+                                      + _marshal_args(args)))
+        with open(filename, "wb") as f:
+            f.write(b"".join(data))
+        return len(records)
+
+
+def _encode_entry(body):
+    return _LEN.pack(len(body)) + body
+
+
+def _marshal_args(args):
+    try:
+        return marshal.dumps(args)
+    except ValueError:
+        return marshal.dumps(tuple(arg if isinstance(arg, (str, int, float)) else str(arg)
+                                   for arg in args))
+
+
+def read_binary_log(filename):
+    """
+    Yield (created, levelno, module, format string, args) for each record of a binary log.
+    A dropped records notice is yielded as a warning. A truncated final record is ignored.
+    """
+    modules = {}
+    formats = {}
+    with open(filename, "rb") as f:
+        if f.read(len(BLOG_MAGIC)) != BLOG_MAGIC:
+            raise ValueError("{0} is not a binary controller log".format(filename))
+        while True:
+            prefix = f.read(_LEN.size)
+            if len(prefix) < _LEN.size:
+                return
+            length = _LEN.unpack(prefix)[0]
+            body = f.read(length)
+            if len(body) < length:
+                return
+            kind = body[0]
+            if kind == BLOG_RECORD:
+                _, created, levelno, mid, fid = _RECORD.unpack_from(body)
+                yield (created, levelno, modules.get(mid, ""), formats.get(fid, ""),
+                       marshal.loads(body[_RECORD.size:]))
+            elif kind == BLOG_MODULE:
+                modules[_MODULE.unpack_from(body)[1]] = body[_MODULE.size:].decode()
+            elif kind == BLOG_FORMAT:
+                formats[_FORMAT.unpack_from(body)[1]] = body[_FORMAT.size:].decode()
+            elif kind == BLOG_DROPPED:
+                _, created, count = _DROPPED.unpack(body)
+                yield (created, logging.WARNING, "",
+                       "%d log records were dropped, the log buffer was full", (count,))
@@ -22,13 +22,25 @@
 import logging
 import logging.handlers as lh
 import os
+import time
 from controller.framework.ControllerModule import ControllerModule
+from controller.modules.LogWriter import LogWriter, BinaryLogWriter, FlightRecorder
 
 
 class Logger(ControllerModule):
+    RELOADABLE_SETTINGS = ("LogLevel", "RateLimit", "RateBurst", "SuppressionReport",
+                           "DumpInterval")
+
     def __init__(self, cfx_handle, module_config, module_name):
         super(Logger, self).__init__(cfx_handle, module_config, module_name)
         self._logger = None
+        self._writer = None
+        self._binary = False
+        self._recorder = None
+        self._last_dump = None
+        self._dump_count = 0
+        self._levels = {"LOG_DEBUG": logging.DEBUG, "LOG_INFO": logging.INFO,
+                        "LOG_WARNING": logging.WARNING, "LOG_ERROR": logging.ERROR}
 
     def initialize(self):
         # Extracts the controller Log Level from the ipop-config file,
@@ -58,15 +70,33 @@ class Logger(ControllerModule):
             self._logger = logging.getLogger("IPOP Rotating Log")
             self._logger.setLevel(level)
             # Creates rotating filehandler
-            handler = lh.RotatingFileHandler(filename=fqname,
-                                             maxBytes=self._cm_config["MaxFileSize"],
-                                             backupCount=self._cm_config["MaxArchives"])
+            handler = self._create_file_handler(fqname, self._cm_config["MaxFileSize"],
+                                                self._cm_config["MaxArchives"])
             formatter = logging.Formatter(
                 "[%(asctime)s.%(msecs)03d] %(levelname)s:%(message)s", datefmt="%Y%m%d %H:%M:%S")
             handler.setFormatter(formatter)
             # Adds the filehandler to the Python logger module
             self._logger.addHandler(handler)
 
+        # Compact binary records that are decoded offline by tools/LogDecoder
+        elif self._cm_config["Device"] == "Binary":
+            filepath = self._cm_config.get("Directory", "./")
+            fqname = filepath + os.path.splitext(
+                self._cm_config.get("CtrlLogFileName", "ctrl.log"))[0] + ".blog"
+            if not os.path.exists(filepath):
+                os.makedirs(filepath, exist_ok=True)
+            if os.path.isfile(fqname):
+                os.remove(fqname)
+            self._logger = logging.getLogger("IPOP Binary Log")
+            self._logger.setLevel(level)
+            self._writer = BinaryLogWriter(
+                fqname, self._cm_config["MaxFileSize"], self._cm_config["MaxArchives"],
+                self._cm_config.get("BufferSize", 0) or LogWriter.DEFAULT_BUFFER_SIZE,
+                self._cm_config.get("FlushRecords", 512),
+                self._cm_config.get("FlushInterval", 0.5))
+            self._logger.addHandler(self._writer)
+            self._binary = True
+
          # If the Logging is set to All by the User
         else:
             self._logger = logging.getLogger("IPOP Console & File Logger")
@@ -91,46 +121,132 @@ class Logger(ControllerModule):
 
             #File Logger
             # Creates rotating filehandler
-            file_handler = lh.RotatingFileHandler(filename=fqname)
+            file_handler = self._create_file_handler(fqname)
             file_log_formatter = logging.Formatter(
                 "[%(asctime)s.%(msecs)03d] %(levelname)s:%(message)s", datefmt="%Y%m%d %H:%M:%S")
             file_handler.setFormatter(file_log_formatter)
             self._logger.addHandler(file_handler)
 
+        for action in self._levels:
+            self.register_cbt_handler("Request", action, self.req_handler_log)
+        self.register_cbt_handler("Request", "LOG_QUERY_CONFIG", self.req_handler_query_config)
+        self.register_cbt_handler("Request", "LOG_QUERY_STATS", self.req_handler_query_stats)
+        self.register_cbt_handler("Request", "LOG_DUMP_RECORDER", self.req_handler_dump_recorder)
+        if self._cm_config.get("FlightRecorder", 0) > 0:
+            self._recorder = FlightRecorder(self._cm_config["FlightRecorder"])
+        self._set_log_level()
+        self._set_rate_limit()
         self._logger.info("Logger: Module loaded")
 
-    def process_cbt(self, cbt):
-        if cbt.op_type == "Request":
-            lvl = cbt.request.action
-            mod = cbt.request.initiator
-            if isinstance(cbt.request.params, tuple):
-                fmt = "%s: "+ cbt.request.params[0]
-                vals = cbt.request.params[1]
-            else:
-                fmt = "%s: %s"
-                vals = [cbt.request.params]
-
-            if lvl == "LOG_DEBUG":
-                self._logger.debug(fmt, mod, *vals)
-                cbt.set_response(None, True)
-            elif lvl == "LOG_INFO":
-                self._logger.info(fmt, mod, *vals)
-                cbt.set_response(None, True)
-            elif lvl == "LOG_WARNING":
-                self._logger.warning(fmt, mod, *vals)
-                cbt.set_response(None, True)
-            elif lvl == "LOG_ERROR":
-                self._logger.error(fmt, mod, *vals)
-                cbt.set_response(None, True)
-            elif lvl == "LOG_QUERY_CONFIG":
-                cbt.set_response(self._cm_config, True)
+    def _set_log_level(self):
+        # the flight recorder keeps the records of every level, Logger filters what it writes
+        level = self._logger.getEffectiveLevel()
+        if self._recorder is not None:
+            level = logging.DEBUG
+        self._cfx_handle.set_log_level(level, recording=self._recorder is not None)
+
+    def _set_rate_limit(self):
+        self._cfx_handle.set_log_rate_limit(float(self._cm_config.get("RateLimit", 0)),
+                                            float(self._cm_config.get("RateBurst", 1)),
+                                            float(self._cm_config.get("SuppressionReport", 30)))
+
+    def _create_file_handler(self, fqname, max_bytes=0, backup_count=0):
+        # records are written in batches by a writer thread unless the buffer is disabled
+        buffer_size = self._cm_config.get("BufferSize", 0)
+        if buffer_size <= 0:
+            return lh.RotatingFileHandler(filename=fqname, maxBytes=max_bytes,
+                                          backupCount=backup_count)
+        self._writer = LogWriter(fqname, max_bytes, backup_count, buffer_size,
+                                 self._cm_config.get("FlushRecords", 512),
+                                 self._cm_config.get("FlushInterval", 0.5))
+        return self._writer
+
+    def req_handler_log(self, cbt):
+        lvl = self._levels[cbt.request.action]
+        mod = cbt.request.initiator
+        created = time.time()
+        if isinstance(cbt.request.params, tuple):
+            fmt, args = cbt.request.params[0], tuple(cbt.request.params[1])
+        else:
+            fmt, args = "%s", (cbt.request.params,)
+        if self._recorder is not None:
+            self._recorder.append(created, lvl, mod, fmt, args)
+        if self._logger.isEnabledFor(lvl):
+            if self._binary:
+                # binary records are queued to the writer as is, they are never formatted
+                self._writer.append((created, lvl, mod, fmt, args))
             else:
-                self._logger.warning("%s: Unsupported CBT action %s", self._module_name, str(cbt))
-                cbt.set_response("Unsupported CBT action", False)
-            self.complete_cbt(cbt)
+                self._logger.log(lvl, "%s: " + fmt, mod, *args)
+        cbt.set_response(None, True)
+        self.complete_cbt(cbt)
+        if lvl >= logging.ERROR and self._recorder is not None:
+            self._dump_recorder("LOG_ERROR from " + mod, automatic=True)
+
+    def _dump_recorder(self, reason, automatic=False):
+        """
+        Write the flight recorder to a new file in the log directory and return its name.
+        Automatic dumps are skipped within DumpInterval sec of the previous dump.
+        """
+        now = time.monotonic()
+        if automatic and self._last_dump is not None and \
+                now - self._last_dump < self._cm_config.get("DumpInterval", 60):
+            return None
+        self._last_dump = now
+        self._dump_count += 1
+        filepath = self._cm_config.get("Directory", "./")
+        fqname = filepath + "{0}-flight-{1}-{2}.blog".format(
+            os.path.splitext(self._cm_config.get("CtrlLogFileName", "ctrl.log"))[0],
+            time.strftime("%Y%m%d-%H%M%S"), self._dump_count)
+        try:
+            os.makedirs(filepath, exist_ok=True)
+            count = self._recorder.dump(fqname)
+        except OSError as err:
+            self._logger.warning("%s: Flight recorder dump failed: %s", self._module_name, err)
+            return None
+        self._logger.warning("%s: Flight recorder dumped %d records to %s (%s)",
+                             self._module_name, count, fqname, reason)
+        return fqname
+
+    def config_changed(self, changes):
+        if "LogLevel" in changes:
+            self._logger.setLevel(getattr(logging, changes["LogLevel"]))
+            self._set_log_level()
+        if {"RateLimit", "RateBurst", "SuppressionReport"} & changes.keys():
+            self._set_rate_limit()
+
+    def req_handler_query_config(self, cbt):
+        cbt.set_response(self._cm_config, True)
+        self.complete_cbt(cbt)
+
+    def req_handler_query_stats(self, cbt):
+        # records written, batches, records buffered and records dropped by the writer thread
+        if self._writer is None:
+            cbt.set_response("The log writer thread is not enabled", False)
+        else:
+            cbt.set_response(self._writer.query_stats(), True)
+        self.complete_cbt(cbt)
+
+    def req_handler_dump_recorder(self, cbt):
+        # params may give the Reason of the dump, and Automatic for a dump that is throttled
+        params = cbt.request.params or {}
+        if self._recorder is None:
+            cbt.set_response("The flight recorder is not enabled", False)
+        else:
+            fqname = self._dump_recorder(params.get("Reason", cbt.request.initiator),
+                                         params.get("Automatic", False))
+            cbt.set_response(fqname, fqname is not None)
+        self.complete_cbt(cbt)
+
+    def req_handler_default(self, cbt):
+        self._logger.warning("%s: Unsupported CBT action %s", self._module_name, str(cbt))
+        cbt.set_response("Unsupported CBT action", False)
+        self.complete_cbt(cbt)
 
-        elif cbt.op_type == "Response":
-            self.free_cbt(cbt)
+    def resp_handler_default(self, cbt):
+        self.free_cbt(cbt)
+
+    def process_cbt(self, cbt):
+        self.dispatch_cbt(cbt)
 
     def timer_method(self):
         pass
@@ -70,6 +70,9 @@ class NetworkBuilder():
     def _is_ready(self):
         return not bool(self._net_ops)
 
+    def set_max_concurrent_workload(self, max_wrkld):
+        self._max_concurrent_wrkload = max_wrkld
+
     def _is_max_concurrent_workload(self):
         return self._refresh_in_progress >= self._max_concurrent_wrkload
 
@@ -81,7 +84,7 @@ class NetworkBuilder():
         Transitions the overlay network overlay to the desired state specified by pending
         adjacency list.
         """
-        self._top.log("LOG_DEBUG", "New net graph: %s", str(net_graph))
+        self._top.log("LOG_DEBUG", "New net graph: %s", net_graph)
         #assert ((self._is_ready() and bool(net_graph)) or
         #        (not self._is_ready() and not bool(net_graph))),\
         #            "Netbuilder is not ready for a new net graph"
@@ -94,7 +97,7 @@ class NetworkBuilder():
             self._current_adj_list.update_closest()
             self._net_ops = NetworkOperations(self._current_adj_list, self._pending_adj_list)
             self._net_ops.diff()
-            self._top.log("LOG_DEBUG", "net_op=%s", str(self._net_ops))
+            self._top.log("LOG_DEBUG", "net_op=%s", self._net_ops)
         self.process_net_ops()
 
     def update_edge_state(self, event):
@@ -225,7 +228,7 @@ class NetworkBuilder():
 
     def negotiate_incoming_edge(self, edge_req):
         """ Role B1 """
-        self._top.log("LOG_DEBUG", "Rcvd EdgeRequest=%s", str(edge_req))
+        self._top.log("LOG_DEBUG", "Rcvd EdgeRequest=%s", edge_req)
         edge_resp = None
         peer_id = edge_req.initiator_id
         if peer_id in self._current_adj_list:
@@ -247,8 +250,8 @@ class NetworkBuilder():
             ce = ConnectionEdge(peer_id=peer_id, edge_id=edge_req.edge_id, edge_type=et)
             ce.edge_state = "CEStatePreAuth"
             self._negotiated_edges[peer_id] = ce
-            self._top.log("LOG_DEBUG", "New CE=%s added to negotiated_edges=%s", str(ce),
-                          str(self._negotiated_edges))
+            self._top.log("LOG_DEBUG", "New CE=%s added to negotiated_edges=%s", ce,
+                          self._negotiated_edges)
         return edge_resp
 
     def _add_incoming_auth_conn_edge(self, peer_id):
@@ -260,7 +263,7 @@ class NetworkBuilder():
 
     def complete_edge_negotiation(self, edge_nego):
         """ Role A2 """
-        self._top.log("LOG_DEBUG", "EdgeNegotiate=%s", str(edge_nego))
+        self._top.log("LOG_DEBUG", "EdgeNegotiate=%s", edge_nego)
         if edge_nego.recipient_id not in self._current_adj_list and \
             edge_nego.recipient_id not in self._negotiated_edges:
             self._top.log("LOG_ERROR", "Peer Id from edge negotiation not in current adjacency " \
@@ -30,6 +30,8 @@ from controller.framework.ControllerModule import ControllerModule
 
 
 class OverlayVisualizer(ControllerModule):
+    RELOADABLE_SETTINGS = ("NodeName", "GeoCoordinate")
+
     def __init__(self, cfx_handle, module_config, module_name):
         super(OverlayVisualizer, self).__init__(cfx_handle,
                                                 module_config, module_name)
@@ -51,35 +53,28 @@ class OverlayVisualizer(ControllerModule):
         # with the data they want to forward to the visualiser
         self._vis_req_publisher = \
             self._cfx_handle.publish_subscription("VIS_DATA_REQ")
-
+        self.register_cbt_handler("Response", "VIS_COLLECT_DATA", self.resp_handler_vis_data)
         self.register_cbt("Logger", "LOG_INFO", "Module loaded")
 
-    def process_cbt(self, cbt):
-        if cbt.op_type == "Response":
-            if cbt.request.action == "VIS_DATA_REQ":
-                msg = cbt.response.data
-
-                if cbt.response.status and msg:
-                    with self._vis_ds_lock:
-                        for mod_name in msg:
-                            for ovrl_id in msg[mod_name]:
-                                self._vis_ds["VizData"][ovrl_id][mod_name] = msg[mod_name][ovrl_id]
-                else:
-                    warn_msg = "Got no data in CBT response from module" \
-                        " {}".format(cbt.request.recipient)
-                    self.register_cbt("Logger", "LOG_WARNING", warn_msg)
-                self.free_cbt(cbt)
-            else:
-                parent_cbt = cbt.parent
-                cbt_data = cbt.response.data
-                cbt_status = cbt.response.status
-                self.free_cbt(cbt)
-                if (parent_cbt is not None and parent_cbt.child_count == 1):
-                    parent_cbt.set_response(cbt_data, cbt_status)
-                    self.complete_cbt(parent_cbt)
+    def resp_handler_vis_data(self, cbt):
+        # the data of every subscriber's VIS_DATA_REQ response, gathered by fan_out_cbts()
+        msgs = cbt.response.data
+        if not isinstance(msgs, list):
+            msgs = [msgs]
+        with self._vis_ds_lock:
+            for msg in msgs:
+                if not isinstance(msg, dict) or not msg:
+                    continue
+                for mod_name in msg:
+                    for ovrl_id in msg[mod_name]:
+                        self._vis_ds["VizData"][ovrl_id][mod_name] = msg[mod_name][ovrl_id]
+        if not cbt.response.status:
+            self.register_cbt("Logger", "LOG_WARNING",
+                              "Got no data in a CBT response to VIS_DATA_REQ")
+        self.free_cbt(cbt)
 
-        else:
-            self.req_handler_default(cbt)
+    def process_cbt(self, cbt):
+        self.dispatch_cbt(cbt)
 
     def timer_method(self):
         with self._vis_ds_lock:
@@ -94,6 +89,15 @@ class OverlayVisualizer(ControllerModule):
         vis_ds["IpopVersion"] = self._ipop_version
         self.log("LOG_DEBUG", "Submitted VizData=%s", vis_ds)
         req_url = "{}/IPOP/nodes/{}".format(self.vis_address, self.node_id)
+        self._cfx_handle.run_blocking(self._submit_vis_data, req_url, vis_ds)
+
+        # Now that all the accumulated data has been dealt with, we request
+        # more data from each subscriber and gather their responses into one
+        collect_cbt = self.create_cbt(self.module_name, self.module_name, "VIS_COLLECT_DATA")
+        self.fan_out_cbts(collect_cbt, [(sink.__class__.__name__, "VIS_DATA_REQ", None)
+                                        for sink in self._vis_req_publisher.subscribers()])
+
+    def _submit_vis_data(self, req_url, vis_ds):
         try:
             resp = requests.put(req_url,
                                 data=json.dumps(vis_ds),
@@ -106,9 +110,5 @@ class OverlayVisualizer(ControllerModule):
                 .format(self.vis_address, str(err))
             self.register_cbt("Logger", "LOG_WARNING", err_msg)
 
-        # Now that all the accumulated data has been dealt with, we request
-        # more data
-        self._vis_req_publisher.post_update(None)
-
     def terminate(self):
         pass
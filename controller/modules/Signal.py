@@ -33,6 +33,7 @@ import random
 import slixmpp
 from slixmpp import ElementBase, register_stanza_plugin, Message, Callback, StanzaPath, JID
 from controller.framework.ControllerModule import ControllerModule
+from controller.framework.CFxTimer import NS_PER_SEC
 
 
 class IpopSignal(ElementBase):
@@ -87,6 +88,7 @@ class XmppTransport(slixmpp.ClientXMPP):
         self._host = None
         self._port = None
         self.event_loop = None
+        self._shared_loop = False   # running on the CFx asyncio engine's event loop
 
     @staticmethod
     def factory(overlay_id, overlay_descr, cm_mod, presence_publisher, jid_cache,
@@ -192,8 +194,8 @@ class XmppTransport(slixmpp.ClientXMPP):
                         self._presence_publisher.post_update(
                             dict(PeerId=peer_id, OverlayId=self._overlay_id,
                                  PresenceTimestamp=pts))
-                        self._sig.sig_log("Resolved {0}@{1}->{2}"
-                                          .format(peer_id[:7], self._overlay_id, presence_sender))
+                        self._sig.log("LOG_DEBUG", "Resolved %s@%s->%s", peer_id[:7],
+                                      self._overlay_id, presence_sender)
                         payload = self.boundjid.full + "#" + self._node_id
                         self.send_msg(presence_sender, "announce", payload)
                     elif pstatus == "uid?":
@@ -215,31 +217,31 @@ class XmppTransport(slixmpp.ClientXMPP):
         """
         try:
             sender_jid = msg["from"]
-            self._sig.sig_log("Received message from: {0}".format(sender_jid))
+            self._sig.log("LOG_DEBUG", "Received message from: %s", sender_jid)
             # discard the message if it was initiated by this node
             if sender_jid == self.boundjid.full:
                 return
             # extract header and content
             msg_type = msg["ipop"]["type"]
             msg_payload = msg["ipop"]["payload"]
-            self._sig.sig_log("Inside message listener with message: {0}".format(msg))
+            self._sig.log("LOG_DEBUG", "Inside message listener with message: %s", msg)
             if msg_type == "uid!":
                 match_jid, matched_uid = msg_payload.split("#")
                 # put the learned JID in cache
                 self._jid_cache.add_entry(matched_uid, match_jid)
-                self._sig.sig_log(
-                    "Successfully put the uid {0} with jid {1} in the cache".format(matched_uid, match_jid))
+                self._sig.log("LOG_DEBUG", "Successfully put the uid %s with jid %s in the cache",
+                              matched_uid, match_jid)
                 # send the remote actions that are waiting on JID refresh
                 rm_que = self._outgoing_rem_acts.get(matched_uid, Queue())
                 while not rm_que.empty():
                     entry = rm_que.get()
                     msg_type, msg_data = entry[0], entry[1]
-                    self._sig.sig_log(
-                        "Preparing to send message to {0} with type {1} and data {2}".format(match_jid, msg_type,
-                                                                                             msg_data))
+                    self._sig.log("LOG_DEBUG",
+                                  "Preparing to send message to %s with type %s and data %s",
+                                  match_jid, msg_type, msg_data)
                     self.send_msg(match_jid, msg_type, json.dumps(msg_data))
-                    self._sig.sig_log("Successfully sent message to {0}".format(match_jid))
-                    self._sig.sig_log("Sent remote action: {0}".format(msg_payload))
+                    self._sig.log("LOG_DEBUG", "Successfully sent message to %s", match_jid)
+                    self._sig.log("LOG_DEBUG", "Sent remote action: %s", msg_payload)
             elif msg_type == "announce":
                 peer_jid, peer_id = msg_payload.split("#")
                 if peer_id == self._sig.node_id:
@@ -251,7 +253,8 @@ class XmppTransport(slixmpp.ClientXMPP):
                     dict(PeerId=peer_id, OverlayId=self._overlay_id, PresenceTimestamp=pts))
             elif msg_type in ("invk", "cmpt"):
                 rem_act = json.loads(msg_payload)
-                self._sig.sig_log("Received a message to {0} with message as: {1}".format(msg_type, msg))
+                self._sig.log("LOG_DEBUG", "Received a message to %s with message as: %s",
+                              msg_type, msg)
                 self._sig.handle_remote_action(self._overlay_id, rem_act, msg_type)
             else:
                 self._sig.sig_log("Invalid message type received {0}".format(str(msg)),
@@ -268,8 +271,11 @@ class XmppTransport(slixmpp.ClientXMPP):
         msg["type"] = "chat"
         msg["ipop"]["type"] = msg_type
         msg["ipop"]["payload"] = payload
-        self._sig.sig_log("In send_msg with message: {0}".format(msg))
-        self.loop.call_soon_threadsafe(msg.send)
+        self._sig.log("LOG_DEBUG", "In send_msg with message: %s", msg)
+        if self._shared_loop:
+            msg.send()
+        else:
+            self.loop.call_soon_threadsafe(msg.send)
 
 
     def connect_to_server(self, ):
@@ -288,13 +294,25 @@ class XmppTransport(slixmpp.ClientXMPP):
         self.loop.set_debug(enabled=True)
         self.loop.run_forever()
 
+    def use_shared_loop(self, event_loop):
+        # run the transport on an event loop owned by CFx instead of its own thread
+        self.loop = event_loop
+        self.event_loop = event_loop
+        self._shared_loop = True
+
     def shutdown(self, ):
+        if self._shared_loop:
+            # the loop belongs to CFx and is stopped after all modules have terminated
+            self.disconnect()
+            return
         self.loop.stop()
         self.loop.close()
         self.disconnect()
 
 
 class Signal(ControllerModule):
+    RELOADABLE_SETTINGS = ("PresenceInterval",)
+
     def __init__(self, cfx_handle, module_config, module_name):
         super(Signal, self).__init__(cfx_handle, module_config, module_name)
         self._presence_publisher = None
@@ -307,8 +325,12 @@ class Signal(ControllerModule):
     def _create_transport_instance(self, overlay_id, overlay_descr, jid_cache, outgoing_rem_acts):
         xport = XmppTransport.factory(overlay_id, overlay_descr, self, self._presence_publisher,
                                       jid_cache, outgoing_rem_acts)
+        event_loop = self._cfx_handle.event_loop
+        if event_loop is not None:
+            xport.use_shared_loop(event_loop)
         xport.connect_to_server()
-        threading.Thread(target=xport.start_process, daemon=True).start()
+        if event_loop is None:
+            threading.Thread(target=xport.start_process, daemon=True).start()
         return xport
 
     def initialize(self):
@@ -325,6 +347,9 @@ class Signal(ControllerModule):
                 self._create_transport_instance(overlay_id, overlay_descr,
                                                 self._circles[overlay_id]["JidCache"],
                                                 self._circles[overlay_id]["OutgoingRemoteActs"])
+        self.register_cbt_handlers("Request", {
+            "SIG_REMOTE_ACTION": self.req_handler_initiate_remote_action,
+            "SIG_QUERY_REPORTING_DATA": self.req_handler_query_reporting_data})
         self.sig_log("Module loaded", "LOG_INFO")
 
     def req_handler_query_reporting_data(self, cbt):
@@ -372,7 +397,7 @@ class Signal(ControllerModule):
             return
         tag = rem_act["ActionTag"]
         cbt_status = rem_act["Status"]
-        pending_cbt = self._cfx_handle._pending_cbts.get(tag, None)
+        pending_cbt = self._cfx_handle.take_pending_cbt(tag)
         if pending_cbt:
             pending_cbt.set_response(data=rem_act, status=cbt_status)
             self.complete_cbt(pending_cbt)
@@ -425,34 +450,22 @@ class Signal(ControllerModule):
             out_rem_acts = self._circles[olid]["OutgoingRemoteActs"]
             if peer_id not in out_rem_acts.keys():
                 out_rem_acts[peer_id] = Queue(maxsize=0)
-            out_rem_acts[peer_id].put((act_type, rem_act, time.time()))
+            out_rem_acts[peer_id].put((act_type, rem_act, time.monotonic_ns()))
             transport.send_presence(pstatus="uid?#" + peer_id)
         else:
             payload = json.dumps(rem_act)
             transport.send_msg(str(target_jid), act_type, payload)
-            self.sig_log("Sent remote act to peer ID: {0}\n Payload: {1}"
-                         .format(peer_id, payload))
+            self.log("LOG_DEBUG", "Sent remote act to peer ID: %s\n Payload: %s", peer_id, payload)
+
+    def resp_handler_default(self, cbt):
+        if cbt.tag in self._remote_acts:
+            self.resp_handler_remote_action(cbt)
+        else:
+            super(Signal, self).resp_handler_default(cbt)
 
     def process_cbt(self, cbt):
         with self._lock:
-            if cbt.op_type == "Request":
-                if cbt.request.action == "SIG_REMOTE_ACTION":
-                    self.req_handler_initiate_remote_action(cbt)
-                elif cbt.request.action == "SIG_QUERY_REPORTING_DATA":
-                    self.req_handler_query_reporting_data(cbt)
-                else:
-                    self.req_handler_default(cbt)
-            elif cbt.op_type == "Response":
-                if cbt.tag in self._remote_acts:
-                    self.resp_handler_remote_action(cbt)
-                else:
-                    parent_cbt = cbt.parent
-                    cbt_data = cbt.response.data
-                    cbt_status = cbt.response.status
-                    self.free_cbt(cbt)
-                    if (parent_cbt is not None and parent_cbt.child_count == 1):
-                        parent_cbt.set_response(cbt_data, cbt_status)
-                        self.complete_cbt(parent_cbt)
+            self.dispatch_cbt(cbt)
 
     def timer_method(self):
         with self._lock:
@@ -467,7 +480,6 @@ class Signal(ControllerModule):
                 # self._circles[overlay_id]["JidCache"].scavenge()
                 self.scavenge_expired_outgoing_rem_acts(self._circles[overlay_id]
                                                         ["OutgoingRemoteActs"])
-            self.scavenge_pending_cbts()
 
     def terminate(self):
         for overlay_id in self._circles:
@@ -476,26 +488,16 @@ class Signal(ControllerModule):
     def sig_log(self, msg, level="LOG_DEBUG"):
         self.register_cbt("Logger", level, msg)
 
-    def scavenge_pending_cbts(self):
-        scavenge_list = []
-        for item in self._cfx_handle._pending_cbts.items():
-            if time.time() - item[1].time_submit >= self.request_timeout:
-                scavenge_list.append(item[0])
-        for tag in scavenge_list:
-            pending_cbt = self._cfx_handle._pending_cbts.pop(tag, None)
-            if pending_cbt:
-                pending_cbt.set_response("The request has expired", False)
-                self.complete_cbt(pending_cbt)
-
     def scavenge_expired_outgoing_rem_acts(self, outgoing_rem_acts):
         # clear out the JID Refresh queue for a peer if the oldest entry age exceeds the limit
         peer_ids = []
+        expiry = time.monotonic_ns() - self.request_timeout * NS_PER_SEC
         for peer_id in outgoing_rem_acts:
             peer_qlen = outgoing_rem_acts[peer_id].qsize()
             if not outgoing_rem_acts[peer_id].queue:
                 continue
             remact_descr = outgoing_rem_acts[peer_id].queue[0]  # peek at the first/oldest entry
-            if time.time() - remact_descr[2] >= self.request_timeout:
+            if remact_descr[2] <= expiry:
                 peer_ids.append(peer_id)
                 self.sig_log("Remote acts scavenged for removal peer id {0} qlength {1}"
                              .format(peer_id, peer_qlen))
@@ -505,7 +507,7 @@ class Signal(ControllerModule):
                 entry = rem_act_que.get()
                 if entry[0] == "invk":
                     tag = entry[1]["ActionTag"]
-                    pending_cbt = self._cfx_handle._pending_cbts.get(tag, None)
+                    pending_cbt = self._cfx_handle.take_pending_cbt(tag)
                     if pending_cbt:
                         pending_cbt.set_response("The specified recipient was not found", False)
                         self.complete_cbt(pending_cbt)
\ No newline at end of file
@@ -50,9 +50,27 @@ class TincanInterface(ControllerModule):
         self.iptool = spawn.find_executable("ip")
 
     def initialize(self):
-        self._tincan_listener_thread = Thread(target=self.__tincan_listener)
-        self._tincan_listener_thread.setDaemon(True)
-        self._tincan_listener_thread.start()
+        self.register_cbt_handlers("Request", {
+            "TCI_CREATE_LINK": self.req_handler_create_link,
+            "TCI_REMOVE_LINK": self.req_handler_remove_link,
+            "TCI_CREATE_TUNNEL": self.req_handler_create_tunnel,
+            "TCI_QUERY_CAS": self.req_handler_query_candidate_address_set,
+            "TCI_QUERY_LINK_STATS": self.req_handler_query_link_stats,
+            "TCI_QUERY_TUNNEL_INFO": self.req_handler_query_tunnel_info,
+            "TCI_REMOVE_TUNNEL": self.req_handler_remove_tunnel})
+        self.register_cbt_handlers("Response", {
+            "LOG_QUERY_CONFIG": self.resp_handler_query_log_config,
+            "TCI_CREATE_CTRL_LINK": self.resp_handler_create_control_link,
+            "TCI_CONFIGURE_LOGGING": self.resp_handler_configure_tincan_logging})
+        event_loop = self._cfx_handle.event_loop
+        if event_loop is None:
+            self._tincan_listener_thread = Thread(target=self.__tincan_listener)
+            self._tincan_listener_thread.setDaemon(True)
+            self._tincan_listener_thread.start()
+        else:
+            # asyncio engine, read Tincan messages from the shared event loop
+            self._sock_svr.setblocking(False)
+            event_loop.add_reader(self._sock_svr, self.__tincan_reader)
         self.create_control_link()
         self._tci_publisher = self._cfx_handle.publish_subscription("TCI_TINCAN_MSG_NOTIFY")
         self.register_cbt("Logger", "LOG_QUERY_CONFIG")
@@ -67,22 +85,40 @@ class TincanInterface(ControllerModule):
                 for sock in socks:
                     if sock == self._sock_svr:
                         data = sock.recvfrom(self._cm_config["MaxReadSize"])
-                        ctl = json.loads(data[0].decode("utf-8"))
-                        if ctl["IPOP"]["ProtocolVersion"] != 5:
-                            raise ValueError("Invalid control version detected")
-                        # Get the original CBT if this is the response
-                        if ctl["IPOP"]["ControlType"] == "TincanResponse":
-                            cbt = self._cfx_handle._pending_cbts[ctl["IPOP"]["TransactionId"]]
-                            cbt.set_response(ctl["IPOP"]["Response"]["Message"],
-                                             ctl["IPOP"]["Response"]["Success"])
-                            self.complete_cbt(cbt)
-                        else:
-                            self._tci_publisher.post_update(ctl["IPOP"]["Request"])
+                        self.__process_tincan_msg(data[0])
         except Exception as err:
-            log_cbt = self.register_cbt(
+            self.register_cbt(
                 "Logger", "LOG_WARNING", "Tincan Listener exception:{0}\n"
                 "{1}".format(err, traceback.format_exc()))
-            self.submit_cbt(log_cbt)
+
+    def __tincan_reader(self):
+        # read callback for the Tincan socket when running on the asyncio engine
+        try:
+            data = self._sock_svr.recvfrom(self._cm_config["MaxReadSize"])
+            self.__process_tincan_msg(data[0])
+        except BlockingIOError:
+            pass
+        except Exception as err:
+            self.register_cbt("Logger", "LOG_WARNING", "Tincan Listener exception:{0}\n"
+                              "{1}".format(err, traceback.format_exc()))
+
+    def __process_tincan_msg(self, msg):
+        ctl = json.loads(msg.decode("utf-8"))
+        if ctl["IPOP"]["ProtocolVersion"] != 5:
+            raise ValueError("Invalid control version detected")
+        # Get the original CBT if this is the response
+        if ctl["IPOP"]["ControlType"] == "TincanResponse":
+            cbt = self._cfx_handle.take_pending_cbt(ctl["IPOP"]["TransactionId"])
+            if cbt is None:
+                # the request already expired and was completed by the framework
+                self.log("LOG_WARNING", "Discarded Tincan response for an expired request %s",
+                         ctl["IPOP"]["TransactionId"])
+                return
+            cbt.set_response(ctl["IPOP"]["Response"]["Message"],
+                             ctl["IPOP"]["Response"]["Success"])
+            self.complete_cbt(cbt)
+        else:
+            self._tci_publisher.post_update(ctl["IPOP"]["Request"])
 
     def create_control_link(self,):
         self.register_cbt("Logger", "LOG_INFO", "Creating Tincan control link")
@@ -93,13 +129,14 @@ class TincanInterface(ControllerModule):
             ctl["IPOP"]["Request"]["Port"] = self._cm_config["CtrlRecvPort"]
         ctl["IPOP"]["Request"]["AddressFamily"] = "af_inet"
         ctl["IPOP"]["Request"]["IP"] = self._cm_config["RcvServiceAddress"]
-        self._cfx_handle._pending_cbts[cbt.tag] = cbt
+        self._cfx_handle._add_pending_cbt(cbt)
         self.send_control(json.dumps(ctl))
 
     def resp_handler_create_control_link(self, cbt):
         if cbt.response.status == "False":
             msg = "Failed to create Tincan response link: CBT={0}".format(cbt)
             raise RuntimeError(msg)
+        self.free_cbt(cbt)
 
     def configure_tincan_logging(self, log_cfg, use_defaults=False):
         cbt = self.create_cbt(self._module_name, self._module_name, "TCI_CONFIGURE_LOGGING")
@@ -113,13 +150,18 @@ class TincanInterface(ControllerModule):
             ctl["IPOP"]["Request"]["MaxArchives"] = log_cfg["MaxArchives"]
             ctl["IPOP"]["Request"]["MaxFileSize"] = log_cfg["MaxFileSize"]
             ctl["IPOP"]["Request"]["ConsoleLevel"] = log_cfg["ConsoleLevel"]
-        self._cfx_handle._pending_cbts[cbt.tag] = cbt
+        self._cfx_handle._add_pending_cbt(cbt)
         self.send_control(json.dumps(ctl))
 
+    def resp_handler_query_log_config(self, cbt):
+        self.configure_tincan_logging(cbt.response.data, not cbt.response.status)
+        self.free_cbt(cbt)
+
     def resp_handler_configure_tincan_logging(self, cbt):
         if cbt.response.status == "False":
             msg = "Failed to configure Tincan logging: CBT={0}".format(cbt)
             self.register_cbt("Logger", "LOG_WARNING", msg)
+        self.free_cbt(cbt)
 
     def req_handler_create_link(self, cbt):
         msg = cbt.request.params
@@ -204,42 +246,7 @@ class TincanInterface(ControllerModule):
         self.send_control(json.dumps(ctl))
 
     def process_cbt(self, cbt):
-        if cbt.op_type == "Request":
-            if cbt.request.action == "TCI_CREATE_LINK":
-                self.req_handler_create_link(cbt)
-
-            elif cbt.request.action == "TCI_REMOVE_LINK":
-                self.req_handler_remove_link(cbt)
-
-            elif cbt.request.action == "TCI_CREATE_TUNNEL":
-                self.req_handler_create_tunnel(cbt)
-
-            elif cbt.request.action == "TCI_QUERY_CAS":
-                self.req_handler_query_candidate_address_set(cbt)
-
-            elif cbt.request.action == "TCI_QUERY_LINK_STATS":
-                self.req_handler_query_link_stats(cbt)
-
-            elif cbt.request.action == "TCI_QUERY_TUNNEL_INFO":
-                self.req_handler_query_tunnel_info(cbt)
-
-            elif cbt.request.action == "TCI_REMOVE_TUNNEL":
-                self.req_handler_remove_tunnel(cbt)
-
-            else:
-                self.req_handler_default(cbt)
-        elif cbt.op_type == "Response":
-            if cbt.request.action == "LOG_QUERY_CONFIG":
-                self.configure_tincan_logging(cbt.response.data,
-                                              not cbt.response.status)
-
-            elif cbt.request.action == "TCI_CREATE_CTRL_LINK":
-                self.resp_handler_create_control_link(cbt)
-
-            elif cbt.request.action == "TCI_CONFIGURE_LOGGING":
-                self.resp_handler_configure_tincan_logging(cbt)
-
-            self.free_cbt(cbt)
+        self.dispatch_cbt(cbt)
 
     def send_control(self, msg):
         return self._sock.sendto(bytes(msg.encode("utf-8")), self._dest)
@@ -248,4 +255,5 @@ class TincanInterface(ControllerModule):
         pass
 
     def terminate(self):
-        pass
+        if self._cfx_handle.event_loop is not None:
+            self._cfx_handle.event_loop.remove_reader(self._sock_svr)
@@ -74,6 +74,8 @@ class DiscoveredPeer():
         return not self.is_banned and time.time() >= self.available_time
 
 class Topology(ControllerModule, CFX):
+    RELOADABLE_SETTINGS = ("PeerDiscoveryCoalesce",)
+
     def __init__(self, cfx_handle, module_config, module_name):
         super(Topology, self).__init__(cfx_handle, module_config, module_name)
         self._net_ovls = {}
@@ -93,7 +95,10 @@ class Topology(ControllerModule, CFX):
     def initialize(self):
         self._topo_changed_publisher = self._cfx_handle.publish_subscription("TOP_TOPOLOGY_CHANGE")
         self._cfx_handle.start_subscription("Signal", "SIG_PEER_PRESENCE_NOTIFY")
-        self._cfx_handle.start_subscription("LinkManager", "LNK_TUNNEL_EVENTS")
+        self._cfx_handle.start_subscription(
+            "LinkManager", "LNK_TUNNEL_EVENTS",
+            filters={"OverlayId": self._cfx_handle.query_param("Overlays")},
+            coalesce={"Interval": self.config.get("LinkEventBatchInterval", 0.05)})
         nid = self.node_id
         for olid in self._cfx_handle.query_param("Overlays"):
             max_wrk_ld = int(self.config["Overlays"][olid].get("MaxConcurrentEdgeSetup", 3))
@@ -110,6 +115,17 @@ class Topology(ControllerModule, CFX):
                 self.register_cbt("Logger", "LOG_WARNING",
                                   "OverlayVisualizer module not loaded."
                                   " Visualization data will not be sent.")
+        self.register_cbt_handlers("Request", {
+            "SIG_PEER_PRESENCE_NOTIFY": self.req_handler_peer_presence,
+            "VIS_DATA_REQ": self.req_handler_vis_data,
+            "LNK_TUNNEL_EVENTS": self.req_handler_tnl_data_update,
+            "TOP_REQUEST_OND_TUNNEL": self.req_handler_req_ond_tunnel,
+            "TOP_NEGOTIATE_EDGE": self.req_handler_negotiate_edge})
+        self.register_cbt_handlers("Response", {
+            "LNK_CREATE_TUNNEL": self.resp_handler_create_tnl,
+            "LNK_REMOVE_TUNNEL": self.resp_handler_remove_tnl,
+            "SIG_REMOTE_ACTION": self.resp_handler_remote_action,
+            "LNK_AUTH_TUNNEL": self.resp_handler_auth_tunnel})
         self.register_cbt("Logger", "LOG_INFO", "Module loaded")
 
     def terminate(self):
@@ -196,10 +212,61 @@ class Topology(ControllerModule, CFX):
             self.register_cbt("Logger", "LOG_WARNING", "Topology data not available {0}".
                               format(cbt.response.data))
 
+    def is_reloadable(self, key, value):
+        # only MaxConcurrentEdgeSetup of an already configured overlay can be changed
+        if key != "Overlays":
+            return super(Topology, self).is_reloadable(key, value)
+        current = self.config["Overlays"]
+        if value.keys() != current.keys():
+            return False
+        for olid, ovl_cfg in value.items():
+            keys = ovl_cfg.keys() | current[olid].keys()
+            if any(ovl_cfg.get(k) != current[olid].get(k) for k in keys
+                   if k != "MaxConcurrentEdgeSetup"):
+                return False
+        return True
+
+    def config_changed(self, changes):
+        for olid, ovl_cfg in changes.get("Overlays", {}).items():
+            if olid in self._net_ovls and "MaxConcurrentEdgeSetup" in ovl_cfg:
+                self._net_ovls[olid]["NetBuilder"].set_max_concurrent_workload(
+                    int(ovl_cfg["MaxConcurrentEdgeSetup"]))
+
     def req_handler_tnl_data_update(self, cbt):
-        params = cbt.request.params
+        # link events arrive as coalesced batches, so a burst such as a mass link flap
+        # refreshes each overlay once instead of once per event
+        updates = cbt.request.params
+        if isinstance(updates, dict):
+            updates = [updates]
+        changed_ovls = set()
+        updated_ovls = []
+        status = True
+        for params in updates:
+            # a bad update is logged and skipped, it must not cost the rest of the batch
+            try:
+                topo_changed = self._apply_tnl_update(params)
+            except Exception as err:  # pylint: disable=broad-except
+                self.log("LOG_WARNING", "Failed to apply the link update %s: %s", params,
+                         repr(err))
+                status = False
+                continue
+            olid = params["OverlayId"]
+            if topo_changed:
+                changed_ovls.add(olid)
+            if olid not in updated_ovls:
+                updated_ovls.append(olid)
+        for olid in changed_ovls:
+            self._do_topo_change_post(olid)
+        for olid in updated_ovls:
+            self._update_overlay(olid)
+        cbt.set_response(None, status)
+        self.complete_cbt(cbt)
+
+    def _apply_tnl_update(self, params):
+        """ Returns True if the update changed the overlay's connected topology """
         olid = params["OverlayId"]
         peer_id = params["PeerId"]
+        topo_changed = False
         if params["UpdateType"] == "LnkEvAuthorized":
             disc = self._net_ovls[olid]["KnownPeers"].get(peer_id)
             if not disc:
@@ -210,7 +277,7 @@ class Topology(ControllerModule, CFX):
             pass
         elif params["UpdateType"] == "LnkEvConnected":
             self._net_ovls[olid]["KnownPeers"][peer_id].restore()
-            self._do_topo_change_post(olid)
+            topo_changed = True
         elif params["UpdateType"] == "LnkEvDisconnected":
             pass
         elif params["UpdateType"] == "LnkEvDeauthorized":
@@ -219,13 +286,11 @@ class Topology(ControllerModule, CFX):
                      str(datetime.fromtimestamp(
                              self._net_ovls[olid]["KnownPeers"][peer_id].available_time)))
         elif params["UpdateType"] == "LnkEvRemoved":
-            self._do_topo_change_post(olid)
+            topo_changed = True
         else:
             self.log("LOG_WARNING", "Unknown link update type: %s", params["UpdateType"])
         self._net_ovls[olid]["NetBuilder"].update_edge_state(params)
-        self._update_overlay(olid)
-        cbt.set_response(None, True)
-        self.complete_cbt(cbt)
+        return topo_changed
 
     def req_handler_req_ond_tunnel(self, cbt):
         """
@@ -319,36 +384,7 @@ class Topology(ControllerModule, CFX):
 
     def process_cbt(self, cbt):
         with self._lock:
-            if cbt.op_type == "Request":
-                if cbt.request.action == "SIG_PEER_PRESENCE_NOTIFY":
-                    self.req_handler_peer_presence(cbt)
-                elif cbt.request.action == "VIS_DATA_REQ":
-                    self.req_handler_vis_data(cbt)
-                elif cbt.request.action == "LNK_TUNNEL_EVENTS":
-                    self.req_handler_tnl_data_update(cbt)
-                elif cbt.request.action == "TOP_REQUEST_OND_TUNNEL":
-                    self.req_handler_req_ond_tunnel(cbt)
-                elif cbt.request.action == "TOP_NEGOTIATE_EDGE":
-                    self.req_handler_negotiate_edge(cbt)
-                else:
-                    self.req_handler_default(cbt)
-            elif cbt.op_type == "Response":
-                if cbt.request.action == "LNK_CREATE_TUNNEL":
-                    self.resp_handler_create_tnl(cbt)
-                elif cbt.request.action == "LNK_REMOVE_TUNNEL":
-                    self.resp_handler_remove_tnl(cbt)
-                elif cbt.request.action == "SIG_REMOTE_ACTION":
-                    self.resp_handler_remote_action(cbt)
-                elif cbt.request.action == "LNK_AUTH_TUNNEL":
-                    self.resp_handler_auth_tunnel(cbt)
-                else:
-                    parent_cbt = cbt.parent
-                    cbt_data = cbt.response.data
-                    cbt_status = cbt.response.status
-                    self.free_cbt(cbt)
-                    if (parent_cbt is not None and parent_cbt.child_count == 1):
-                        parent_cbt.set_response(cbt_data, cbt_status)
-                        self.complete_cbt(parent_cbt)
+            self.dispatch_cbt(cbt)
 
     def _manage_topology(self):
         # Periodically refresh the topology, making sure desired links exist and exipred ones are
@@ -359,7 +395,7 @@ class Topology(ControllerModule, CFX):
     def timer_method(self):
         with self._lock:
             self._manage_topology()
-            self.log("LOG_INFO", "State=%s", str(self))
+            self.log("LOG_INFO", "State=%s", self)
 
     def top_add_edge(self, overlay_id, peer_id, edge_id):
         """
@@ -31,6 +31,8 @@ from controller.framework.ControllerModule import ControllerModule
 
 
 class UsageReport(ControllerModule):
+    RELOADABLE_SETTINGS = ("ServerAddress", "ServerPort")
+
     def __init__(self, cfx_handle, module_config, module_name):
         super(UsageReport, self).__init__(cfx_handle, module_config, module_name)
         self._stat_data = {"ready": False, "pending_request": False}
@@ -40,25 +42,26 @@ class UsageReport(ControllerModule):
     def initialize(self):
         self.register_cbt("Logger", "LOG_INFO", "{0} Loaded".format(self._module_name))
 
-    def process_cbt(self, cbt):
-        if cbt.op_type == "Response":
-            if cbt.request.action == "SIG_QUERY_REPORTING_DATA":
-                if not cbt.response.status:
-                    self.register_cbt("Logger", "LOG_WARNING",
-                                      "CBT failed {0}".format(cbt.response.data))
-                    self.free_cbt(cbt)
-                else:
-                    self.create_report(cbt)
-            else:
-                parent_cbt = cbt.parent
-                cbt_data = cbt.response.data
-                cbt_status = cbt.response.status
-                self.free_cbt(cbt)
-                if (parent_cbt is not None and parent_cbt.child_count == 1):
-                    parent_cbt.set_response(cbt_data, cbt_status)
-                    self.complete_cbt(parent_cbt)
+    def resp_handler_query_reporting_data(self, future):
+        # runs on the thread that completed the request, create_report only touches the
+        # lock protected report state
+        try:
+            resp = future.result()
+        except Exception as err:  # pylint: disable=broad-except
+            resp = None
+            self.register_cbt("Logger", "LOG_WARNING",
+                              "Reporting data request failed {0}".format(err))
+        if resp is not None and not resp.status:
+            self.register_cbt("Logger", "LOG_WARNING", "CBT failed {0}".format(resp.data))
+        if resp is None or not resp.status:
+            self.lck.acquire()
+            self._stat_data["pending_request"] = False
+            self.lck.release()
         else:
-            self.req_handler_default(cbt)
+            self.create_report(resp.data)
+
+    def process_cbt(self, cbt):
+        self.dispatch_cbt(cbt)
 
     def timer_method(self):
         cur_time = datetime.datetime.now()
@@ -69,7 +72,7 @@ class UsageReport(ControllerModule):
             self._stat_data["ready"] = False
             self._stat_data["pending_request"] = False
             self.lck.release()
-            self.submit_report(data)
+            self._cfx_handle.run_blocking(self.submit_report, data)
             self.submit_time = datetime.datetime.now()
         elif not self._stat_data["pending_request"] and cur_time > self.submit_time:
             self._stat_data["pending_request"] = True
@@ -80,11 +83,12 @@ class UsageReport(ControllerModule):
         pass
 
     def request_report(self):
-        self.register_cbt("Signal", "SIG_QUERY_REPORTING_DATA")
+        future = self.register_cbt_future("Signal", "SIG_QUERY_REPORTING_DATA",
+                                          timeout=self._cm_config.get("TimerInterval", 200))
+        future.add_done_callback(self.resp_handler_query_reporting_data)
 
-    def create_report(self, cbt):
+    def create_report(self, report_data):
         nid = self.node_id
-        report_data = cbt.response.data
         for overlay_id in report_data:
             report_data[overlay_id] = {
                 "xmpp_host": hashlib.sha1(report_data[overlay_id]["xmpp_host"].\
@@ -104,11 +108,10 @@ class UsageReport(ControllerModule):
         self._stat_data["ready"] = True
         self._stat_data["pending_request"] = False
         self.lck.release()
-        self.free_cbt(cbt)
 
     def submit_report(self, report_data):
         data = json.dumps(report_data).encode('utf8')
-        self.register_cbt("Logger", "LOG_DEBUG", "Usage report data: {0}".format(data))
+        self.log("LOG_DEBUG", "Usage report data: %s", data)
         url = None
         try:
             url = "http://" + self._cm_config["ServerAddress"] + ":" + \
@@ -0,0 +1,139 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import threading
+import unittest
+
+from controller.framework.CBT import CBT
+from controller.framework.CBTQueue import CBTQueue
+
+
+class CBTQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.shed = []
+
+    def make_queue(self, bound=0, priority=False, policy="Block"):
+        cbtq = CBTQueue(bound, priority, policy, block_timeout=0.01)
+        cbtq.on_shed = self.shed.append
+        return cbtq
+
+    @staticmethod
+    def request(action):
+        return CBT("Test", "Test", action)
+
+    @staticmethod
+    def response(action):
+        cbt = CBT("Test", "Test", action)
+        cbt.set_response(None, True)
+        return cbt
+
+    @staticmethod
+    def drain(cbtq):
+        return [cbtq.get_nowait().request.action for _ in range(cbtq.qsize())]
+
+    def test_priority_order(self):
+        """
+        Test that a priority queue serves responses, then link events, then other requests
+        and bulk requests last, each class in FIFO order.
+        """
+        cbtq = self.make_queue(priority=True)
+        for cbt in (self.request("LOG_INFO"), self.request("TOP_QUERY"),
+                    self.request("LNK_TUNNEL_EVENTS"), self.response("SIG_QUERY"),
+                    self.request("LOG_DEBUG"), self.request("TOP_REFRESH")):
+            cbtq.put(cbt)
+        self.assertEqual(self.drain(cbtq), ["SIG_QUERY", "LNK_TUNNEL_EVENTS", "TOP_QUERY",
+                                            "TOP_REFRESH", "LOG_INFO", "LOG_DEBUG"])
+        print("Passed : test_priority_order")
+
+    def test_fifo_order(self):
+        """
+        Test that without priority the queue is a single FIFO.
+        """
+        cbtq = self.make_queue()
+        for action in ("LOG_INFO", "LNK_TUNNEL_EVENTS", "TOP_QUERY"):
+            cbtq.put(self.request(action))
+        self.assertEqual(self.drain(cbtq), ["LOG_INFO", "LNK_TUNNEL_EVENTS", "TOP_QUERY"])
+        print("Passed : test_fifo_order")
+
+    def test_drop_oldest(self):
+        """
+        Test that DropOldest sheds the oldest request of the lowest priority class, in both
+        priority and FIFO mode, and sheds the new request when its priority is lower still.
+        """
+        for priority in (True, False):
+            self.shed = []
+            cbtq = self.make_queue(bound=3, priority=priority, policy="DropOldest")
+            for action in ("TOP_QUERY", "LOG_INFO", "LOG_DEBUG"):
+                cbtq.put(self.request(action))
+            cbtq.put(self.request("LNK_TUNNEL_EVENTS"))
+            self.assertEqual([cbt.request.action for cbt in self.shed], ["LOG_INFO"])
+            cbtq.put(self.request("TOP_REFRESH"))
+            cbtq.put(self.request("TOP_QUERY"))
+            self.assertEqual([cbt.request.action for cbt in self.shed],
+                             ["LOG_INFO", "LOG_DEBUG", "TOP_QUERY"])
+            self.assertEqual(cbtq.shed_count, 3)
+            self.assertEqual(sorted(self.drain(cbtq)),
+                             ["LNK_TUNNEL_EVENTS", "TOP_QUERY", "TOP_REFRESH"])
+            self.assertEqual(cbtq.unfinished_tasks, 3)
+        print("Passed : test_drop_oldest")
+
+    def test_drop_oldest_keeps_responses(self):
+        """
+        Test that responses are never shed and are accepted beyond the bound.
+        """
+        cbtq = self.make_queue(bound=1, priority=True, policy="DropOldest")
+        cbtq.put(self.response("SIG_QUERY"))
+        cbtq.put(self.request("LOG_INFO"))
+        self.assertEqual([cbt.request.action for cbt in self.shed], ["LOG_INFO"])
+        cbtq.put(self.response("TOP_QUERY"))
+        self.assertEqual(self.drain(cbtq), ["SIG_QUERY", "TOP_QUERY"])
+        print("Passed : test_drop_oldest_keeps_responses")
+
+    def test_fail(self):
+        """
+        Test that Fail sheds the submitted request and keeps the queued ones.
+        """
+        cbtq = self.make_queue(bound=2, priority=True, policy="Fail")
+        for action in ("LOG_INFO", "LOG_DEBUG", "LNK_TUNNEL_EVENTS"):
+            cbtq.put(self.request(action))
+        self.assertEqual([cbt.request.action for cbt in self.shed], ["LNK_TUNNEL_EVENTS"])
+        self.assertEqual(self.drain(cbtq), ["LOG_INFO", "LOG_DEBUG"])
+        print("Passed : test_fail")
+
+    def test_block(self):
+        """
+        Test that Block sheds the request after block_timeout, except on the consumer's own
+        thread which may exceed the bound.
+        """
+        cbtq = self.make_queue(bound=1, policy="Block")
+        cbtq.put(self.request("TOP_QUERY"))
+        cbtq.put(self.request("TOP_REFRESH"))
+        self.assertEqual([cbt.request.action for cbt in self.shed], ["TOP_REFRESH"])
+        cbtq.consumer_ident = threading.get_ident()
+        cbtq.put(self.request("LOG_INFO"))
+        self.assertEqual(len(self.shed), 1)
+        self.assertEqual(self.drain(cbtq), ["TOP_QUERY", "LOG_INFO"])
+        print("Passed : test_block")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+from unittest.mock import patch
+
+from controller.framework.CFx import CFX
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.CFxTimer import TimerWheel, NS_PER_SEC
+
+
+class _Module():
+    """ Completes the requests it receives and frees the responses to its own requests """
+    def __init__(self, cfx_handle):
+        self._cfx_handle = cfx_handle
+        self.freed = []
+
+    def process_cbt(self, cbt):
+        if cbt.op_type == "Request":
+            cbt.set_response("tunnel info", True)
+            self._cfx_handle.complete_cbt(cbt)
+        else:
+            self.freed.append(cbt)
+            self._cfx_handle.free_cbt(cbt)
+
+
+class CFxFutureTest(unittest.TestCase):
+
+    def setUp(self):
+        # the timer wheel is driven by hand on a fake clock, its thread is never started
+        self.now = 1000 * NS_PER_SEC
+        patcher = patch("controller.framework.CFxTimer.time.monotonic_ns",
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wheel = TimerWheel(resolution=0.1)
+        # a CFX without its configuration sources, arguments and modules
+        self.cfx = CFX.__new__(CFX)
+        self.cfx._recorder = None
+        self.cfx._cbt_futures = {}
+        self.cfx._cfx_handle_dict = {}
+        for name in ("Topology", "LinkManager"):
+            handle = CFxHandle(self.cfx)
+            handle._cm_instance = _Module(handle)
+            handle._timer_wheel = self.wheel
+            self.cfx._cfx_handle_dict[name] = handle
+        self.topology = self.cfx._cfx_handle_dict["Topology"]
+        self.link_manager = self.cfx._cfx_handle_dict["LinkManager"]
+
+    def advance(self, seconds):
+        self.now += int(seconds * NS_PER_SEC)
+        now_tick = self.now // self.wheel._tick_ns
+        while self.wheel._cur_tick < now_tick:
+            self.wheel._advance()
+
+    def submit(self):
+        cbt = self.topology.create_cbt("Topology", "LinkManager", "LNK_QUERY_TUNNEL_INFO")
+        return cbt, self.topology.submit_with_future(cbt, timeout=5)
+
+    def assert_freed_once(self, cbt):
+        self.assertNotIn(cbt.tag, self.topology._owned_cbts)
+        self.assertEqual(list(self.topology._cbt_pool).count(cbt), 1)
+
+    def test_resolved(self):
+        """
+        Test that the response resolves the future without being queued to the initiator,
+        and that the CBT is freed and the timeout cancelled.
+        """
+        cbt, future = self.submit()
+        self.link_manager.run_pending()
+        response = future.result(0)
+        self.assertTrue(response.status)
+        self.assertEqual(response.data, "tunnel info")
+        self.assertTrue(self.topology._cm_queue.empty())
+        self.assertEqual(self.cfx._cbt_futures, {})
+        self.assert_freed_once(cbt)
+        self.advance(10)
+        self.assertTrue(future.done() and not future.cancelled())
+        print("Passed : test_resolved")
+
+    def test_timed_out(self):
+        """
+        Test that a future whose response does not arrive in time fails with TimeoutError and
+        that its entry is dropped.
+        """
+        cbt, future = self.submit()
+        self.advance(4.5)
+        self.assertFalse(future.done())
+        self.advance(1)
+        self.assertIsInstance(future.exception(0), TimeoutError)
+        self.assertEqual(self.cfx._cbt_futures, {})
+        self.assertIn(cbt.tag, self.topology._owned_cbts)
+        print("Passed : test_timed_out")
+
+    def test_late_response(self):
+        """
+        Test that a response that arrives after the timeout is routed to the initiator, which
+        frees it once, and leaves the failed future as is.
+        """
+        cbt, future = self.submit()
+        self.advance(6)
+        self.link_manager.run_pending()
+        self.topology.run_pending()
+        self.assertEqual(self.topology._cm_instance.freed, [cbt])
+        self.assert_freed_once(cbt)
+        self.assertIsInstance(future.exception(0), TimeoutError)
+        print("Passed : test_late_response")
+
+    def test_response_after_cancel(self):
+        """
+        Test that a response to a future the caller cancelled takes the InvalidStateError path,
+        the CBT is freed once and is not queued to the initiator.
+        """
+        cbt, future = self.submit()
+        self.assertTrue(future.cancel())
+        self.link_manager.run_pending()
+        self.assertEqual(self.cfx._cbt_futures, {})
+        self.assertTrue(self.topology._cm_queue.empty())
+        self.assert_freed_once(cbt)
+        self.advance(10)
+        self.assertTrue(future.cancelled())
+        print("Passed : test_response_after_cancel")
+
+
+if __name__ == "__main__":
+    unittest.main()
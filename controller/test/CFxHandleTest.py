@@ -0,0 +1,108 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+from unittest.mock import Mock, patch
+
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.CFxTimer import NS_PER_SEC
+
+
+class CFxHandleTest(unittest.TestCase):
+
+    def setUp(self):
+        # the pending CBT index is driven on a fake clock
+        self.now = 1000 * NS_PER_SEC
+        patcher = patch("controller.framework.CFxHandle.time.monotonic_ns",
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cfx = Mock()
+        self.handle = CFxHandle(self.cfx)
+        self.handle._request_timeout = 5 * NS_PER_SEC
+
+    def advance(self, seconds):
+        self.now += int(seconds * NS_PER_SEC)
+        self.handle._expire_pending_cbts()
+
+    def pending_request(self):
+        cbt = self.handle.create_cbt("Topology", "LinkManager", "LNK_CREATE_TUNNEL")
+        cbt.time_submit = self.now
+        self.handle._add_pending_cbt(cbt)
+        return cbt
+
+    def test_expire_on_time(self):
+        """
+        Test that a pending request is completed with a timeout response once its deadline
+        has passed and not before.
+        """
+        cbt = self.pending_request()
+        self.advance(4.5)
+        self.cfx.submit_cbt.assert_not_called()
+        self.advance(1)
+        self.cfx.submit_cbt.assert_called_once_with(cbt)
+        self.assertFalse(cbt.response.status)
+        self.assertEqual(cbt.response.data, "The request has expired")
+        self.assertFalse(self.handle._pending_cbts)
+        self.assertFalse(self.handle._expiry_keys)
+        self.advance(10)
+        self.cfx.submit_cbt.assert_called_once_with(cbt)
+        print("Passed : test_expire_on_time")
+
+    def test_parent_rebucketed(self):
+        """
+        Test that a request still waiting on linked CBTs is given another timeout instead of
+        expiring, and expires once its children are done.
+        """
+        cbt = self.pending_request()
+        cbt.child_count = 1
+        self.advance(6)
+        self.cfx.submit_cbt.assert_not_called()
+        self.assertIs(self.handle._pending_cbts[cbt.tag], cbt)
+        cbt.child_count = 0
+        self.advance(4)
+        self.cfx.submit_cbt.assert_not_called()
+        self.advance(2)
+        self.cfx.submit_cbt.assert_called_once_with(cbt)
+        self.assertFalse(cbt.response.status)
+        print("Passed : test_parent_rebucketed")
+
+    def test_response_races_expiry(self):
+        """
+        Test that a request taken by its response is not expired, and that a completed
+        request is removed from the deadline index.
+        """
+        taken = self.pending_request()
+        completed = self.pending_request()
+        self.assertIs(self.handle.take_pending_cbt(taken.tag), taken)
+        self.assertIsNone(self.handle.take_pending_cbt(taken.tag))
+        completed.set_response("done", True)
+        self.handle.complete_cbt(completed)
+        self.assertFalse(self.handle._expiry_keys)
+        self.advance(6)
+        self.cfx.submit_cbt.assert_called_once_with(completed)
+        self.assertTrue(completed.response.status)
+        self.assertIsNone(taken.response)
+        print("Passed : test_response_races_expiry")
+
+
+if __name__ == "__main__":
+    unittest.main()
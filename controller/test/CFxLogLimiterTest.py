@@ -0,0 +1,112 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import unittest
+from unittest.mock import Mock, patch
+
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.CFxLogLimiter import LogRateLimiter
+
+
+class CFxLogLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        patcher = patch("controller.framework.CFxLogLimiter.time.monotonic",
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_allow_burst_then_suppress(self):
+        """
+        Test that a format string is allowed up to the burst and then suppressed.
+        """
+        limiter = LogRateLimiter(rate=2, burst=3)
+        allowed = [limiter.allow("LOG_WARNING", "Unrecognized tunnel state %s:%s")
+                   for _ in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+        # a different format string has its own bucket
+        self.assertTrue(limiter.allow("LOG_WARNING", "Resolved %s@%s->%s"))
+        print("Passed : test_allow_burst_then_suppress")
+
+    def test_allow_refills_at_rate(self):
+        """
+        Test that a suppressed format string is allowed again once its bucket refills.
+        """
+        limiter = LogRateLimiter(rate=2, burst=1)
+        self.assertTrue(limiter.allow("LOG_INFO", "msg"))
+        self.assertFalse(limiter.allow("LOG_INFO", "msg"))
+        self.now += 0.25
+        self.assertFalse(limiter.allow("LOG_INFO", "msg"))
+        self.now += 0.25
+        self.assertTrue(limiter.allow("LOG_INFO", "msg"))
+        self.assertFalse(limiter.allow("LOG_INFO", "msg"))
+        print("Passed : test_allow_refills_at_rate")
+
+    def test_take_suppressed(self):
+        """
+        Test that the suppressed counts are returned once with the last level and then reset.
+        """
+        limiter = LogRateLimiter(rate=1, burst=1)
+        for _ in range(4):
+            limiter.allow("LOG_DEBUG", "a %s")
+        limiter.allow("LOG_INFO", "a %s")
+        limiter.allow("LOG_DEBUG", "b %s")
+        self.assertEqual(limiter.take_suppressed(), [("LOG_INFO", "a %s", 4)])
+        self.assertEqual(limiter.take_suppressed(), [])
+        print("Passed : test_take_suppressed")
+
+    def test_take_suppressed_discards_refilled_buckets(self):
+        """
+        Test that the buckets of messages that are no longer logged are discarded.
+        """
+        limiter = LogRateLimiter(rate=1, burst=2)
+        limiter.allow("LOG_DEBUG", "a %s")
+        limiter.allow("LOG_DEBUG", "b %s")
+        limiter.allow("LOG_DEBUG", "b %s")
+        limiter.allow("LOG_DEBUG", "b %s")
+        self.assertEqual(limiter.take_suppressed(), [("LOG_DEBUG", "b %s", 1)])
+        self.now += 1
+        limiter.take_suppressed()
+        self.assertEqual(list(limiter._buckets), ["b %s"])
+        self.now += 1
+        limiter.take_suppressed()
+        self.assertEqual(limiter._buckets, {})
+        print("Passed : test_take_suppressed_discards_refilled_buckets")
+
+    def test_log_allowed_exempts_errors(self):
+        """
+        Test that CFxHandle applies the level filter and the rate limit, but not to errors.
+        """
+        cfx_handle = CFxHandle(Mock())
+        cfx_handle._log_level = logging.INFO
+        cfx_handle._log_limiter = LogRateLimiter(rate=1, burst=1)
+        self.assertFalse(cfx_handle.log_allowed("LOG_DEBUG", "debug"))
+        self.assertTrue(cfx_handle.log_allowed("LOG_INFO", ("info %s", (1,))))
+        self.assertFalse(cfx_handle.log_allowed("LOG_INFO", "info %s"))
+        self.assertTrue(all(cfx_handle.log_allowed("LOG_ERROR", "error") for _ in range(5)))
+        self.assertTrue(cfx_handle.log_allowed("LOG_QUERY_CONFIG", None))
+        print("Passed : test_log_allowed_exempts_errors")
+
+
+if __name__ == "__main__":
+    unittest.main()
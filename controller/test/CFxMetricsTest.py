@@ -0,0 +1,123 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import random
+import threading
+import unittest
+
+from controller.framework.CFxMetrics import CBTMetrics, LatencyHistogram, summarize_metrics
+
+
+class CFxMetricsTest(unittest.TestCase):
+
+    @staticmethod
+    def bucket(value):
+        hist = LatencyHistogram()
+        hist.record(value)
+        return hist.counts.index(1)
+
+    def test_bucket_bounds(self):
+        """
+        Test that every value falls in the bucket whose bounds contain it and that buckets are
+        within 25% of their lower bound.
+        """
+        values = list(range(0, 4096)) + [(1 << shift) + delta for shift in range(12, 63)
+                                          for delta in (-1, 0, 1)] + [(1 << 64) - 1]
+        for value in values:
+            index = self.bucket(value)
+            upper = LatencyHistogram.bucket_upper_bound(index)
+            lower = LatencyHistogram.bucket_upper_bound(index - 1) + 1 if index else 0
+            self.assertTrue(lower <= value <= upper, (value, index, lower, upper))
+            if lower < 8:
+                self.assertEqual(lower, upper)
+            else:
+                self.assertLessEqual((upper - lower + 1) * 4, lower, (value, lower, upper))
+        self.assertLess(self.bucket((1 << 64) - 1), LatencyHistogram.NUM_BUCKETS)
+        print("Passed : test_bucket_bounds")
+
+    def test_small_values_exact(self):
+        """
+        Test that values below 8ns have a bucket each.
+        """
+        self.assertEqual([self.bucket(value) for value in range(8)], list(range(8)))
+        self.assertEqual(self.bucket(-5), 0)
+        print("Passed : test_small_values_exact")
+
+    def test_percentile(self):
+        """
+        Test that percentiles are within 25% of the exact value and never above the max.
+        """
+        rnd = random.Random(7)
+        values = sorted(rnd.randint(1000, 50000000) for _ in range(5000))
+        hist = LatencyHistogram()
+        for value in values:
+            hist.record(value)
+        for pct in (50, 90, 99):
+            exact = values[-(-len(values) * pct // 100) - 1]
+            reported = hist.percentile(pct)
+            self.assertGreaterEqual(reported, exact)
+            self.assertLessEqual(reported, exact * 1.25)
+        self.assertEqual(hist.percentile(100), values[-1])
+        self.assertEqual(LatencyHistogram().percentile(50), 0)
+        print("Passed : test_percentile")
+
+    def test_merge_and_summary(self):
+        """
+        Test that the per module metrics are merged by recipient and action.
+        """
+        metrics = []
+        for latency in (1000, 3000):
+            met = CBTMetrics()
+            met.record_response(("LinkManager", "LNK_CREATE_TUNNEL"), 0, 100, 100 + latency,
+                                2 * latency)
+            metrics.append(met)
+        summary = summarize_metrics(metrics)["LinkManager:LNK_CREATE_TUNNEL"]
+        self.assertEqual(summary["EndToEnd"]["Count"], 2)
+        self.assertEqual(summary["EndToEnd"]["MaxUs"], 6.0)
+        self.assertEqual(summary["Service"]["MeanUs"], 2.0)
+        self.assertEqual(summarize_metrics(metrics, ["TCI_CREATE_LINK"]), {})
+        print("Passed : test_merge_and_summary")
+
+    def test_record_response_threads(self):
+        """
+        Test that responses recorded concurrently by the threads resolving futures and by the
+        worker are all counted.
+        """
+        met = CBTMetrics()
+        key = ("Signal", "SIG_QUERY_REPORTING_DATA")
+
+        def record():
+            for num in range(20000):
+                met.record_response(key, 0, 10, 10 + num, 100 + num)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = summarize_metrics([met])["Signal:SIG_QUERY_REPORTING_DATA"]
+        self.assertEqual(summary["EndToEnd"]["Count"], 80000)
+        self.assertEqual(summary["Service"]["Count"], 80000)
+        print("Passed : test_record_response_threads")
+
+
+if __name__ == "__main__":
+    unittest.main()
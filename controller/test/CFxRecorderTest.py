@@ -0,0 +1,127 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import patch
+
+from controller.framework.CBT import CBT
+from controller.framework.CFxRecorder import CBTRecorder, read_records
+from controller.framework.ControllerModule import ControllerModule
+from controller.tools.CBTReplay import replay
+
+
+class Echo(ControllerModule):
+    """ Answers ECHO_REQ with the data of the PEER_QUERY it sends to Peer """
+    def initialize(self):
+        self.register_cbt_handler("Request", "ECHO_REQ", self.req_handler_echo)
+        self.register_cbt_handler("Response", "PEER_QUERY", self.resp_handler_peer_query)
+
+    def req_handler_echo(self, cbt):
+        lcbt = self.create_linked_cbt(cbt)
+        lcbt.set_request(self._module_name, "Peer", "PEER_QUERY", cbt.request.params)
+        self.submit_cbt(lcbt)
+
+    def resp_handler_peer_query(self, cbt):
+        parent = cbt.parent
+        self.config["Echoed"].append(cbt.response.data)
+        self.free_cbt(cbt)
+        parent.set_response(self.config["Echoed"][-1], True)
+        self.complete_cbt(parent)
+
+    def process_cbt(self, cbt):
+        self.dispatch_cbt(cbt)
+
+    def timer_method(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+class CFxRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir)
+        self.config = {
+            "CFx": {"Model": "Test", "RecordFile": "cbt.log"},
+            "Signal": {"Overlays": {"A0FB389": {"HostAddress": "1.1.1.1", "Username": "raj",
+                                                "Password": "raj", "Keyfile": "node.key"}}},
+            "Echo": {"Echoed": []}}
+
+    def record(self, filename):
+        # Peer asks Echo twice, each time Echo queries Peer and echoes the answer
+        recorder = CBTRecorder(filename, "a0fb389", self.config)
+        for num in range(2):
+            req = CBT("Peer", "Echo", "ECHO_REQ", num)
+            recorder.record(req)
+            query = CBT("Echo", "Peer", "PEER_QUERY", num)
+            query.parent = req
+            recorder.record(query)
+            query.set_response("answer {0}".format(num), True)
+            recorder.record(query)
+            req.set_response("answer {0}".format(num), True)
+            recorder.record(req)
+        recorder.close()
+
+    def test_header_has_no_credentials(self):
+        """
+        Test that the log header keeps the configuration except for the credentials.
+        """
+        for name in ("cbt.log", "cbt.log.gz"):
+            filename = os.path.join(self.log_dir, name)
+            self.record(filename)
+            (_, _, node_id, config), records = read_records(filename)
+            self.assertEqual(node_id, "a0fb389")
+            self.assertEqual(config["Signal"]["Overlays"]["A0FB389"], {"HostAddress": "1.1.1.1"})
+            self.assertEqual(config["Echo"], {"Echoed": []})
+            self.assertEqual(len(list(records)), 8)
+            # the live configuration is left as is
+            self.assertEqual(self.config["Signal"]["Overlays"]["A0FB389"]["Password"], "raj")
+        print("Passed : test_header_has_no_credentials")
+
+    def test_replay(self):
+        """
+        Test that a replay delivers the recorded requests to the module and answers the
+        requests it sends with the recorded responses.
+        """
+        filename = os.path.join(self.log_dir, "cbt.log")
+        self.record(filename)
+        module = types.ModuleType("controller.modules.Echo")
+        module.Echo = Echo
+        with patch.dict(sys.modules, {"controller.modules.Echo": module}):
+            cfx, handle, count, _ = replay(filename, "Echo")
+        self.assertEqual(count, 2)
+        self.assertEqual(cfx.sent, 2)
+        self.assertFalse(cfx.unanswered)
+        # pylint: disable=protected-access
+        self.assertEqual(handle._cm_config["Echoed"], ["answer 0", "answer 1"])
+        self.assertFalse(handle._pending_cbts)
+        print("Passed : test_replay")
+
+
+if __name__ == "__main__":
+    unittest.main()
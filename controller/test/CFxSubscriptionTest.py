@@ -0,0 +1,98 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import threading
+import unittest
+from unittest.mock import Mock
+
+from controller.framework.CFx import CFX
+from controller.framework.CFxSubscription import CFxSubscription
+
+
+class Topology():
+    pass
+
+
+class OverlayVisualizer():
+    pass
+
+
+class CFxSubscriptionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.owner = Mock()
+        self.owner.module_name = "LinkManager"
+        self.sub = CFxSubscription("LinkManager", "LNK_TUNNEL_EVENTS")
+        self.sub._owner = self.owner
+        self.topology = Topology()
+        self.visualizer = OverlayVisualizer()
+        self.sub.add_subscriber(self.topology, filters={"OverlayId": ["A0FB389"]})
+        self.sub.add_subscriber(self.visualizer)
+
+    def recipients(self):
+        return [call[0][1] for call in self.owner.create_cbt.call_args_list]
+
+    def test_filtered_update_allocates_no_cbt(self):
+        """
+        Test that an update rejected by every subscriber's filters creates no CBT and submits
+        nothing.
+        """
+        self.sub.remove_subscriber(self.visualizer)
+        self.sub.post_update({"OverlayId": "B1FC490", "PeerId": "7f3e2d1"})
+        self.owner.create_cbt.assert_not_called()
+        self.owner.submit_cbts.assert_not_called()
+        print("Passed : test_filtered_update_allocates_no_cbt")
+
+    def test_filters(self):
+        """
+        Test that an update goes only to the subscribers whose filters accept it, and that
+        updates without the filtered key, such as source notices, go to every subscriber.
+        """
+        self.sub.post_update({"OverlayId": "B1FC490"})
+        self.assertEqual(self.recipients(), ["OverlayVisualizer"])
+        self.owner.create_cbt.reset_mock()
+        self.sub.post_update({"OverlayId": "A0FB389"})
+        self.assertEqual(sorted(self.recipients()), ["OverlayVisualizer", "Topology"])
+        self.owner.create_cbt.reset_mock()
+        self.sub.post_update("SUBSCRIPTION_SOURCE_TERMINATED")
+        self.assertEqual(sorted(self.recipients()), ["OverlayVisualizer", "Topology"])
+        self.assertEqual(self.owner.submit_cbts.call_count, 3)
+        print("Passed : test_filters")
+
+    def test_remove_subscription(self):
+        """
+        Test that removing a subscription notifies its subscribers and unregisters it once.
+        """
+        cfx = CFX.__new__(CFX)
+        cfx._subscriptions = {}
+        cfx._subscription_lock = threading.Lock()
+        cfx._cfx_handle_dict = {"LinkManager": self.owner}
+        sub = cfx.publish_subscription("LinkManager", "LNK_TUNNEL_EVENTS", self.owner)
+        sub.add_subscriber(self.topology)
+        cfx.remove_subscription(sub)
+        self.assertIsNone(cfx.find_subscription("LinkManager", "LNK_TUNNEL_EVENTS"))
+        self.assertEqual(self.owner.create_cbt.call_args[0][3], "SUBSCRIPTION_SOURCE_TERMINATED")
+        self.assertRaises(NameError, cfx.remove_subscription, sub)
+        print("Passed : test_remove_subscription")
+
+
+if __name__ == "__main__":
+    unittest.main()
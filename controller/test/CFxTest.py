@@ -0,0 +1,228 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import copy
+import json
+import threading
+import time
+import unittest
+
+from controller.framework.CFx import CFX
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.ControllerModule import ControllerModule
+from controller.modules.Topology import Topology
+
+
+class _InitHandle():
+    """ Records when the module's initialize() starts and ends """
+    def __init__(self, name, events, lock, fail=False):
+        self._name = name
+        self._events = events
+        self._lock = lock
+        self._fail = fail
+
+    def initialize(self):
+        with self._lock:
+            self._events.append(("start", self._name))
+        time.sleep(0.02)
+        if self._fail:
+            raise ValueError("{0} failed to initialize".format(self._name))
+        with self._lock:
+            self._events.append(("end", self._name))
+
+
+class Signal(ControllerModule):
+    """ Applies PresenceInterval on a reload and records the changes it is notified of """
+    RELOADABLE_SETTINGS = ("PresenceInterval",)
+
+    def __init__(self, cfx_handle, module_config, module_name):
+        super(Signal, self).__init__(cfx_handle, module_config, module_name)
+        self.changes = []
+
+    def initialize(self):
+        pass
+
+    def process_cbt(self, cbt):
+        pass
+
+    def timer_method(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def config_changed(self, changes):
+        self.changes.append(changes)
+
+
+class CFxTest(unittest.TestCase):
+
+    def create_cfx(self, config, failing=()):
+        # a CFX without its configuration sources, arguments and modules
+        cfx = CFX.__new__(CFX)
+        cfx._config = config
+        cfx._load_order = list(config)
+        cfx._init_times = {}
+        self.events = []
+        lock = threading.Lock()
+        cfx._cfx_handle_dict = {name: _InitHandle(name, self.events, lock, name in failing)
+                                for name in config}
+        return cfx
+
+    @staticmethod
+    def init_config():
+        return {"Logger": {},
+                "OverlayVisualizer": {"Dependencies": ["Logger"]},
+                "TincanInterface": {"Dependencies": ["Logger"]},
+                "Signal": {"Dependencies": ["Logger"]},
+                "LinkManager": {"Dependencies": ["Logger", "TincanInterface", "Signal"],
+                                "InitAfter": ["OverlayVisualizer", "UsageReport"]},
+                "Topology": {"Dependencies": ["Logger", "Signal", "LinkManager"],
+                             "InitAfter": ["OverlayVisualizer"]}}
+
+    def run_init(self, cfx, max_workers):
+        # a hung executor fails the test instead of blocking the run
+        errors = []
+
+        def init():
+            try:
+                cfx.initialize_modules(max_workers)
+            except Exception as err:  # pylint: disable=broad-except
+                errors.append(err)
+        thread = threading.Thread(target=init, daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), "initialize_modules did not return")
+        return errors
+
+    def test_init_dependency_order(self):
+        """
+        Test that a module is initialized only after its dependencies and the loaded modules
+        in its InitAfter, and that independent modules are initialized concurrently.
+        """
+        config = self.init_config()
+        for max_workers in (1, 4):
+            cfx = self.create_cfx(config)
+            self.assertEqual(self.run_init(cfx, max_workers), [])
+            self.assertEqual(sorted(cfx._init_times), sorted(config))
+            for name, mod_cfg in config.items():
+                start = self.events.index(("start", name))
+                for dep in mod_cfg.get("Dependencies", []) + mod_cfg.get("InitAfter", []):
+                    if dep in config:
+                        self.assertLess(self.events.index(("end", dep)), start, (name, dep))
+        # the three modules that only depend on Logger overlap
+        starts = [self.events.index(("start", name))
+                  for name in ("OverlayVisualizer", "TincanInterface", "Signal")]
+        self.assertLess(max(starts), self.events.index(("end", "Signal")))
+        print("Passed : test_init_dependency_order")
+
+    def test_init_failure(self):
+        """
+        Test that a failing initialize() is raised to the caller, after the modules already
+        running have finished, and that its dependents are not initialized.
+        """
+        for max_workers in (1, 4):
+            cfx = self.create_cfx(self.init_config(), failing=("Signal",))
+            errors = self.run_init(cfx, max_workers)
+            self.assertEqual([str(err) for err in errors], ["Signal failed to initialize"])
+            started = [name for kind, name in self.events if kind == "start"]
+            self.assertNotIn("LinkManager", started)
+            self.assertNotIn("Topology", started)
+            self.assertEqual(self.events.count(("end", "Logger")), 1)
+        print("Passed : test_init_failure")
+
+    def test_init_cycle(self):
+        """
+        Test that a cycle through InitAfter is reported instead of leaving modules out.
+        """
+        config = {"Logger": {}, "Signal": {"InitAfter": ["Topology"]},
+                  "Topology": {"Dependencies": ["Signal"]}}
+        cfx = self.create_cfx(config)
+        errors = self.run_init(cfx, 4)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], RuntimeError)
+        self.assertIn("Signal", str(errors[0]))
+        print("Passed : test_init_cycle")
+
+    def reload_cfx(self, config, new_config):
+        # a CFX started with config, whose configuration sources now hold new_config
+        cfx = CFX.__new__(CFX)
+        cfx._default_config = copy.deepcopy(config)
+        cfx._config = copy.deepcopy(config)
+        cfx._config_file = None
+        cfx._config_string = json.dumps(new_config)
+        cfx._cfx_handle_dict = {}
+        handle = CFxHandle(cfx)
+        handle._cm_config = cfx._config["Signal"]
+        handle._cm_instance = Signal(handle, handle._cm_config, "Signal")
+        # the changes are applied right away instead of on the module's worker
+        handle.schedule_timer = lambda delay, callback, *args, **kwargs: callback(*args)
+        cfx._cfx_handle_dict["Signal"] = handle
+        return cfx, handle
+
+    def test_reload_config(self):
+        """
+        Test that a reload applies the reloadable settings and notifies the module of them,
+        and reports the other changed settings and the newly enabled modules as requiring a
+        restart.
+        """
+        config = {"CFx": {"Model": "Default", "NodeId": "a0fb389"},
+                  "Signal": {"Enabled": True, "TimerInterval": 30, "PresenceInterval": 10,
+                             "CacheExpiry": 5},
+                  "UsageReport": {"Enabled": False}}
+        new_config = {"CFx": {"Model": "Test"},
+                      "Signal": {"TimerInterval": 20, "PresenceInterval": 20,
+                                 "CacheExpiry": 30},
+                      "UsageReport": {"Enabled": True}}
+        cfx, handle = self.reload_cfx(config, new_config)
+        changed = cfx.reload_config()
+        self.assertEqual(changed, {"Applied": {"Signal": ["PresenceInterval", "TimerInterval"]},
+                                   "RestartRequired": {"Signal": ["CacheExpiry"],
+                                                       "CFx": ["Model"]},
+                                   "NotLoaded": ["UsageReport"]})
+        self.assertEqual(handle._cm_instance.changes,
+                         [{"PresenceInterval": 20, "TimerInterval": 20}])
+        self.assertEqual(handle._cm_config["PresenceInterval"], 20)
+        self.assertEqual(handle._cm_config["CacheExpiry"], 5)
+        self.assertEqual(handle._timer_interval, 20)
+        print("Passed : test_reload_config")
+
+    def test_reload_overlays(self):
+        """
+        Test that Topology applies a changed Overlays section only when the overlays'
+        MaxConcurrentEdgeSetup is all that changed.
+        """
+        config = {"Overlays": {"A0FB389": {"Name": "Ring", "MaxConcurrentEdgeSetup": 3}}}
+        top = Topology(None, config, "Topology")
+        self.assertTrue(top.is_reloadable(
+            "Overlays", {"A0FB389": {"Name": "Ring", "MaxConcurrentEdgeSetup": 5}}))
+        self.assertFalse(top.is_reloadable(
+            "Overlays", {"A0FB389": {"Name": "Star", "MaxConcurrentEdgeSetup": 5}}))
+        self.assertFalse(top.is_reloadable(
+            "Overlays", {"A0FB389": {"Name": "Ring", "MaxConcurrentEdgeSetup": 3},
+                         "B1FC490": {"Name": "Ring", "MaxConcurrentEdgeSetup": 3}}))
+        self.assertTrue(top.is_reloadable("PeerDiscoveryCoalesce", 4))
+        self.assertFalse(top.is_reloadable("LinkEventBatchInterval", 0.1))
+        print("Passed : test_reload_overlays")
+
+
+if __name__ == "__main__":
+    unittest.main()
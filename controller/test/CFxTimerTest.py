@@ -0,0 +1,111 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+from unittest.mock import patch
+
+from controller.framework.CFxTimer import TimerWheel, NS_PER_SEC
+
+
+class CFxTimerTest(unittest.TestCase):
+
+    def setUp(self):
+        # the wheel is driven by hand on a fake clock, its thread is never started
+        self.now = 1000 * NS_PER_SEC
+        patcher = patch("controller.framework.CFxTimer.time.monotonic_ns",
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wheel = TimerWheel(resolution=0.1)
+        self.fired = []
+
+    def advance(self, seconds):
+        # move the clock and service the ticks that have elapsed, like the wheel's thread
+        self.now += int(seconds * NS_PER_SEC)
+        now_tick = self.now // self.wheel._tick_ns
+        while self.wheel._cur_tick < now_tick:
+            self.wheel._advance()
+
+    def test_firing_order(self):
+        """
+        Test that events fire in deadline order and not before their deadline.
+        """
+        for name, delay in (("c", 0.3), ("a", 0.1), ("b", 0.2), ("d", 60)):
+            self.wheel.schedule(delay, self.fired.append, name)
+        self.advance(0.05)
+        self.assertEqual(self.fired, [])
+        self.advance(0.25)
+        self.assertEqual(self.fired, ["a", "b", "c"])
+        # a delay longer than a turn of the wheel is not fired on an earlier turn
+        self.advance(TimerWheel.NUM_SLOTS * 0.1 - 0.3)
+        self.assertEqual(self.fired, ["a", "b", "c"])
+        self.advance(60)
+        self.assertEqual(self.fired, ["a", "b", "c", "d"])
+        print("Passed : test_firing_order")
+
+    def test_interval_rearms(self):
+        """
+        Test that an event with an interval fires once per interval.
+        """
+        self.wheel.schedule(0.2, self.fired.append, "p", interval=0.2)
+        for _ in range(3):
+            self.advance(0.2)
+        self.assertEqual(self.fired, ["p", "p", "p"])
+        print("Passed : test_interval_rearms")
+
+    def test_interval_not_redelivered_while_queued(self):
+        """
+        Test that a delivered periodic event is not posted again until its consumer runs it.
+        """
+        delivered = []
+        event = self.wheel.schedule(0.1, self.fired.append, "q", interval=0.1,
+                                    deliver=delivered.append)
+        self.advance(0.3)
+        self.assertEqual(delivered, [event])
+        event.run()
+        self.assertEqual(self.fired, ["q"])
+        self.advance(0.1)
+        self.assertEqual(delivered, [event, event])
+        print("Passed : test_interval_not_redelivered_while_queued")
+
+    def test_cancel(self):
+        """
+        Test that a cancelled event does not fire, nor does a cancelled periodic event.
+        """
+        once = self.wheel.schedule(0.1, self.fired.append, "once")
+        periodic = self.wheel.schedule(0.1, self.fired.append, "periodic", interval=0.1)
+        once.cancel()
+        self.advance(0.1)
+        self.assertEqual(self.fired, ["periodic"])
+        periodic.cancel()
+        self.advance(0.5)
+        self.assertEqual(self.fired, ["periodic"])
+        # a cancelled event that is already queued does not run
+        queued = self.wheel.schedule(0.1, self.fired.append, "queued", deliver=lambda ev: None)
+        self.advance(0.1)
+        queued.cancel()
+        queued.run()
+        self.assertEqual(self.fired, ["periodic"])
+        print("Passed : test_cancel")
+
+
+if __name__ == "__main__":
+    unittest.main()
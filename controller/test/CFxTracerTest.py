@@ -0,0 +1,90 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.CFxTracer import CBTTracer
+
+
+class _Router():
+    """ Stand-in for CFx that only routes CBTs between the handles """
+    def __init__(self):
+        self.handles = {}
+
+    def submit_cbt(self, cbt):
+        recipient = cbt.request.recipient
+        if cbt.op_type == "Response":
+            recipient = cbt.response.recipient
+        self.handles[recipient]._cm_queue.put(cbt)  # pylint: disable=protected-access
+
+
+class _Module():
+    def __init__(self, cfx_handle):
+        self._cfx_handle = cfx_handle
+
+    def process_cbt(self, cbt):
+        if cbt.op_type == "Request":
+            cbt.set_response(None, True)
+            self._cfx_handle.complete_cbt(cbt)
+        else:
+            self._cfx_handle.free_cbt(cbt)
+
+
+class CFxTracerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = CBTTracer("a0fb389", 16)
+        self.router = _Router()
+        for name in ("Topology", "LinkManager"):
+            handle = CFxHandle(self.router)
+            # pylint: disable=protected-access
+            handle._cm_instance = _Module(handle)
+            handle._tracer = self.tracer
+            self.router.handles[name] = handle
+
+    def test_service_span_without_metrics(self):
+        """
+        Test that with metrics disabled a traced request still has a service span on the
+        recipient's track, starting when the recipient dequeued it.
+        """
+        topology = self.router.handles["Topology"]
+        link_manager = self.router.handles["LinkManager"]
+        self.assertIsNone(topology._metrics)  # pylint: disable=protected-access
+        cbt = topology.create_cbt("Topology", "LinkManager", "LNK_QUERY_TUNNEL_INFO")
+        topology.submit_cbt(cbt)
+        link_manager.run_pending()
+        topology.run_pending()
+        events = self.tracer.export()["traceEvents"]
+        tracks = {evt["args"]["name"]: evt["tid"] for evt in events
+                  if evt["name"] == "thread_name"}
+        (span,) = [evt for evt in events if evt.get("cat") == "cbt"]
+        (service,) = [evt for evt in events if evt.get("cat") == "service"]
+        self.assertEqual(span["tid"], tracks["Topology"])
+        self.assertEqual(service["tid"], tracks["LinkManager"])
+        self.assertEqual(service["name"], "LNK_QUERY_TUNNEL_INFO")
+        self.assertGreaterEqual(service["ts"], span["ts"])
+        self.assertLessEqual(service["dur"], span["dur"])
+        print("Passed : test_service_span_without_metrics")
+
+
+if __name__ == "__main__":
+    unittest.main()
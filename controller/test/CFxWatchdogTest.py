@@ -0,0 +1,111 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.CFxWatchdog import HandlerWatchdog
+
+
+class LinkManager():
+    """ Blocks in process_cbt until it is released """
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def process_cbt(self, cbt):
+        self.entered.set()
+        self.release.wait(10)
+        cbt.set_response(None, True)
+
+
+class CFxWatchdogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cfx = Mock()
+        self.handle = CFxHandle(self.cfx)
+        self.module = LinkManager()
+        self.handle._cm_instance = self.module
+        self.handle._watched = True
+        self.watchdog = HandlerWatchdog({"LinkManager": self.handle}, 0.05)
+        self.addCleanup(self.module.release.set)
+
+    def run_worker(self):
+        # service one request on a worker thread, like the module's worker
+        def worker():
+            self.handle._cm_queue.consumer_ident = threading.get_ident()
+            self.handle.run_pending()
+        cbt = self.handle.create_cbt("Topology", "LinkManager", "LNK_CREATE_TUNNEL")
+        cbt.completed = True
+        self.handle._cm_queue.put(cbt)
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        self.assertTrue(self.module.entered.wait(5))
+        return thread
+
+    def logged(self):
+        return [call[0][0].request.params for call in self.cfx.submit_cbt.call_args_list
+                if call[0][0].request.action == "LOG_WARNING"]
+
+    def test_flags_stalled_worker(self):
+        """
+        Test that a worker stuck in a handler past the budget is reported once with its
+        stack, and that the stall is counted after the worker recovers.
+        """
+        thread = self.run_worker()
+        self.watchdog.check()
+        self.assertEqual(self.logged(), [])
+        time.sleep(0.1)
+        self.watchdog.check()
+        self.watchdog.check()
+        (msg,) = self.logged()
+        self.assertIn("Handler stalled", msg)
+        self.assertIn("Request LNK_CREATE_TUNNEL from Topology", msg)
+        self.assertIn("in process_cbt", msg)
+        stats = self.watchdog.stats()["LinkManager"]
+        self.assertEqual(stats["Stalls"], 1)
+        self.assertEqual(stats["Current"]["Item"], "Request LNK_CREATE_TUNNEL from Topology")
+        self.module.release.set()
+        thread.join(5)
+        self.watchdog.check()
+        stats = self.watchdog.stats()["LinkManager"]
+        self.assertIsNone(stats["Current"])
+        self.assertEqual(stats["Stalls"], 1)
+        self.assertEqual(len(self.logged()), 1)
+        print("Passed : test_flags_stalled_worker")
+
+    def test_idle_worker(self):
+        """
+        Test that an idle worker is not flagged.
+        """
+        time.sleep(0.1)
+        self.watchdog.check()
+        self.assertEqual(self.logged(), [])
+        self.assertEqual(self.watchdog.stats()["LinkManager"],
+                         {"Stalls": 0, "LastStall": None, "Current": None})
+        print("Passed : test_idle_worker")
+
+
+if __name__ == "__main__":
+    unittest.main()
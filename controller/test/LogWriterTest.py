@@ -0,0 +1,102 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from controller.modules.LogWriter import BinaryLogWriter, read_binary_log
+from controller.tools.LogDecoder import format_record
+
+
+class LogWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir)
+        self.filename = os.path.join(self.log_dir, "ctrl.blog")
+
+    def read_logs(self):
+        # decode each file on its own, the oldest archive first
+        names = sorted((name for name in os.listdir(self.log_dir) if name != "ctrl.blog"),
+                       key=lambda name: -int(name.rsplit(".", 1)[1]))
+        return [list(read_binary_log(os.path.join(self.log_dir, name)))
+                for name in names + ["ctrl.blog"]]
+
+    def test_round_trip_with_rotation(self):
+        """
+        Test that the records written across rotated files decode to what was logged, with
+        every file restating the module names and format strings it uses.
+        """
+        writer = BinaryLogWriter(self.filename, max_bytes=256, backup_count=20)
+        records = [(1000.0 + i, logging.INFO if i % 2 else logging.DEBUG,
+                    "Topology" if i % 3 else "LinkManager", "Peer %s edge %d", ("a" * 7, i))
+                   for i in range(30)]
+        for record in records:
+            writer.append(record)
+        writer.close()
+        files = self.read_logs()
+        self.assertGreater(len(files), 2)
+        self.assertEqual([rec for recs in files for rec in recs], records)
+        print("Passed : test_round_trip_with_rotation")
+
+    def test_dropped_records(self):
+        """
+        Test that records dropped from a full buffer are reported by a warning entry ahead of
+        the records that were kept.
+        """
+        writer = BinaryLogWriter(self.filename, buffer_size=4, flush_interval=60)
+        # keep the writer from flushing until it is closed
+        writer._flush_records = 1000
+        for i in range(6):
+            writer.append((1000.0 + i, logging.INFO, "Signal", "Presence %d", (i,)))
+        writer.close()
+        records = self.read_logs()[-1]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0][1:], (logging.WARNING, "",
+                                          "%d log records were dropped, the log buffer was full",
+                                          (2,)))
+        self.assertEqual([rec[4] for rec in records[1:]], [(2,), (3,), (4,), (5,)])
+        self.assertEqual(writer.query_stats()["Dropped"], 2)
+        print("Passed : test_dropped_records")
+
+    def test_format_record(self):
+        """
+        Test that the decoder always applies the format string, as the text log does, and that
+        a logging record without arguments keeps its message as is.
+        """
+        line = format_record(1000.0, logging.INFO, "Topology", "100%% of %d peers", (4,))
+        self.assertTrue(line.endswith("INFO:Topology: 100% of 4 peers"))
+        line = format_record(1000.0, logging.INFO, "Topology", "100%% done", ())
+        self.assertTrue(line.endswith("INFO:Topology: 100% done"))
+        writer = BinaryLogWriter(self.filename)
+        writer.emit(logging.LogRecord("slixmpp", logging.WARNING, __file__, 1, "50% off", (),
+                                      None))
+        writer.close()
+        (record,) = self.read_logs()[-1]
+        self.assertTrue(format_record(*record).endswith("WARNING:50% off"))
+        print("Passed : test_format_record")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from controller.framework.CFx import CFX
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.ControllerModule import ControllerModule
+from controller.modules.Logger import Logger
+from controller.modules.LogWriter import read_binary_log
+
+
+class LinkManager(ControllerModule):
+    """ Logs a debug record for each request and then fails to handle it """
+    def initialize(self):
+        pass
+
+    def process_cbt(self, cbt):
+        self.log("LOG_DEBUG", "Creating tunnel %s", cbt.request.params)
+        raise KeyError(cbt.request.params)
+
+    def timer_method(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+class LoggerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp() + "/"
+        self.addCleanup(shutil.rmtree, self.log_dir)
+        # a CFX without its configuration sources, arguments and workers, it only routes CBTs
+        self.cfx = CFX.__new__(CFX)
+        self.cfx._recorder = None
+        self.cfx._cbt_futures = {}
+        self.cfx._cfx_handle_dict = {}
+        config = {"LogLevel": "WARNING", "Device": "File", "Directory": self.log_dir,
+                  "CtrlLogFileName": "ctrl.log", "MaxFileSize": 0, "MaxArchives": 0,
+                  "FlightRecorder": 16, "DumpInterval": 60}
+        for name, module in (("Logger", Logger), ("LinkManager", LinkManager)):
+            handle = CFxHandle(self.cfx)
+            handle._cm_config = dict(config) if name == "Logger" else {}
+            handle._cm_instance = module(handle, handle._cm_config, name)
+            self.cfx._cfx_handle_dict[name] = handle
+        self.logger = self.cfx._cfx_handle_dict["Logger"]
+        self.link_manager = self.cfx._cfx_handle_dict["LinkManager"]
+        self.logger._cm_instance.initialize()
+        self.addCleanup(self.close_log)
+
+    def close_log(self):
+        py_logger = logging.getLogger("IPOP Rotating Log")
+        for handler in list(py_logger.handlers):
+            py_logger.removeHandler(handler)
+            handler.close()
+
+    def dumps(self):
+        return sorted(name for name in os.listdir(self.log_dir) if name.endswith(".blog"))
+
+    def run_request(self, tunnel):
+        cbt = self.link_manager.create_cbt("LinkManager", "LinkManager", "LNK_CREATE_TUNNEL",
+                                           tunnel)
+        self.link_manager._cm_queue.put(cbt)
+        self.link_manager.run_pending()
+        self.logger.run_pending()
+
+    def test_dump_on_exception(self):
+        """
+        Test that a handler exception dumps the flight recorder, with the records below the
+        log level that led up to it followed by the exception's record, and that automatic
+        dumps are throttled by DumpInterval.
+        """
+        self.assertTrue(self.link_manager._log_recording)
+        self.run_request("a1b2c3d")
+        (dump,) = self.dumps()
+        records = list(read_binary_log(self.log_dir + dump))
+        self.assertEqual([(rec[1], rec[2]) for rec in records[-2:]],
+                         [(logging.DEBUG, "LinkManager"), (logging.WARNING, "LinkManager")])
+        self.assertEqual(records[-2][3] % records[-2][4], "Creating tunnel a1b2c3d")
+        self.assertIn("Process CBT exception", records[-1][4][0])
+        # the debug record was kept by the recorder only
+        with open(self.log_dir + "ctrl.log") as log:
+            text = log.read()
+        self.assertNotIn("Creating tunnel", text)
+        self.assertIn("Flight recorder dumped", text)
+        self.run_request("e4f5a6b")
+        self.assertEqual(len(self.dumps()), 1)
+        print("Passed : test_dump_on_exception")
+
+
+if __name__ == "__main__":
+    unittest.main()
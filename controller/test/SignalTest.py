@@ -352,6 +352,7 @@ class SignalTest(unittest.TestCase):
         """
         cfx_handle = Mock()
         cfx_handle.query_param.return_value = 30
+        cfx_handle.event_loop = None
         module = importlib.import_module("controller.modules.{0}"
                                          .format("Signal"))
         module_class = getattr(module, "Signal")
@@ -550,6 +551,8 @@ class SignalTest(unittest.TestCase):
         cbt.op_type = "Request"
         cbt.request.action = "SIG_REMOTE_ACTION"
         signal.req_handler_initiate_remote_action = MagicMock()
+        signal._create_transport_instance = MagicMock()
+        signal.initialize()
         signal.process_cbt(cbt)
         signal.req_handler_initiate_remote_action.assert_called_once()
         print("Passed : testprocess_cbt_request_rem_act")
@@ -563,6 +566,8 @@ class SignalTest(unittest.TestCase):
         cbt.op_type = "Request"
         cbt.request.action = "SIG_QUERY_REPORTING_DATA"
         signal.req_handler_query_reporting_data = MagicMock()
+        signal._create_transport_instance = MagicMock()
+        signal.initialize()
         signal.process_cbt(cbt)
         signal.req_handler_query_reporting_data.assert_called_once()
         print("Passed : testprocess_cbt_request_rep_data")
@@ -595,11 +600,13 @@ class SignalTest(unittest.TestCase):
         cbt.response = resp
         cbt.response.status = "OK"
         cbt1.child_count = 1
-        signal.free_cbt = MagicMock()
+        # like CFxHandle.free_cbt, freeing the child decrements its parent's child count
+        signal.free_cbt = MagicMock(side_effect=lambda child: setattr(
+            child.parent, "child_count", child.parent.child_count - 1))
         signal.complete_cbt = MagicMock()
         signal.process_cbt(cbt)
         signal.free_cbt.assert_called_once()
-        signal.complete_cbt.assert_called_once()
+        signal.complete_cbt.assert_called_once_with(cbt1)
         print("Passed : test_process_cbt_resp_with_parent")
 
     def testsignal_process_cbt_resp_with_parent_more_children(self):
@@ -616,7 +623,8 @@ class SignalTest(unittest.TestCase):
         cbt.response = resp
         cbt.response.status = "OK"
         cbt1.child_count = 2
-        signal.free_cbt = MagicMock()
+        signal.free_cbt = MagicMock(side_effect=lambda child: setattr(
+            child.parent, "child_count", child.parent.child_count - 1))
         signal.complete_cbt = MagicMock()
         signal.process_cbt(cbt)
         signal.free_cbt.assert_called_once()
@@ -662,22 +670,23 @@ class SignalTest(unittest.TestCase):
         signal = module_class(cfx_handle, sig_dict, "Signal")
         cfx_handle._cm_instance = signal
         cfx_handle._cm_config = sig_dict
+        cfx_handle._request_timeout = 5 * 1000000000
         cbt1 = CBT()
         cbt1.tag = "1"
-        cbt1.time_submit = time.time() - 5
-        signal.request_timeout = 5
+        cbt1.time_submit = time.monotonic_ns() - 6 * 1000000000
         cbt2 = CBT()
         cbt2.tag = "2"
-        cbt2.time_submit = time.time() - 1
-        signal.complete_cbt = MagicMock()
-        signal._cfx_handle._pending_cbts.update({"0": cbt1})
-        signal._cfx_handle._pending_cbts.update({"1": cbt2})
+        cbt2.time_submit = time.monotonic_ns() - 1 * 1000000000
+        # the expiry takes the CBT from the pending CBTs before completing it
+        cfx_handle.complete_cbt = MagicMock(
+            side_effect=lambda cbt: cfx_handle._pending_cbts.pop(cbt.tag, None))
+        cfx_handle._add_pending_cbt(cbt1)
+        cfx_handle._add_pending_cbt(cbt2)
         assert len(signal._cfx_handle._pending_cbts.items()) == 2
-        signal.scavenge_pending_cbts()
-        assert len(signal._cfx_handle._pending_cbts.items()) == 1
-        items = {}
-        items.update({"1": cbt2})
-        assert signal._cfx_handle._pending_cbts == items
+        cfx_handle._expire_pending_cbts()
+        cfx_handle.complete_cbt.assert_called_once_with(cbt1)
+        assert cbt1.response.status is False
+        assert signal._cfx_handle._pending_cbts == {"2": cbt2}
         print("Passed : testsignal_scavenge_pending_cbts")
 
     def testsignal_scavenge_expired_outgoing_rem_acts_single_entry(self):
@@ -726,13 +735,11 @@ class SignalTest(unittest.TestCase):
         jid_cache = JidCache(signal, 5)
         transport.send_presence = MagicMock()
         jid_cache.scavenge = MagicMock()
-        signal.scavenge_pending_cbts = MagicMock()
         signal._circles = {
             "A0FB389": {"Announce": 0, "Transport": transport, "OutgoingRemoteActs": rem_acts, "JidCache": jid_cache}}
         signal.timer_method()
         transport.send_presence.assert_called_once()
         jid_cache.scavenge.assert_called_once()
-        signal.scavenge_pending_cbts.assert_called_once()
         print("Passed : testsignal_timer_method")
 
 
@@ -0,0 +1,81 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.  IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+from unittest.mock import MagicMock, Mock
+
+from controller.framework.CBT import CBT
+from controller.modules.Topology import Topology
+
+
+class TopologyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cfx_handle = Mock()
+        config = {"PeerDiscoveryCoalesce": 1, "NodeId": "1234434323",
+                  "Overlays": {"A0FB389": {"MaxConcurrentEdgeSetup": 3}}}
+        self.top = Topology(self.cfx_handle, config, "Topology")
+        self.net_builder = MagicMock()
+        self.top._net_ovls["A0FB389"] = dict(KnownPeers={}, NetBuilder=self.net_builder)
+        self.top._do_topo_change_post = MagicMock()
+        self.top._update_overlay = MagicMock()
+
+    @staticmethod
+    def link_update(olid, update_type):
+        return {"OverlayId": olid, "PeerId": "7f3e2d1", "TunnelId": "a1b2c3d",
+                "UpdateType": update_type}
+
+    def test_tnl_data_update_bad_entry(self):
+        """
+        Test that an update that fails is logged and skipped while the rest of its batch is
+        applied and the overlays it changed are refreshed.
+        """
+        cbt = CBT("LinkManager", "Topology", "LNK_TUNNEL_EVENTS", [
+            self.link_update("A0FB389", "LnkEvAuthorized"),
+            self.link_update("BAD0000", "LnkEvConnected"),
+            self.link_update("A0FB389", "LnkEvConnected")])
+        self.top.req_handler_tnl_data_update(cbt)
+        self.assertEqual(self.net_builder.update_edge_state.call_count, 2)
+        self.top._do_topo_change_post.assert_called_once_with("A0FB389")
+        self.top._update_overlay.assert_called_once_with("A0FB389")
+        self.cfx_handle.complete_cbt.assert_called_once_with(cbt)
+        self.assertFalse(cbt.response.status)
+        log = self.cfx_handle.create_cbt.call_args[1]
+        self.assertEqual(log["action"], "LOG_WARNING")
+        self.assertIn("BAD0000", log["params"][1][0])
+        print("Passed : test_tnl_data_update_bad_entry")
+
+    def test_tnl_data_update_single(self):
+        """
+        Test that a single update that was not coalesced is applied.
+        """
+        cbt = CBT("LinkManager", "Topology", "LNK_TUNNEL_EVENTS",
+                  self.link_update("A0FB389", "LnkEvAuthorized"))
+        self.top.req_handler_tnl_data_update(cbt)
+        self.net_builder.update_edge_state.assert_called_once()
+        self.top._do_topo_change_post.assert_not_called()
+        self.top._update_overlay.assert_called_once_with("A0FB389")
+        self.assertTrue(cbt.response.status)
+        print("Passed : test_tnl_data_update_single")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Micro-benchmark of the CBT create/submit/respond/free cycle with and without the CFxHandle
+CBT free list. Reports throughput, the number of objects allocated and the garbage collector
+activity for each configuration. The pooled run uses the shipped CbtPoolSize by default, a
+burst larger than the pool allocates most of its CBTs afresh.
+
+Usage: python -m controller.tools.CBTPoolBenchmark [-n iterations] [-b batch] [-p pool_size]
+"""
+
+import argparse
+import gc
+import time
+from collections import deque
+from controller.framework.CFxHandle import CFxHandle
+
+
+class _NullCFx():
+    """ Stand-in for CFx that accepts submitted CBTs without routing them """
+    def __init__(self):
+        self.submitted = 0
+
+    def submit_cbt(self, cbt):
+        # pylint: disable=unused-argument
+        self.submitted += 1
+
+
+class _GcMonitor():
+    """ Accumulates the number and duration of garbage collector runs """
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.pause_ns = 0
+        self.max_pause_ns = 0
+        self._start = 0
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._start = time.perf_counter_ns()
+        else:
+            pause = time.perf_counter_ns() - self._start
+            self.pause_ns += pause
+            self.max_pause_ns = max(self.max_pause_ns, pause)
+            self.collections[info["generation"]] += 1
+
+
+def run_cycle(pool_size, iterations, batch):
+    """
+    Simulate a module issuing bursts of requests and freeing them as the responses arrive,
+    which is the common pattern for LinkManager and Topology. Each burst keeps batch CBTs
+    outstanding, as a backlogged module queue does.
+    """
+    handle = CFxHandle(_NullCFx())
+    handle._cbt_pool = deque(maxlen=pool_size)  # pylint: disable=protected-access
+    monitor = _GcMonitor()
+    gc.collect()
+    gc.callbacks.append(monitor)
+    allocs = 0
+    start = time.perf_counter_ns()
+    outstanding = []
+    try:
+        for i in range(iterations):
+            if not handle._cbt_pool:  # pylint: disable=protected-access
+                allocs += 1
+            cbt = handle.create_cbt("Topology", "LinkManager", "LNK_CREATE_TUNNEL",
+                                    {"OverlayId": "A0FB389", "PeerId": i})
+            handle.submit_cbt(cbt)
+            outstanding.append(cbt)
+            if len(outstanding) == batch:
+                for cbt in outstanding:
+                    cbt.set_response("Tunnel created", True)
+                    handle.free_cbt(cbt)
+                outstanding.clear()
+        elapsed = time.perf_counter_ns() - start
+    finally:
+        gc.callbacks.remove(monitor)
+    return elapsed, allocs, monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CBT object pool")
+    parser.add_argument("-n", type=int, default=1000000, dest="iterations",
+                        help="number of CBTs to cycle through")
+    parser.add_argument("-b", type=int, default=CFxHandle.DEFAULT_CBT_POOL_SIZE, dest="batch",
+                        help="number of CBTs outstanding in each burst")
+    parser.add_argument("-p", type=int, default=CFxHandle.DEFAULT_CBT_POOL_SIZE,
+                        dest="pool_size", help="pool size for the pooled run")
+    args = parser.parse_args()
+    print("{0:>8} {1:>12} {2:>12} {3:>10} {4:>12} {5:>13} {6:>13}".format(
+        "pool", "CBT/s", "CBT allocs", "gen0 GCs", "gen1/2 GCs", "GC pause ms",
+        "max pause us"))
+    for pool_size in (0, args.pool_size):
+        gc.collect()
+        elapsed, allocs, mon = run_cycle(pool_size, args.iterations, args.batch)
+        print("{0:>8} {1:>12.0f} {2:>12} {3:>10} {4:>12} {5:>13.2f} {6:>13.1f}".format(
+            pool_size, args.iterations / (elapsed / 1e9), allocs, mon.collections[0],
+            "{0}/{1}".format(mon.collections[1], mon.collections[2]), mon.pause_ns / 1e6,
+            mon.max_pause_ns / 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Replays a CBT log recorded by CFx (CFx/RecordFile) into a single controller module. The
+module is loaded with the recorded configuration and receives the recorded requests that were
+addressed to it, in order. Every other module is stubbed, a request the replayed module sends
+is answered with the next response recorded for the same recipient and action. Timers do not
+fire during a replay, so a run is deterministic and the time measured is the module's own
+CBT processing.
+
+Usage: python -m controller.tools.CBTReplay <log> <module> [--realtime] [--top n]
+"""
+
+import argparse
+import collections
+import importlib
+import threading
+import time
+from controller.framework.CFx import CFX
+from controller.framework.CFxHandle import CFxHandle
+from controller.framework.CFxMetrics import CBTMetrics, summarize_metrics
+from controller.framework.CFxRecorder import read_records
+from controller.framework.CFxTimer import TimerWheel
+
+
+class _ReplayCFx(CFX):
+    """ CFx that hosts one module and stands in for all the others """
+    # pylint: disable=super-init-not-called
+    def __init__(self, node_id, config, module_name):
+        self._config = config
+        self._node_id = node_id
+        self.model = config["CFx"].get("Model")
+        self._module_name = module_name
+        self._cfx_handle_dict = {}
+        self._subscriptions = {}
+        self._subscription_lock = threading.Lock()
+        self._cbt_futures = {}
+        self._cfx_handlers = {}
+        self._recorder = None
+        self._init_times = {}
+        # (recipient, action) -> recorded responses to the replayed module
+        self.responses = collections.defaultdict(collections.deque)
+        self.unanswered = collections.Counter()
+        self.sent = 0
+
+    def find_subscription(self, owner_name, subscription_name):
+        # every provider is available, its updates are part of the recorded requests
+        return self._subscriptions.get((owner_name, subscription_name))
+
+    def submit_cbt(self, cbt):
+        handle = self._cfx_handle_dict[self._module_name]
+        if cbt.op_type == "Response":
+            if cbt.response.recipient == self._module_name:
+                handle._cm_queue.put(cbt)  # pylint: disable=protected-access
+            else:
+                # a replayed request was completed, account its service time and free it
+                handle._metrics.record_dequeue(cbt)  # pylint: disable=protected-access
+                handle.free_cbt(cbt)
+            return
+        if cbt.request.recipient == self._module_name:
+            handle._cm_queue.put(cbt)  # pylint: disable=protected-access
+            return
+        self.sent += 1
+        key = (cbt.request.recipient, cbt.request.action)
+        recorded = self.responses[key]
+        if recorded:
+            status, data = recorded.popleft()
+            cbt.set_response(data, status)
+        else:
+            self.unanswered[key] += 1
+            cbt.set_response("No response was recorded for this request", False)
+        cbt.completed = True
+        handle._cm_queue.put(cbt)  # pylint: disable=protected-access
+
+    def submit_cbts(self, cbts):
+        for cbt in cbts:
+            self.submit_cbt(cbt)
+
+
+def load_module(cfx, module_name):
+    # the same module resolution as CFX.load_module
+    try:
+        module = importlib.import_module("controller.modules.{0}.{1}"
+                                         .format(cfx.model, module_name))
+    except ImportError:
+        module = importlib.import_module("controller.modules.{0}".format(module_name))
+    handle = CFxHandle(cfx)
+    # pylint: disable=protected-access
+    handle._timer_wheel = TimerWheel()  # never started, so timers do not fire
+    handle._metrics = CBTMetrics()
+    module_config = cfx._config[module_name]
+    module_config["NodeId"] = cfx._node_id
+    handle._cm_instance = getattr(module, module_name)(handle, module_config, module_name)
+    handle._cm_config = module_config
+    cfx._cfx_handle_dict[module_name] = handle
+    return handle
+
+
+def replay(filename, module_name, realtime=False):
+    header, records = read_records(filename)
+    _, _, node_id, config = header
+    records = list(records)
+    cfx = _ReplayCFx(node_id, config, module_name)
+    inbound = []
+    for (stamp, _, _, op_type, initiator, recipient, action, params, status,
+         data) in records:
+        if op_type == "Request" and recipient == module_name and initiator != module_name:
+            inbound.append((stamp, initiator, action, params))
+        elif op_type == "Response" and initiator == module_name:
+            cfx.responses[(recipient, action)].append((status, data))
+    handle = load_module(cfx, module_name)
+    handle._cm_instance.initialize()  # pylint: disable=protected-access
+    handle.run_pending()
+    handle._metrics = CBTMetrics()  # pylint: disable=protected-access
+    start = time.perf_counter_ns()
+    first = inbound[0][0] if inbound else 0
+    for stamp, initiator, action, params in inbound:
+        if realtime:
+            delay = (stamp - first) - (time.perf_counter_ns() - start)
+            if delay > 0:
+                time.sleep(delay / 1e9)
+        cbt = handle.create_cbt(initiator, module_name, action, params)
+        handle.submit_cbt(cbt)
+        handle.run_pending()
+    elapsed = time.perf_counter_ns() - start
+    return cfx, handle, len(inbound), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded CBT traffic into a module")
+    parser.add_argument("log", help="CBT log written by CFx, see CFx/RecordFile")
+    parser.add_argument("module", help="name of the module to replay into, eg., Topology")
+    parser.add_argument("--realtime", action="store_true",
+                        help="keep the recorded spacing between requests")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of actions to list by total service time")
+    args = parser.parse_args()
+    cfx, handle, count, elapsed = replay(args.log, args.module, args.realtime)
+    print("{0} requests replayed into {1} in {2:.3f}s, {3:.0f} requests/s, {4} requests sent"
+          .format(count, args.module, elapsed / 1e9, count / max(elapsed / 1e9, 1e-9),
+                  cfx.sent))
+    for (recipient, action), num in cfx.unanswered.most_common():
+        print("  no recorded response for {0} {1}:{2}".format(num, recipient, action))
+    latency = summarize_metrics([handle._metrics])  # pylint: disable=protected-access
+    rows = []
+    for key, entry in latency.items():
+        service = entry["Service"]
+        if service["Count"] and key.startswith(args.module + ":"):
+            rows.append((service["MeanUs"] * service["Count"], key, service))
+    print("{0:<40} {1:>8} {2:>12} {3:>12}".format("action", "count", "mean us", "p99 us"))
+    for _, key, service in sorted(rows, key=lambda row: row[0], reverse=True)[:args.top]:
+        print("{0:<40} {1:>8} {2:>12.1f} {3:>12.1f}".format(
+            key, service["Count"], service["MeanUs"], service["P99Us"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Benchmark of CBT round trips between two modules on the threaded and the asyncio CFx
+engines. A requester keeps a window of requests outstanding to a responder which completes
+each one immediately, so the cost measured is the queue handoff and dispatch of the engine.
+
+Usage: python -m controller.tools.EngineBenchmark [-n round_trips] [-w window]
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from controller.framework.CBTQueue import AsyncCBTQueue
+from controller.framework.CFxHandle import CFxHandle
+
+
+class _BenchCFx():
+    """ Stand-in for CFx that only routes CBTs between the benchmark modules """
+    def __init__(self):
+        self.handles = {}
+
+    def submit_cbt(self, cbt):
+        recipient = cbt.request.recipient
+        if cbt.op_type == "Response":
+            recipient = cbt.response.recipient
+        self.handles[recipient]._cm_queue.put(cbt)  # pylint: disable=protected-access
+
+
+class _Responder():
+    def __init__(self, cfx_handle):
+        self._cfx_handle = cfx_handle
+
+    def initialize(self):
+        pass
+
+    def process_cbt(self, cbt):
+        cbt.set_response(None, True)
+        self._cfx_handle.complete_cbt(cbt)
+
+    def timer_method(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+class _Requester():
+    def __init__(self, cfx_handle, round_trips):
+        self._cfx_handle = cfx_handle
+        # the initial window is sent from the main thread while the worker sends the rest
+        self._lock = threading.Lock()
+        self._remaining = round_trips
+        self._received = 0
+        self._round_trips = round_trips
+        self.done = threading.Event()
+
+    def initialize(self):
+        pass
+
+    def send_request(self):
+        with self._lock:
+            if self._remaining == 0:
+                return
+            self._remaining -= 1
+        cbt = self._cfx_handle.create_cbt("Requester", "Responder", "BENCH_ECHO")
+        self._cfx_handle.submit_cbt(cbt)
+
+    def process_cbt(self, cbt):
+        self._cfx_handle.free_cbt(cbt)
+        self._received += 1
+        if self._received == self._round_trips:
+            self.done.set()
+        else:
+            self.send_request()
+
+    def timer_method(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+def _create_handles(cfx, round_trips, event_loop=None):
+    for name in ("Requester", "Responder"):
+        handle = CFxHandle(cfx)
+        # pylint: disable=protected-access
+        if event_loop is not None:
+            handle._event_loop = event_loop
+            handle._cm_queue = AsyncCBTQueue(event_loop)
+        if name == "Requester":
+            handle._cm_instance = _Requester(handle, round_trips)
+        else:
+            handle._cm_instance = _Responder(handle)
+        handle._cm_config = {}
+        handle.initialize()
+        cfx.handles[name] = handle
+    return cfx.handles["Requester"]._cm_instance  # pylint: disable=protected-access
+
+
+def run_threaded(round_trips, window):
+    cfx = _BenchCFx()
+    requester = _create_handles(cfx, round_trips)
+    for handle in cfx.handles.values():
+        handle.start()
+    start = time.perf_counter_ns()
+    for _ in range(window):
+        requester.send_request()
+    requester.done.wait()
+    elapsed = time.perf_counter_ns() - start
+    for handle in cfx.handles.values():
+        handle._cm_queue.put(None)  # pylint: disable=protected-access
+        handle._cm_thread.join()  # pylint: disable=protected-access
+    return elapsed
+
+
+def run_asyncio(round_trips, window):
+    event_loop = asyncio.new_event_loop()
+    cfx = _BenchCFx()
+    requester = _create_handles(cfx, round_trips, event_loop)
+    for handle in cfx.handles.values():
+        handle.start()
+
+    def run_loop():
+        asyncio.set_event_loop(event_loop)
+        for handle in cfx.handles.values():
+            # pylint: disable=protected-access
+            handle._cm_queue.loop_thread_id = threading.get_ident()
+        event_loop.run_forever()
+
+    loop_thread = threading.Thread(target=run_loop)
+    loop_thread.start()
+    start = time.perf_counter_ns()
+    # the initial window is submitted from this thread, everything after it stays on the loop
+    for _ in range(window):
+        requester.send_request()
+    requester.done.wait()
+    elapsed = time.perf_counter_ns() - start
+    tasks = []
+    for handle in cfx.handles.values():
+        # pylint: disable=protected-access
+        handle._cm_queue.put(None)
+        tasks.append(handle._cm_task)
+
+    async def wait_for_tasks():
+        await asyncio.gather(*tasks)
+
+    asyncio.run_coroutine_threadsafe(wait_for_tasks(), event_loop).result()
+    event_loop.call_soon_threadsafe(event_loop.stop)
+    loop_thread.join()
+    event_loop.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CFx execution engines")
+    parser.add_argument("-n", type=int, default=200000, dest="round_trips",
+                        help="number of request/response round trips")
+    parser.add_argument("-w", type=int, default=64, dest="window",
+                        help="number of requests kept outstanding")
+    args = parser.parse_args()
+    window = min(args.window, args.round_trips)
+    print("{0:>10} {1:>14} {2:>14}".format("engine", "round trips/s", "us/round trip"))
+    for engine, run in (("Threaded", run_threaded), ("Asyncio", run_asyncio)):
+        elapsed = run(args.round_trips, window)
+        print("{0:>10} {1:>14.0f} {2:>14.2f}".format(
+            engine, args.round_trips / (elapsed / 1e9), elapsed / 1e3 / args.round_trips))
+
+
+if __name__ == "__main__":
+    main()
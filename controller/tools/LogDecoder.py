@@ -0,0 +1,93 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Decodes the binary log written by Logger with Device "Binary" into the text format of the
+controller log. Records can be selected by module, minimum level, time range and peer id, a
+peer id matches the records that mention it or its first 7 characters. Rotated files are
+decoded in the order given, eg., ctrl.blog.2 ctrl.blog.1 ctrl.blog. The flight recorder
+dumps written by Logger, eg., ctrl-flight-<time>-<n>.blog, are decoded the same way.
+
+Usage: python -m controller.tools.LogDecoder <log> [<log> ...] [-m module] [-l level]
+       [--since time] [--until time] [-p peer_id]
+"""
+
+import argparse
+import logging
+import time
+from controller.modules.LogWriter import read_binary_log
+
+TIME_FORMAT = "%Y%m%d %H:%M:%S"
+
+
+def parse_time(value):
+    # the time format of the controller log or sec since the epoch
+    try:
+        return float(value)
+    except ValueError:
+        return time.mktime(time.strptime(value, TIME_FORMAT))
+
+
+def format_record(created, levelno, module, fmt, args):
+    # the same text as the controller log's file formatter, which always applies fmt % args
+    try:
+        msg = fmt % args
+    except (TypeError, ValueError):
+        msg = "{0} {1}".format(fmt, args)
+    if module:
+        msg = "{0}: {1}".format(module, msg)
+    return "[{0}.{1:03d}] {2}:{3}".format(
+        time.strftime(TIME_FORMAT, time.localtime(created)),
+        int((created - int(created)) * 1000), logging.getLevelName(levelno), msg)
+
+
+def decode(filenames, modules=None, level=logging.DEBUG, since=None, until=None, peer_id=None):
+    for filename in filenames:
+        for created, levelno, module, fmt, args in read_binary_log(filename):
+            if levelno < level or (modules and module not in modules):
+                continue
+            if (since is not None and created < since) or (until is not None and created > until):
+                continue
+            line = format_record(created, levelno, module, fmt, args)
+            if peer_id and peer_id[:7] not in line:
+                continue
+            yield line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a binary controller log")
+    parser.add_argument("filenames", nargs="+", metavar="log")
+    parser.add_argument("-m", action="append", dest="modules", metavar="module",
+                        help="only records of this module, can be repeated")
+    parser.add_argument("-l", default="DEBUG", dest="level",
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="only records at this level or above")
+    parser.add_argument("--since", type=parse_time,
+                        help="only records from this time, \"YYYYmmdd HH:MM:SS\" or epoch sec")
+    parser.add_argument("--until", type=parse_time, help="only records up to this time")
+    parser.add_argument("-p", dest="peer_id", help="only records that mention this peer id")
+    args = parser.parse_args()
+    for line in decode(args.filenames, args.modules, getattr(logging, args.level), args.since,
+                       args.until, args.peer_id):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,544 @@
+# ipop-project
+# Copyright 2016, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+Simulates an overlay of many controllers in one process for scale testing. Every node is a
+full CFx stack that runs the real Signal, LinkManager and Topology modules. Signal's XMPP
+transport is connected to an in-memory broker, and TincanInterface is replaced by a simulated
+Tincan that completes its requests after configurable latencies and brings a link up once
+both of its endpoints have exchanged their candidate address sets. The run reports the time
+the overlay took to converge, and the CBTs processed and signalling traffic of each node.
+
+The modules read the system clock directly so the simulation runs in wall clock time, lower
+the module timer intervals with -t to converge sooner. Each node runs its own module workers
+and timer wheel, a few threads per node.
+
+Usage: python -m controller.tools.OverlaySimulator [-n nodes] [-t timer_interval]
+       [--timeout sec] [-o report.json]
+"""
+
+import argparse
+import collections
+import contextlib
+import copy
+import io
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from slixmpp import JID
+import controller.framework.fxlib as fxlib
+from controller.framework.CFx import CFX
+from controller.framework.CFxMetrics import summarize_metrics
+from controller.framework.CFxTimer import TimerWheel
+from controller.framework.ControllerModule import ControllerModule
+from controller.modules.Signal import Signal as XmppSignal, XmppTransport
+
+OVERLAY_ID = "51A1A7E"
+SIM_DOMAIN = "ipop.sim"
+
+
+class SimBroker():
+    """
+    In-memory XMPP server of the overlay. Presence is broadcast to every other connected
+    node and messages are routed by JID, each stanza is delivered after the broker latency.
+    """
+    def __init__(self, timer_wheel, latency):
+        self._timer_wheel = timer_wheel
+        self._latency = latency
+        self._lock = threading.Lock()
+        self._transports = {}  # full JID -> SimTransport
+        self.undeliverable = 0
+        # node id -> signalling traffic counters
+        self.stats = {}
+
+    def _delay(self):
+        return random.uniform(self._latency / 2, self._latency * 1.5)
+
+    def connect(self, xport):
+        with self._lock:
+            self._transports[xport.boundjid.full] = xport
+            self.stats[xport._node_id] = dict(PresenceSent=0, MessagesSent=0, BytesSent=0,
+                                              Received=0)
+        # the sign-on presence sent when the XMPP session starts
+        xport.send_presence(pstatus="ident#" + xport._node_id)
+
+    def disconnect(self, xport):
+        with self._lock:
+            self._transports.pop(xport.boundjid.full, None)
+
+    def send_presence(self, xport, pstatus):
+        with self._lock:
+            self.stats[xport._node_id]["PresenceSent"] += 1
+            peers = [peer for peer in self._transports.values() if peer is not xport]
+        for peer in peers:
+            presence = {"from": xport.boundjid.full, "to": peer.boundjid.full, "type": "",
+                        "status": pstatus}
+            self._timer_wheel.schedule(self._delay(), self._deliver, peer,
+                                       peer.presence_event_handler, presence)
+
+    def send_msg(self, xport, peer_jid, msg_type, payload):
+        with self._lock:
+            stats = self.stats[xport._node_id]
+            stats["MessagesSent"] += 1
+            stats["BytesSent"] += len(payload)
+            peer = self._transports.get(str(peer_jid))
+            if peer is None:
+                self.undeliverable += 1
+                return
+        msg = {"from": xport.boundjid.full, "to": str(peer_jid), "type": "chat",
+               "ipop": {"type": msg_type, "payload": payload}}
+        self._timer_wheel.schedule(self._delay(), self._deliver, peer, peer.message_listener,
+                                   msg)
+
+    def _deliver(self, peer, handler, stanza):
+        # runs on the wheel thread, the handlers only queue CBTs to the node's modules
+        with self._lock:
+            self.stats[peer._node_id]["Received"] += 1
+        handler(stanza)
+
+
+class SimTransport():
+    """
+    Stands in for XmppTransport on the broker. The presence and message handlers are those of
+    XmppTransport so Signal's handling of the XMPP traffic is unchanged.
+    """
+    presence_event_handler = XmppTransport.presence_event_handler
+    message_listener = XmppTransport.message_listener
+
+    def __init__(self, broker, overlay_id, sig, presence_publisher, jid_cache,
+                 outgoing_rem_acts):
+        self._broker = broker
+        self._overlay_id = overlay_id
+        self._sig = sig
+        self._node_id = sig.node_id
+        self._presence_publisher = presence_publisher
+        self._jid_cache = jid_cache
+        self._outgoing_rem_acts = outgoing_rem_acts
+        self.boundjid = JID("{0}@{1}/ipop".format(self._node_id, SIM_DOMAIN))
+        # Signal posts its presence with event_loop.call_soon_threadsafe
+        self.event_loop = self
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+    def host(self):
+        return SIM_DOMAIN
+
+    def send_presence(self, pstatus):
+        self._broker.send_presence(self, pstatus)
+
+    def send_msg(self, peer_jid, msg_type, payload):
+        self._broker.send_msg(self, peer_jid, msg_type, payload)
+
+    def shutdown(self):
+        self._broker.disconnect(self)
+
+
+class SimTincanNetwork():
+    """
+    The links between the simulated Tincan instances keyed by tunnel id, which is also the
+    link id and is shared by both endpoints. A link comes up after the ICE latency once each
+    endpoint has been given the candidate address set of the other.
+    """
+    def __init__(self, timer_wheel, latencies):
+        self._timer_wheel = timer_wheel
+        self._latencies = latencies  # TCI action or "ICE" -> mean sec
+        self._lock = threading.Lock()
+        self._tincans = {}  # node id -> TincanInterface
+        self._links = {}  # tunnel id -> {node id: has the peer's CAS}
+        self._online = set()
+        self.link_changes = 0
+        self.degree = collections.Counter()  # node id -> links online
+
+    def delay(self, action):
+        mean = self._latencies.get(action, 0)
+        return random.uniform(mean / 2, mean * 1.5)
+
+    def attach(self, node_id, tincan):
+        with self._lock:
+            self._tincans[node_id] = tincan
+
+    def create_endpoint(self, tnlid, node_id):
+        with self._lock:
+            self._links.setdefault(tnlid, {}).setdefault(node_id, False)
+
+    def add_peer_cas(self, tnlid, node_id):
+        with self._lock:
+            endpoints = self._links.get(tnlid)
+            if not endpoints or node_id not in endpoints:
+                return
+            endpoints[node_id] = True
+            connect = len(endpoints) == 2 and all(endpoints.values())
+        if connect:
+            self._timer_wheel.schedule(self.delay("ICE"), self._link_up, tnlid)
+
+    def _link_up(self, tnlid):
+        with self._lock:
+            endpoints = self._links.get(tnlid)
+            if tnlid in self._online or not endpoints or len(endpoints) != 2:
+                return
+            self._online.add(tnlid)
+            self.link_changes += 1
+            for node_id in endpoints:
+                self.degree[node_id] += 1
+            tincans = [self._tincans[node_id] for node_id in endpoints]
+        for tincan in tincans:
+            tincan.link_state_changed(tnlid, "LINK_STATE_UP")
+
+    def remove_endpoint(self, tnlid, node_id):
+        with self._lock:
+            endpoints = self._links.get(tnlid)
+            if endpoints is None or endpoints.pop(node_id, None) is None:
+                return
+            if not endpoints:
+                del self._links[tnlid]
+            if tnlid not in self._online:
+                return
+            self._online.discard(tnlid)
+            self.link_changes += 1
+            self.degree[node_id] -= 1
+            for peer_id in endpoints:
+                self.degree[peer_id] -= 1
+            peers = [self._tincans[peer_id] for peer_id in endpoints]
+        # the peer notices the link is down once ICE gives up on it
+        for tincan in peers:
+            self._timer_wheel.schedule(self.delay("ICE"), tincan.link_state_changed, tnlid,
+                                       "LINK_STATE_DOWN")
+
+    def link_status(self, tnlid, node_id):
+        with self._lock:
+            endpoints = self._links.get(tnlid)
+            if not endpoints or node_id not in endpoints:
+                return "UNKNOWN"
+            return "ONLINE" if tnlid in self._online else "OFFLINE"
+
+    def converged(self, degree):
+        # every node has at least degree links online
+        with self._lock:
+            return all(self.degree[node_id] >= degree for node_id in self._tincans)
+
+    def connected_nodes(self, degree):
+        with self._lock:
+            return sum(1 for node_id in self._tincans if self.degree[node_id] >= degree)
+
+
+class TincanInterface(ControllerModule):
+    """ Simulated Tincan, a request is completed after the latency configured for its action """
+    def __init__(self, cfx_handle, module_config, module_name):
+        super(TincanInterface, self).__init__(cfx_handle, module_config, module_name)
+        self._network = None  # set by SimNode
+        self._tci_publisher = None
+        self._responders = {}
+        self._fpr = "sim:" + self.node_id[:16]
+        self._tunnels = {}  # tunnel id -> local tunnel descriptor
+
+    def initialize(self):
+        self._responders = {
+            "TCI_CREATE_TUNNEL": self._create_tunnel,
+            "TCI_CREATE_LINK": self._create_link,
+            "TCI_QUERY_LINK_STATS": self._query_link_stats,
+            "TCI_REMOVE_TUNNEL": self._remove_tunnel,
+            "TCI_REMOVE_LINK": self._remove_tunnel}
+        self.register_cbt_handlers(
+            "Request", {action: self.req_handler_tincan for action in self._responders})
+        self._tci_publisher = self._cfx_handle.publish_subscription("TCI_TINCAN_MSG_NOTIFY")
+        self._network.attach(self.node_id, self)
+        self.register_cbt("Logger", "LOG_INFO", "Module loaded")
+
+    def req_handler_tincan(self, cbt):
+        self.schedule_timer(self._network.delay(cbt.request.action), self._respond, cbt)
+
+    def _respond(self, cbt):
+        data = self._responders[cbt.request.action](cbt.request.params)
+        cbt.set_response(data, True)
+        self.complete_cbt(cbt)
+
+    def _tunnel(self, params):
+        # the tunnel is created by the first create tunnel or link request that names it
+        tnlid = params["TunnelId"]
+        tnl = self._tunnels.get(tnlid)
+        if tnl is None:
+            tnl = self._tunnels[tnlid] = {"MAC": uuid.uuid4().hex[:12],
+                                          "TapName": params.get("TapName"), "FPR": self._fpr}
+            self._network.create_endpoint(tnlid, self.node_id)
+        return tnl
+
+    def _create_tunnel(self, params):
+        return dict(self._tunnel(params))
+
+    def _create_link(self, params):
+        resp = dict(self._tunnel(params))
+        if params["NodeData"].get("CAS"):
+            self._network.add_peer_cas(params["TunnelId"], self.node_id)
+        resp["CAS"] = "udp:{0}:{1}".format(self.node_id[:7], params["TunnelId"][:7])
+        return resp
+
+    def _query_link_stats(self, tnlids):
+        return {tnlid: {tnlid: {"Status": self._network.link_status(tnlid, self.node_id),
+                                "IceRole": "controlling", "Stats": []}}
+                for tnlid in tnlids}
+
+    def _remove_tunnel(self, params):
+        self._network.remove_endpoint(params["TunnelId"], self.node_id)
+        self._tunnels.pop(params["TunnelId"], None)
+        return "Removed"
+
+    def link_state_changed(self, tnlid, state):
+        self._tci_publisher.post_update({"Command": "LinkStateChange", "Data": state,
+                                         "LinkId": tnlid, "TunnelId": tnlid})
+
+    def process_cbt(self, cbt):
+        self.dispatch_cbt(cbt)
+
+    def timer_method(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+class Signal(XmppSignal):
+    """ Signal with its XMPP transport connected to the simulator's broker """
+    def __init__(self, cfx_handle, module_config, module_name):
+        super(Signal, self).__init__(cfx_handle, module_config, module_name)
+        self._broker = None  # set by SimNode
+
+    def _create_transport_instance(self, overlay_id, overlay_descr, jid_cache, outgoing_rem_acts):
+        xport = SimTransport(self._broker, overlay_id, self, self._presence_publisher, jid_cache,
+                             outgoing_rem_acts)
+        self._broker.connect(xport)
+        return xport
+
+
+class Logger(ControllerModule):
+    """
+    Counts the warnings and errors of a node and logs the records at LogLevel or above with
+    its id. Like Logger, it has the modules drop the records it filters before a CBT is made.
+    """
+    LEVELS = {"LOG_DEBUG": logging.DEBUG, "LOG_INFO": logging.INFO,
+              "LOG_WARNING": logging.WARNING, "LOG_ERROR": logging.ERROR}
+
+    def __init__(self, cfx_handle, module_config, module_name):
+        super(Logger, self).__init__(cfx_handle, module_config, module_name)
+        self._logger = logging.getLogger("OverlaySimulator")
+        self._level = logging.ERROR
+        self.counts = collections.Counter()
+
+    def initialize(self):
+        self._level = getattr(logging, self._cm_config.get("LogLevel", "ERROR"))
+        self._logger.setLevel(self._level)
+        for action in Logger.LEVELS:
+            self.register_cbt_handler("Request", action, self.req_handler_log)
+        self._cfx_handle.set_log_level(min(self._level, logging.WARNING))
+
+    def req_handler_log(self, cbt):
+        lvl = Logger.LEVELS[cbt.request.action]
+        self.counts[cbt.request.action] += 1
+        if lvl >= self._level:
+            if isinstance(cbt.request.params, tuple):
+                fmt = "%s %s: " + cbt.request.params[0]
+                vals = cbt.request.params[1]
+            else:
+                fmt = "%s %s: %s"
+                vals = [cbt.request.params]
+            self._logger.log(lvl, fmt, self.node_id[:7], cbt.request.initiator, *vals)
+        cbt.set_response(None, True)
+        self.complete_cbt(cbt)
+
+    def resp_handler_default(self, cbt):
+        self.free_cbt(cbt)
+
+    def process_cbt(self, cbt):
+        self.dispatch_cbt(cbt)
+
+    def timer_method(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+SIM_MODULES = {"Logger": Logger, "TincanInterface": TincanInterface, "Signal": Signal}
+
+
+class SimNode(CFX):
+    """ A controller built from a config dict, its Tincan and XMPP server are simulated """
+    def __init__(self, config, broker, network):
+        self._sim_config = config
+        self._broker = broker
+        self._network = network
+        super(SimNode, self).__init__()
+
+    def parse_config(self):
+        self._default_config = copy.deepcopy(self._sim_config)
+        self._config = self._sim_config
+        self._config_file = None
+        self._config_string = None
+
+    def _module_class(self, module_name):
+        if module_name in SIM_MODULES:
+            return SIM_MODULES[module_name]
+        return super(SimNode, self)._module_class(module_name)
+
+    def load_module(self, module_name):
+        super(SimNode, self).load_module(module_name)
+        instance = self._cfx_handle_dict[module_name]._cm_instance
+        if module_name == "Signal":
+            instance._broker = self._broker
+        elif module_name == "TincanInterface":
+            instance._network = self._network
+
+    @property
+    def node_id(self):
+        return self._node_id
+
+
+def node_config(node_id, args):
+    config = copy.deepcopy(fxlib.CONFIG)
+    config["CFx"].update({"NodeId": node_id, "Overlays": [OVERLAY_ID], "Engine": args.engine})
+    for module_name in ("OverlayVisualizer", "UsageReport", "BridgeController"):
+        config[module_name]["Enabled"] = False
+    config["Logger"]["LogLevel"] = args.log_level
+    for module_name in ("Signal", "LinkManager", "Topology"):
+        config[module_name]["TimerInterval"] = args.timer_interval
+    config["Signal"]["PresenceInterval"] = args.timer_interval
+    config["Signal"]["Overlays"] = {OVERLAY_ID: {"HostAddress": SIM_DOMAIN, "Port": 5222}}
+    config["LinkManager"]["Overlays"] = {OVERLAY_ID: {"Type": "TUNNEL", "TapName": "simtnl-"}}
+    config["Topology"]["Overlays"] = {OVERLAY_ID: {
+        "Name": "SimulatedOverlay", "Description": "OverlaySimulator",
+        "MaxSuccessors": args.successors, "MaxConcurrentEdgeSetup": 3, "Role": "Switch"}}
+    return config
+
+
+def simulate(args):
+    latencies = {"TCI_CREATE_TUNNEL": args.create_tunnel_ms / 1000,
+                 "TCI_CREATE_LINK": args.create_link_ms / 1000,
+                 "TCI_QUERY_LINK_STATS": args.query_stats_ms / 1000,
+                 "TCI_REMOVE_TUNNEL": args.remove_ms / 1000,
+                 "TCI_REMOVE_LINK": args.remove_ms / 1000,
+                 "ICE": args.ice_ms / 1000}
+    timer_wheel = TimerWheel(0.01)
+    broker = SimBroker(timer_wheel, args.xmpp_ms / 1000)
+    network = SimTincanNetwork(timer_wheel, latencies)
+    degree = min(args.successors, args.nodes - 1)
+    # the controllers print their start up and shut down progress
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    nodes = []
+    timer_wheel.start()
+    started = time.monotonic()
+    with quiet:
+        for _ in range(args.nodes):
+            node = SimNode(node_config(uuid.uuid4().hex, args), broker, network)
+            node.initialize()
+            nodes.append(node)
+            if args.join_interval:
+                time.sleep(args.join_interval)
+    converged = None
+    while time.monotonic() - started < args.timeout:
+        if network.converged(degree):
+            converged = time.monotonic() - started
+            break
+        time.sleep(0.1)
+    connected = network.connected_nodes(degree)
+    timer_wheel.terminate()
+    with quiet:
+        for node in nodes:
+            node.terminate()
+
+    # the workers have exited so their metrics can be read
+    per_node = []
+    for node in nodes:
+        # pylint: disable=protected-access
+        latency = node.query_metrics()["Latency"]
+        log_counts = node._cfx_handle_dict["Logger"]._cm_instance.counts
+        row = {"NodeId": node.node_id, "Links": network.degree[node.node_id],
+               "CBTs": sum(entry["QueueWait"]["Count"] for entry in latency.values()),
+               "Warnings": log_counts["LOG_WARNING"], "Errors": log_counts["LOG_ERROR"]}
+        row.update(broker.stats[node.node_id])
+        per_node.append(row)
+    # pylint: disable=protected-access
+    metrics = [handle._metrics for node in nodes for handle in node._cfx_handle_dict.values()
+               if handle._metrics is not None]
+    return {"Nodes": args.nodes, "Degree": degree, "ConvergenceSec": converged,
+            "ConnectedNodes": connected, "LinkChanges": network.link_changes,
+            "Undeliverable": broker.undeliverable, "PerNode": per_node,
+            "Latency": summarize_metrics(metrics)}
+
+
+def print_report(report, timeout):
+    if report["ConvergenceSec"] is not None:
+        print("{0} nodes converged in {1:.2f}s, every node has {2} links online".format(
+            report["Nodes"], report["ConvergenceSec"], report["Degree"]))
+    else:
+        print("{0} nodes did not converge within {1}s, {2} nodes have {3} links online".format(
+            report["Nodes"], timeout, report["ConnectedNodes"], report["Degree"]))
+    print("link state changes {0}, undeliverable messages {1}".format(
+        report["LinkChanges"], report["Undeliverable"]))
+    print("{0:>14} {1:>10} {2:>10} {3:>10} {4:>12}".format("per node", "min", "mean", "max",
+                                                           "total"))
+    for column in ("Links", "CBTs", "PresenceSent", "MessagesSent", "BytesSent", "Received",
+                   "Warnings", "Errors"):
+        values = [row[column] for row in report["PerNode"]]
+        print("{0:>14} {1:>10} {2:>10.1f} {3:>10} {4:>12}".format(
+            column, min(values), sum(values) / len(values), max(values), sum(values)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate an overlay of IPOP controllers")
+    parser.add_argument("-n", type=int, default=20, dest="nodes",
+                        help="number of controllers in the overlay")
+    parser.add_argument("-t", type=int, default=5, dest="timer_interval",
+                        help="timer and presence interval of the modules in sec")
+    parser.add_argument("-s", type=int, default=2, dest="successors",
+                        help="topology successors of each node, the links expected per node")
+    parser.add_argument("-j", type=float, default=0, dest="join_interval",
+                        help="sec between nodes joining the overlay")
+    parser.add_argument("--timeout", type=float, default=300,
+                        help="sec to wait for the overlay to converge")
+    parser.add_argument("--engine", default="Threaded", choices=("Threaded", "Asyncio"))
+    parser.add_argument("--xmpp-ms", type=float, default=20, dest="xmpp_ms",
+                        help="mean latency of the XMPP broker")
+    parser.add_argument("--create-tunnel-ms", type=float, default=50, dest="create_tunnel_ms")
+    parser.add_argument("--create-link-ms", type=float, default=50, dest="create_link_ms")
+    parser.add_argument("--query-stats-ms", type=float, default=5, dest="query_stats_ms")
+    parser.add_argument("--remove-ms", type=float, default=10, dest="remove_ms")
+    parser.add_argument("--ice-ms", type=float, default=500, dest="ice_ms",
+                        help="mean time for a link to connect after the CAS exchange")
+    parser.add_argument("--log-level", default="ERROR", dest="log_level",
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="module log messages printed at this level or above")
+    parser.add_argument("-o", dest="output", help="write the full report as json")
+    parser.add_argument("-v", action="store_true", dest="verbose",
+                        help="show the controllers' start up output")
+    args = parser.parse_args()
+    logging.basicConfig(format="[%(asctime)s.%(msecs)03d] %(levelname)s: %(message)s",
+                        datefmt="%H:%M:%S")
+    report = simulate(args)
+    print_report(report, args.timeout)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()